@@ -1,445 +1,3907 @@
+import time
+STARTUP_TIME = time.perf_counter()    # Référence des mesures de démarrage
+
 import os
+import sys
 import re
 import threading
 import random
-import time
 import json
+import hashlib
+import math
+import bisect
+import unicodedata
+import atexit
+import sqlite3
+import uuid
+import subprocess
+import functools
+import io
+import queue
+import array
+import mmap
+import select
+import struct
+import ctypes
+import ctypes.util
+import traceback
+import contextlib
+import importlib.util
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+import shutil
+from collections import OrderedDict
 from datetime import datetime
-import pygame
-import yt_dlp
-import requests
 from PIL import Image, ImageTk, ImageFilter, ImageDraw, ImageFont, ImageOps
 
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import messagebox, simpledialog
 
-# Importation de mutagen pour récupérer la durée d'un MP3 et les tags
+# Importation de mutagen pour récupérer la durée d'un fichier audio et les tags
 try:
-    from mutagen.mp3 import MP3
+    from mutagen import File as MutagenFile
 except ImportError:
-    MP3 = None
+    MutagenFile = None
+
+# pygame, yt_dlp et requests sont importés à la première utilisation (voir init_audio(),
+# download_track() et get_http_session()) pour ne pas retarder l'affichage de la fenêtre.
+pygame = None
+
+# --- Mesure du démarrage ---
+
+startup_steps = []               # [(étape, durée en ms)]
+startup_mark = STARTUP_TIME      # Fin de l'étape précédente
+
+def mark_startup(step):
+    """Enregistre la durée d'une étape de démarrage (depuis l'étape précédente)."""
+    global startup_mark
+    now = time.perf_counter()
+    startup_steps.append((step, (now - startup_mark) * 1000))
+    startup_mark = now
+
+def report_startup():
+    """Affiche la répartition du temps de démarrage."""
+    total = (startup_mark - STARTUP_TIME) * 1000
+    details = ", ".join(f"{step} {ms:.0f} ms" for step, ms in startup_steps)
+    print(f"Démarrage en {total:.0f} ms : {details}")
+
+mark_startup("imports")
+
+# --- Instrumentation (optionnelle) ---
+
+INSTRUMENTATION_FILE = "instrumentation.json"
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+HEARTBEAT_MS = 50            # Période du battement de la boucle Tk
+STALL_THRESHOLD_MS = 200     # Retard de la boucle Tk à partir duquel un blocage est signalé
+STALL_HISTORY = 50           # Blocages conservés
+STALL_STACK_DEPTH = 15       # Appels conservés dans la pile d'un blocage
+
+class LatencyHistogram:
+    """Histogramme de latences à seuils logarithmiques (ms)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction):
+        """Retourne une borne supérieure du centile demandé (seuil de l'intervalle atteint)."""
+        target = fraction * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        buckets = {f"<={bound}": n for bound, n in zip(LATENCY_BUCKETS_MS, self.counts)}
+        buckets[f">{LATENCY_BUCKETS_MS[-1]}"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0,
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max, 3),
+            "buckets": buckets,
+        }
+
+class Instrumentation:
+    """
+    Mesures de performance activables depuis les paramètres : histogrammes de
+    latence des opérations principales et détection des blocages de la boucle Tk.
+    Un battement programmé via root.after() est surveillé par un thread : s'il
+    prend du retard au-delà du seuil, la pile du thread principal est enregistrée.
+    Désactivée, elle se limite à un test de booléen par opération.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}         # {opération: LatencyHistogram}
+        self.stalls = []             # Derniers blocages [{"at", "duration_ms", "stack"}]
+        self.current_stall = None    # Blocage en cours (pile déjà relevée)
+        self.last_beat = 0
+        self.session = 0             # Incrémenté à chaque activation (arrête les boucles précédentes)
+        self.lock = threading.Lock()
+
+    def record(self, name, ms):
+        """Enregistre la durée d'une opération."""
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.add(ms)
+
+    def measure(self, name):
+        """Contexte mesurant la durée de son bloc."""
+        return self._measure(name) if self.enabled else contextlib.nullcontext()
+
+    @contextlib.contextmanager
+    def _measure(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def start(self, root):
+        """Active les mesures et la surveillance de la boucle Tk de la fenêtre."""
+        with self.lock:
+            self.enabled = True
+            self.session += 1
+            self.current_stall = None
+            self.last_beat = time.perf_counter()
+        root.after(HEARTBEAT_MS, self._beat, root, self.session)
+        threading.Thread(target=self._watch, args=(self.session,), daemon=True).start()
+
+    def stop(self):
+        """Désactive les mesures (les données recueillies sont conservées)."""
+        with self.lock:
+            self.enabled = False
+            self.session += 1
+
+    def reset(self):
+        """Efface les données recueillies."""
+        with self.lock:
+            self.histograms.clear()
+            self.stalls.clear()
+
+    def _beat(self, root, session):
+        if session != self.session:
+            return
+        now = time.perf_counter()
+        with self.lock:
+            lag = (now - self.last_beat) * 1000 - HEARTBEAT_MS
+            self.last_beat = now
+            if self.current_stall is not None:
+                self.current_stall["duration_ms"] = round(lag, 1)
+                self.current_stall = None
+        self.record("main_loop_lag", max(lag, 0))
+        root.after(HEARTBEAT_MS, self._beat, root, session)
+
+    def _watch(self, session):
+        main_ident = threading.main_thread().ident
+        while session == self.session:
+            time.sleep(HEARTBEAT_MS / 1000)
+            with self.lock:
+                lag = (time.perf_counter() - self.last_beat) * 1000 - HEARTBEAT_MS
+                if lag < STALL_THRESHOLD_MS or self.current_stall is not None:
+                    continue
+                frame = sys._current_frames().get(main_ident)
+                stack = traceback.extract_stack(frame)[-STALL_STACK_DEPTH:] if frame else []
+                self.current_stall = {
+                    "at": datetime.now().isoformat(timespec="milliseconds"),
+                    "duration_ms": round(lag, 1),
+                    "stack": [f"{os.path.basename(fs.filename)}:{fs.lineno} {fs.name} | {fs.line}" for fs in stack],
+                }
+                self.stalls.append(self.current_stall)
+                del self.stalls[:-STALL_HISTORY]
+
+    def snapshot(self):
+        """Retourne les données recueillies (sérialisables en JSON)."""
+        with self.lock:
+            return {
+                "generated_at": datetime.now().isoformat(timespec="seconds"),
+                "stall_threshold_ms": STALL_THRESHOLD_MS,
+                "startup_ms": {step: round(ms, 1) for step, ms in startup_steps},
+                "operations": {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+                "stalls": [dict(stall) for stall in self.stalls],
+            }
+
+    def dump(self, path=INSTRUMENTATION_FILE):
+        """Écrit les données recueillies dans un fichier JSON."""
+        write_json_atomic(path, json.dumps(self.snapshot(), indent=2, ensure_ascii=False))
+
+    def dump_on_exit(self):
+        if self.enabled and (self.histograms or self.stalls):
+            self.dump()
+
+instrumentation = Instrumentation()
+atexit.register(instrumentation.dump_on_exit)
+
+def timed(name):
+    """Décorateur : enregistre la durée de chaque appel lorsque l'instrumentation est active."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not instrumentation.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                instrumentation.record(name, (time.perf_counter() - start) * 1000)
+        return wrapper
+    return decorator
+
+# --- Gestion des données de l'application ---
+
+APP_DATA_FILE = "app_data.json"
+DEFAULT_DATA = {
+    "playlists": {"Favoris": []},
+    "settings": {
+        "theme": "Dark",
+        "window_size": "950x900",   # Taille par défaut de la fenêtre
+        "window_state": "zoomed",    # État par défaut de la fenêtre
+        "download_workers": 3,       # Téléchargements simultanés
+        "audio_format": "mp3",       # "mp3" (réencodage) ou "native" (flux d'origine si possible)
+        "audio_bitrate": "192k",     # Débit des MP3 réencodés
+        "gapless": True,             # Mise en file du morceau suivant (lecture sans blanc)
+        "crossfade_s": 0,            # Durée du fondu enchaîné entre deux morceaux (0 : désactivé)
+        "progress_refresh_ms": 250,  # Période de rafraîchissement de la barre de progression
+        "shuffle": False,            # Lecture aléatoire
+        "shuffle_weighted": True,    # Tirage aléatoire pondéré par l'historique des lectures
+        "instrumentation": False     # Mesures de performance et détection des blocages (débogage)
+    },
+    "tags": {}  # Stockage des tags par fichier
+}
+
+SAVE_DELAY = 1.0    # Délai (s) de regroupement des écritures de app_data.json
+
+def load_app_data():
+    """Charge les données de l'application depuis un fichier JSON."""
+    try:
+        with open(APP_DATA_FILE, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        # On garde une copie du fichier illisible plutôt que de l'écraser
+        print(f"Erreur lecture {APP_DATA_FILE} : {e}")
+        try:
+            shutil.copyfile(APP_DATA_FILE, f"{APP_DATA_FILE}.corrupt")
+        except Exception:
+            pass
+    return json.loads(json.dumps(DEFAULT_DATA))
+
+def write_json_atomic(path, text):
+    """Écrit un fichier via un fichier temporaire puis un renommage atomique."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class AppDataWriter:
+    """
+    Écriture différée d'un fichier JSON : le texte, sérialisé par le code qui modifie
+    les données (copie cohérente), est confié à un thread d'arrière-plan qui regroupe
+    les écritures puis les applique de façon atomique. L'interface ne bloque donc
+    jamais sur le disque.
+    """
+
+    def __init__(self, path, delay=SAVE_DELAY):
+        self.path = path
+        self.delay = delay
+        self.text = None
+        self.dirty = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def mark_dirty(self, text):
+        """
+        Programme l'écriture d'une copie des données.
+        
+        :param text: Données déjà sérialisées en JSON
+        """
+        self.text = text
+        self.dirty.set()
+
+    def _run(self):
+        while True:
+            self.dirty.wait()
+            # Laisse le temps aux modifications rapprochées de s'accumuler
+            time.sleep(self.delay)
+            self.flush()
+
+    def flush(self):
+        """Écrit immédiatement les données si elles ont été modifiées."""
+        with self.lock:
+            if not self.dirty.is_set():
+                return
+            self.dirty.clear()
+            start = time.perf_counter()
+            try:
+                write_json_atomic(self.path, self.text)
+            except Exception as e:
+                print(f"Erreur sauvegarde {self.path} : {e}")
+                self.dirty.set()
+                return
+            instrumentation.record("save", (time.perf_counter() - start) * 1000)
+
+app_data_writer = AppDataWriter(APP_DATA_FILE)
+root = None                      # Fenêtre principale (créée par main())
+app_data_lock = threading.RLock()         # Garde app_data modifié hors de l'interface (téléchargements, catalogue)
+app_data_pending = threading.Event()      # Modifications de app_data pas encore sérialisées
+app_data_snapshot_hooks = []              # Reports dans app_data appelés avant chaque sérialisation
+
+def save_app_data(data):
+    """
+    Programme l'enregistrement des données de l'application. La copie est sérialisée
+    sur le thread de l'interface, qui modifie app_data sans verrou, au plus une fois
+    par SAVE_DELAY ; l'écriture elle-même est différée et atomique.
+    """
+    if app_data_pending.is_set():
+        return
+    app_data_pending.set()
+    if root is None:
+        snapshot_app_data()
+    else:
+        root.after(int(SAVE_DELAY * 1000), snapshot_app_data)
+
+def snapshot_app_data():
+    """Sérialise app_data (threads exclus par app_data_lock) et confie le texte au thread d'écriture."""
+    if not app_data_pending.is_set():
+        return
+    start = time.perf_counter()
+    with app_data_lock:
+        app_data_pending.clear()
+        for hook in app_data_snapshot_hooks:
+            hook()
+        text = json.dumps(app_data)
+    instrumentation.record("save_snapshot", (time.perf_counter() - start) * 1000)
+    app_data_writer.mark_dirty(text)
+
+def flush_app_data():
+    """Enregistre immédiatement les modifications en attente (fermeture)."""
+    snapshot_app_data()
+    app_data_writer.flush()
+
+atexit.register(flush_app_data)
+
+app_data = load_app_data()
+instrumentation.enabled = bool(app_data["settings"].get("instrumentation", False))
+
+# --- Catalogue des morceaux ---
+
+AUDIO_EXTENSIONS = (".mp3", ".opus", ".ogg")    # Formats lisibles par pygame.mixer.music
+
+def is_audio_file(filename):
+    """Indique si un fichier fait partie de la bibliothèque audio."""
+    return filename.lower().endswith(AUDIO_EXTENSIONS)
+
+class TrackCatalog:
+    """
+    Catalogue en mémoire des morceaux de la bibliothèque : ordre trié, index
+    nom de fichier -> position, identifiants stables et métadonnées en cache.
+    Chargé une seule fois puis tenu à jour, il évite de relister le dossier audio.
+    """
+
+    def __init__(self, directory, data, lock):
+        """
+        :param directory: Dossier contenant les fichiers audio
+        :param data: Dictionnaire persistant des identifiants ({"next_id": int, "ids": {fichier: id}})
+        :param lock: Verrou partagé avec l'enregistrement des données persistantes
+        """
+        self.directory = directory
+        self.data = data
+        self.data.setdefault("next_id", 1)
+        self.data.setdefault("ids", {})
+        self.files = []          # Noms de fichiers triés
+        self.positions = {}      # {fichier: position dans files}
+        self.by_id = {}          # {id: fichier}
+        self.metadata = {}       # {fichier: {"duration": ...}}
+        self.version = 0         # Incrémentée à chaque changement de la liste des fichiers
+        self.lock = lock
+
+    def __len__(self):
+        return len(self.files)
+
+    def __contains__(self, filename):
+        return filename in self.positions
+
+    def load(self):
+        """
+        Lit le dossier audio une seule fois et attribue un identifiant aux nouveaux fichiers.
+        
+        :return: True si de nouveaux identifiants ont été attribués
+        """
+        with self.lock:
+            if os.path.exists(self.directory):
+                files = sorted([f for f in os.listdir(self.directory) if is_audio_file(f)])
+            else:
+                files = []
+            self.files = files
+            self.positions = {}
+            self._reindex(0)
+            present = set(files)
+            for f in [f for f in self.metadata if f not in present]:
+                del self.metadata[f]
+            changed = False
+            for f in files:
+                changed |= self._assign_id(f)
+            self.by_id = {self.data["ids"][f]: f for f in files}
+            self.version += 1
+            return changed
+
+    def _assign_id(self, filename):
+        if filename in self.data["ids"]:
+            return False
+        self.data["ids"][filename] = self.data["next_id"]
+        self.data["next_id"] += 1
+        return True
+
+    def ensure_id(self, filename):
+        """Retourne l'identifiant d'un fichier, en lui en attribuant un s'il n'en a pas encore."""
+        with self.lock:
+            self._assign_id(filename)
+            return self.data["ids"][filename]
+
+    def _reindex(self, start):
+        for i in range(start, len(self.files)):
+            self.positions[self.files[i]] = i
+
+    def add(self, filename):
+        """
+        Ajoute un fichier au catalogue en conservant l'ordre trié.
+        
+        :param filename: Nom du fichier audio
+        :return: Identifiant du morceau
+        """
+        with self.lock:
+            if filename not in self.positions:
+                index = bisect.bisect_left(self.files, filename)
+                self.files.insert(index, filename)
+                self._reindex(index)
+                self._assign_id(filename)
+                self.by_id[self.data["ids"][filename]] = filename
+                self.version += 1
+            return self.data["ids"][filename]
+
+    def remove(self, filename):
+        """Retire un fichier du catalogue (son identifiant reste réservé)."""
+        with self.lock:
+            index = self.positions.pop(filename, None)
+            if index is None:
+                return
+            del self.files[index]
+            self._reindex(index)
+            self.by_id.pop(self.data["ids"].get(filename), None)
+            self.metadata.pop(filename, None)
+            self.version += 1
+
+    def apply_changes(self, added=(), removed=(), renamed=None):
+        """
+        Applique un lot de changements du dossier audio avec un seul réindexage.
+        Un fichier renommé conserve son identifiant et ses métadonnées.
+        
+        :param added: Fichiers apparus
+        :param removed: Fichiers disparus
+        :param renamed: {ancien nom: nouveau nom}
+        :return: Fichiers ajoutés au catalogue (hors renommages), triés
+        """
+        renamed = renamed or {}
+        with self.lock:
+            renamed = {old: new for old, new in renamed.items() if old in self.positions and new not in self.positions}
+            gone = {f for f in removed if f in self.positions} | set(renamed)
+            new_files = sorted({f for f in added if f not in self.positions or f in gone} - set(renamed.values()))
+            arriving = sorted(set(new_files) | set(renamed.values()))
+            if not gone and not arriving:
+                return []
+            starts = [self.positions[f] for f in gone]
+            if arriving:
+                starts.append(bisect.bisect_left(self.files, arriving[0]))
+            for f in gone:
+                del self.positions[f]
+                if f in renamed:
+                    new = renamed[f]
+                    self.data["ids"][new] = self.data["ids"].pop(f)
+                    if f in self.metadata:
+                        self.metadata[new] = self.metadata.pop(f)
+                else:
+                    self.by_id.pop(self.data["ids"].get(f), None)
+                    self.metadata.pop(f, None)
+            # Deux suites triées : le tri par fusion de Python est linéaire ici
+            self.files = sorted([f for f in self.files if f not in gone] + arriving)
+            self._reindex(min(starts))
+            for f in arriving:
+                self._assign_id(f)
+                self.by_id[self.data["ids"][f]] = f
+            self.version += 1
+            return new_files
+
+    def position(self, filename):
+        """Retourne la position d'un fichier dans l'ordre trié, ou None."""
+        return self.positions.get(filename)
+
+    def id_for(self, filename):
+        """Retourne l'identifiant stable d'un fichier, ou None."""
+        return self.data["ids"].get(filename) if filename in self.positions else None
+
+    def filename_for(self, track_id):
+        """Retourne le fichier correspondant à un identifiant, ou None."""
+        return self.by_id.get(track_id)
+
+    def next_after(self, filename):
+        """Retourne le fichier suivant (avec retour au début), ou None si le catalogue est vide."""
+        if not self.files:
+            return None
+        index = self.positions.get(filename, -1)
+        return self.files[(index + 1) % len(self.files)]
+
+    def previous_before(self, filename):
+        """Retourne le fichier précédent (avec retour à la fin), ou None si le catalogue est vide."""
+        if not self.files:
+            return None
+        index = self.positions.get(filename, 0)
+        return self.files[(index - 1) % len(self.files)]
+
+catalog = TrackCatalog("audio", app_data.setdefault("catalog", {}), app_data_lock)    # Chargé après la première image
+
+# --- Playlists ---
+
+class Playlist:
+    """
+    Playlist ordonnée d'identifiants de morceaux, doublons permis. Chaque occurrence
+    est une entrée numérotée d'une liste doublement chaînée (dictionnaires suivant /
+    précédent), et les entrées de chaque morceau sont indexées : appartenance,
+    insertion, déplacement, retrait et passage au suivant se font en temps constant.
+    """
+
+    def __init__(self, track_ids=()):
+        self.track_of = {}       # {entrée: identifiant du morceau}
+        self.next = {0: 0}       # {entrée: entrée suivante} (0 : sentinelle début/fin)
+        self.prev = {0: 0}       # {entrée: entrée précédente}
+        self.entries_of = {}     # {identifiant: {entrée: None}} (occurrences dans l'ordre d'ajout)
+        self.counter = 0
+        self.version = 0         # Incrémentée à chaque modification
+        self.extend(track_ids)
+
+    def __len__(self):
+        return len(self.track_of)
+
+    def __contains__(self, track_id):
+        return track_id in self.entries_of
+
+    def __iter__(self):
+        """Parcourt les identifiants dans l'ordre de la playlist."""
+        for entry in self.entries():
+            yield self.track_of[entry]
+
+    def entries(self):
+        """Parcourt les entrées dans l'ordre de la playlist."""
+        entry = self.next[0]
+        while entry:
+            yield entry
+            entry = self.next[entry]
+
+    def track_ids(self):
+        """Retourne les identifiants distincts de la playlist."""
+        return self.entries_of.keys()
+
+    def count(self, track_id):
+        """Retourne le nombre d'occurrences d'un morceau."""
+        return len(self.entries_of.get(track_id, ()))
+
+    def insert(self, track_id, before=0):
+        """
+        Ajoute une occurrence d'un morceau.
+        
+        :param before: Entrée devant laquelle insérer (0 : en fin de playlist)
+        :return: Nouvelle entrée
+        """
+        self.counter += 1
+        entry = self.counter
+        self.track_of[entry] = track_id
+        self.entries_of.setdefault(track_id, {})[entry] = None
+        self._link(entry, before)
+        self.version += 1
+        return entry
+
+    def append(self, track_id):
+        """Ajoute un morceau en fin de playlist. Retourne la nouvelle entrée."""
+        return self.insert(track_id)
+
+    def extend(self, track_ids):
+        """Ajoute plusieurs morceaux en fin de playlist."""
+        for track_id in track_ids:
+            self.insert(track_id)
+
+    def remove_entry(self, entry):
+        """Retire une occurrence. Retourne l'identifiant du morceau, ou None."""
+        track_id = self.track_of.pop(entry, None)
+        if track_id is None:
+            return None
+        self._unlink(entry)
+        del self.next[entry], self.prev[entry]
+        entries = self.entries_of[track_id]
+        del entries[entry]
+        if not entries:
+            del self.entries_of[track_id]
+        self.version += 1
+        return track_id
+
+    def discard(self, track_id):
+        """Retire toutes les occurrences d'un morceau. Retourne le nombre d'entrées retirées."""
+        entries = list(self.entries_of.get(track_id, ()))
+        for entry in entries:
+            self.remove_entry(entry)
+        return len(entries)
+
+    def discard_many(self, track_ids):
+        """Retire toutes les occurrences de plusieurs morceaux. Retourne le nombre d'entrées retirées."""
+        return sum(self.discard(track_id) for track_id in track_ids)
+
+    def move(self, entry, before=0):
+        """Déplace une entrée devant une autre (0 : en fin de playlist)."""
+        if entry not in self.track_of or entry == before:
+            return
+        self._unlink(entry)
+        self._link(entry, before)
+        self.version += 1
+
+    def first(self):
+        """Retourne la première entrée, ou None si la playlist est vide."""
+        return self.next[0] or None
+
+    def after(self, entry):
+        """Retourne l'entrée suivante (avec retour au début), ou None si la playlist est vide."""
+        following = self.next.get(entry, 0) or self.next[0]
+        return following or None
+
+    def before(self, entry):
+        """Retourne l'entrée précédente (avec retour à la fin), ou None si la playlist est vide."""
+        preceding = self.prev.get(entry, 0) or self.prev[0]
+        return preceding or None
+
+    def find(self, track_id, near=None):
+        """
+        Retourne une occurrence d'un morceau : l'entrée near elle-même ou l'une de ses
+        voisines si elles correspondent (lecture suivie d'une playlist avec doublons),
+        sinon la première occurrence.
+        
+        :return: Entrée, ou None si le morceau n'est pas dans la playlist
+        """
+        entries = self.entries_of.get(track_id)
+        if not entries:
+            return None
+        if near in self.track_of:
+            for candidate in (near, self.after(near), self.before(near)):
+                if candidate in entries:
+                    return candidate
+        return next(iter(entries))
+
+    def to_list(self):
+        """Retourne les identifiants dans l'ordre (format enregistré)."""
+        return list(self)
+
+    def _link(self, entry, before):
+        after = self.prev[before]
+        self.next[after] = entry
+        self.prev[entry] = after
+        self.next[entry] = before
+        self.prev[before] = entry
+
+    def _unlink(self, entry):
+        after, before = self.prev[entry], self.next[entry]
+        self.next[after] = before
+        self.prev[before] = after
+
+class PlaylistStore:
+    """
+    Playlists de l'application, par identifiants stables du catalogue : renommer un
+    fichier ne casse plus les playlists. Enregistrées dans app_data["playlists"]
+    ({nom: [identifiants]}) ; les listes de noms de fichiers de l'ancien format sont
+    converties au chargement.
+    """
+
+    def __init__(self, data, catalog):
+        """
+        :param data: Dictionnaire persistant des playlists (app_data["playlists"])
+        :param catalog: Catalogue attribuant les identifiants
+        """
+        self.data = data
+        self.playlists = {}
+        self.dirty = set()       # Playlists modifiées pas encore reportées dans data
+        for name, tracks in data.items():
+            track_ids = [catalog.ensure_id(track) if isinstance(track, str) else track for track in tracks]
+            data[name] = track_ids
+            self.playlists[name] = Playlist(track_ids)
+
+    def __contains__(self, name):
+        return name in self.playlists
+
+    def names(self):
+        """Retourne les noms des playlists, dans l'ordre de création."""
+        return self.playlists.keys()
+
+    def get(self, name):
+        """Retourne une playlist, ou None."""
+        return self.playlists.get(name)
+
+    def create(self, name):
+        """Crée une playlist vide si elle n'existe pas. Retourne la playlist."""
+        if name not in self.playlists:
+            self.playlists[name] = Playlist()
+            self.save(name)
+        return self.playlists[name]
+
+    def discard_tracks(self, track_ids):
+        """Retire des morceaux de toutes les playlists (fichiers disparus)."""
+        track_ids = set(track_ids)
+        for name, playlist in self.playlists.items():
+            if not track_ids.isdisjoint(playlist.track_ids()) and playlist.discard_many(track_ids):
+                self.save(name)
+
+    def save(self, name):
+        """
+        Programme l'enregistrement d'une playlist modifiée. Sa liste n'est reconstruite
+        qu'au moment de la sérialisation de app_data (flush), pas à chaque modification.
+        """
+        self.dirty.add(name)
+        save_app_data(app_data)
+
+    def flush(self):
+        """Reporte dans app_data les playlists modifiées depuis la dernière sérialisation."""
+        for name in self.dirty:
+            self.data[name] = self.playlists[name].to_list()
+        self.dirty.clear()
+
+playlist_store = PlaylistStore(app_data["playlists"], catalog)
+app_data_snapshot_hooks.append(playlist_store.flush)
+
+# --- Index de recherche ---
+
+SEARCH_DEBOUNCE_MS = 150    # Délai avant de lancer la recherche après une frappe
+
+def normalize_text(text):
+    """Normalise un texte pour la recherche (minuscules, sans accents ni ponctuation)."""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w]+", " ", text).split())
+
+def trigrams(text):
+    """Retourne l'ensemble des trigrammes d'un texte normalisé."""
+    return {text[i:i+3] for i in range(len(text) - 2)}
+
+class SearchIndex:
+    """
+    Index de recherche par trigrammes sur les titres, artistes et tags.
+    Les requêtes d'au moins trois caractères intersectent les listes de trigrammes
+    puis vérifient les candidats ; les requêtes plus courtes parcourent les textes
+    déjà normalisés. Les résultats sont classés par pertinence.
+    """
+
+    def __init__(self):
+        self.titles = {}       # {fichier: titre normalisé}
+        self.extras = {}       # {fichier: artistes et tags normalisés}
+        self.postings = {}     # {trigramme: set(fichiers)}
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.titles)
+
+    def rebuild(self, files, tags):
+        """Reconstruit l'index complet (peut tourner dans un thread au démarrage)."""
+        with self.lock:
+            self._rebuild(files, tags)
+
+    def _rebuild(self, files, tags):
+        self.titles.clear()
+        self.extras.clear()
+        self.postings.clear()
+        for f in files:
+            self._add(f, tags.get(f, {}))
+
+    def add(self, filename, tags=None):
+        """Indexe (ou réindexe) un fichier et ses tags."""
+        with self.lock:
+            self._add(filename, tags)
+
+    def _add(self, filename, tags):
+        if filename in self.titles:
+            self._remove(filename)
+        title = normalize_text(os.path.splitext(filename)[0])
+        extra = " ".join(normalize_text(v) for v in (tags or {}).values() if v)
+        self.titles[filename] = title
+        self.extras[filename] = extra
+        for gram in trigrams(title) | trigrams(extra):
+            self.postings.setdefault(gram, set()).add(filename)
+
+    def remove(self, filename):
+        """Retire un fichier de l'index."""
+        with self.lock:
+            self._remove(filename)
+
+    def _remove(self, filename):
+        title = self.titles.pop(filename, None)
+        if title is None:
+            return
+        extra = self.extras.pop(filename, "")
+        for gram in trigrams(title) | trigrams(extra):
+            files = self.postings.get(gram)
+            if files is not None:
+                files.discard(filename)
+                if not files:
+                    del self.postings[gram]
+
+    def _candidates(self, words):
+        """Retourne les fichiers pouvant correspondre à tous les mots de la requête."""
+        grams = set()
+        for word in words:
+            grams |= trigrams(word)
+        if not grams:
+            return self.titles.keys()
+        lists = sorted((self.postings.get(g, set()) for g in grams), key=len)
+        result = set(lists[0])
+        for files in lists[1:]:
+            if not result:
+                break
+            result &= files
+        return result
+
+    def search(self, query):
+        """
+        Recherche les fichiers correspondant à la requête.
+        
+        :param query: Texte saisi
+        :return: Liste de fichiers triés par pertinence puis par nom, ou None si la requête est vide
+        """
+        query = normalize_text(query)
+        if not query:
+            return None
+        words = query.split()
+        padded_query = " " + query
+        with self.lock:
+            titles = self.titles
+            extras = self.extras
+            candidates = self._candidates(words)
+            if len(words) == 1:
+                matches = [f for f in candidates if query in titles[f] or query in extras[f]]
+            else:
+                matches = [f for f in candidates if all(w in titles[f] or w in extras[f] for w in words)]
+
+            def rank(f):
+                title = titles[f]
+                if title.startswith(query):
+                    return (0 if title == query else 1, f)
+                if padded_query in title:
+                    return (2, f)
+                if query in title:
+                    return (3, f)
+                return (4 if all(w in title for w in words) else 5, f)
+
+            matches.sort(key=rank)
+        return matches
+
+# --- Historique des lectures ---
+
+HISTORY_DB_FILE = "history.db"
+HISTORY_VIEW_LIMIT = 50     # Nombre de lectures affichées dans l'onglet Historique
+
+class PlayHistory:
+    """
+    Journal des lectures en ajout seul (SQLite). Chaque lecture est une ligne indexée
+    par date et par morceau ; le nombre de lectures et la date de dernière lecture
+    de chaque morceau sont tenus à jour à chaque ajout, sans jamais tout relire.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS plays (
+                id INTEGER PRIMARY KEY,
+                track TEXT NOT NULL,
+                played_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS plays_by_time ON plays (played_at);
+            CREATE INDEX IF NOT EXISTS plays_by_track ON plays (track, played_at);
+            CREATE TABLE IF NOT EXISTS track_stats (
+                track TEXT PRIMARY KEY,
+                play_count INTEGER NOT NULL,
+                last_played REAL NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def add(self, track, played_at=None):
+        """
+        Enregistre une lecture.
+        
+        :param track: Nom du fichier joué
+        :param played_at: Horodatage (secondes depuis l'epoch), maintenant par défaut
+        :return: Identifiant de la lecture
+        """
+        if played_at is None:
+            played_at = time.time()
+        with self.lock, self.conn:
+            cursor = self.conn.execute("INSERT INTO plays (track, played_at) VALUES (?, ?)", (track, played_at))
+            self._bump(track, played_at)
+            return cursor.lastrowid
+
+    def _bump(self, track, played_at, count=1):
+        self.conn.execute(
+            "INSERT INTO track_stats (track, play_count, last_played) VALUES (?, ?, ?) "
+            "ON CONFLICT(track) DO UPDATE SET play_count = play_count + excluded.play_count, "
+            "last_played = MAX(last_played, excluded.last_played)",
+            (track, count, played_at)
+        )
+
+    def rename(self, renamed):
+        """
+        Reporte les lectures de morceaux renommés sur leur nouveau nom.
+        
+        :param renamed: {ancien nom: nouveau nom}
+        """
+        with self.lock, self.conn:
+            for old, new in renamed.items():
+                self.conn.execute("UPDATE plays SET track = ? WHERE track = ?", (new, old))
+                self.conn.execute(
+                    "INSERT INTO track_stats (track, play_count, last_played) "
+                    "SELECT ?, play_count, last_played FROM track_stats WHERE track = ? "
+                    "ON CONFLICT(track) DO UPDATE SET play_count = play_count + excluded.play_count, "
+                    "last_played = MAX(last_played, excluded.last_played)",
+                    (new, old)
+                )
+                self.conn.execute("DELETE FROM track_stats WHERE track = ?", (old,))
+
+    def import_entries(self, entries):
+        """Importe l'ancien historique JSON ([{"file": ..., "timestamp": iso}, ...])."""
+        with self.lock, self.conn:
+            for entry in entries:
+                try:
+                    played_at = datetime.fromisoformat(entry["timestamp"]).timestamp()
+                except Exception:
+                    continue
+                self.conn.execute("INSERT INTO plays (track, played_at) VALUES (?, ?)", (entry["file"], played_at))
+                self._bump(entry["file"], played_at)
+
+    def recent(self, limit=HISTORY_VIEW_LIMIT):
+        """Retourne les dernières lectures [(id, horodatage, fichier)], la plus récente en premier."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, played_at, track FROM plays ORDER BY played_at DESC, id DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+    def between(self, start, end):
+        """Retourne les lectures dont l'horodatage est dans [start, end[."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, played_at, track FROM plays WHERE played_at >= ? AND played_at < ? ORDER BY played_at",
+                (start, end)
+            ).fetchall()
+
+    def plays_of(self, track, limit=None):
+        """Retourne les horodatages de lecture d'un morceau, le plus récent en premier."""
+        query = "SELECT played_at FROM plays WHERE track = ? ORDER BY played_at DESC"
+        params = (track,)
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (track, limit)
+        with self.lock:
+            return [row[0] for row in self.conn.execute(query, params)]
+
+    def stats(self, track):
+        """Retourne (nombre de lectures, dernière lecture) d'un morceau, ou (0, None)."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT play_count, last_played FROM track_stats WHERE track = ?", (track,)
+            ).fetchone()
+        return row if row else (0, None)
+
+    def all_stats(self):
+        """Retourne {fichier: (nombre de lectures, dernière lecture)} pour tous les morceaux joués."""
+        with self.lock:
+            return {track: (count, last) for track, count, last in
+                    self.conn.execute("SELECT track, play_count, last_played FROM track_stats")}
+
+    def most_played(self, limit=20):
+        """Retourne les morceaux les plus joués [(fichier, nombre de lectures)]."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT track, play_count FROM track_stats ORDER BY play_count DESC, last_played DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+history_store = PlayHistory(HISTORY_DB_FILE)
+atexit.register(history_store.close)
+# Migration de l'ancien historique stocké dans app_data.json
+if "history" in app_data:
+    history_store.import_entries(app_data.pop("history"))
+    save_app_data(app_data)
+
+search_index = SearchIndex()
+
+# --- Analyse des métadonnées ---
+
+METADATA_DB_FILE = "metadata.db"
+# Lecture des fichiers en parallèle : l'analyse par mutagen, en Python pur, reste
+# sérialisée par le GIL ; les threads ne recouvrent que les attentes du disque
+# (voir metadata_scan_cold et metadata_scan_cold_1_worker dans benchmark.py)
+METADATA_SCAN_WORKERS = 4
+METADATA_FIELDS = ("artist", "album", "title", "genre")
+METADATA_BATCH = 500         # Lignes écrites par transaction
+
+@timed("metadata_read")
+def read_track_metadata(path):
+    """
+    Lit la durée, le débit et les tags (artiste, album, titre, genre) d'un fichier audio.
+    
+    :param path: Chemin du fichier
+    :return: Dictionnaire des métadonnées
+    """
+    metadata = {"duration": 0, "bitrate": 0}
+    if MutagenFile is None:
+        return metadata
+    try:
+        audio = MutagenFile(path, easy=True)
+    except Exception:
+        return metadata
+    if audio is None:
+        return metadata
+    metadata["duration"] = getattr(audio.info, "length", 0) or 0
+    metadata["bitrate"] = getattr(audio.info, "bitrate", 0) or 0
+    tags = audio.tags
+    for field in METADATA_FIELDS:
+        values = tags.get(field) if tags else None
+        if values:
+            metadata[field] = str(values[0] if isinstance(values, list) else values)
+    return metadata
+
+def track_tags(filename):
+    """Retourne les tags d'un morceau : tags lus dans le fichier, complétés par ceux saisis dans l'application."""
+    return {**metadata_scanner.tags.get(filename, {}), **app_data["tags"].get(filename, {})}
+
+class MetadataScanner:
+    """
+    Analyse en arrière-plan la durée, le débit et les tags ID3 des morceaux.
+    Les résultats sont mis en cache (SQLite) avec la date de modification et la
+    taille du fichier : seuls les fichiers nouveaux ou modifiés sont relus, par
+    quelques threads qui recouvrent les accès disque. Ils alimentent les métadonnées
+    du catalogue et l'index de recherche.
+    """
+
+    def __init__(self, db_path, directory, workers=METADATA_SCAN_WORKERS):
+        self.db_path = db_path
+        self.directory = directory
+        self.workers = workers
+        self.tags = {}                  # {fichier: {champ: valeur}}
+        self.requests = queue.Queue()
+        self.thread = None
+
+    def scan(self, files, rebuild_index=False):
+        """
+        Programme l'analyse de fichiers.
+        
+        :param files: Noms des fichiers à analyser
+        :param rebuild_index: Reconstruire l'index de recherche une fois le cache chargé
+        """
+        self.requests.put((list(files), rebuild_index))
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS metadata (
+                filename TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                duration REAL, bitrate INTEGER,
+                artist TEXT, album TEXT, title TEXT, genre TEXT
+            )
+        """)
+        conn.commit()
+        while True:
+            files, rebuild_index = self.requests.get()
+            try:
+                self._scan(conn, files, rebuild_index)
+            except Exception as e:
+                print(f"Erreur analyse des métadonnées : {e}")
+            finally:
+                self.requests.task_done()
+
+    def wait(self):
+        """Attend la fin des analyses programmées."""
+        self.requests.join()
+
+    def _apply(self, filename, metadata, update_index=True):
+        catalog.metadata.setdefault(filename, {}).update(duration=metadata["duration"], bitrate=metadata["bitrate"])
+        self.tags[filename] = {field: metadata[field] for field in METADATA_FIELDS if metadata.get(field)}
+        if update_index:
+            search_index.add(filename, track_tags(filename))
+
+    def _scan(self, conn, files, rebuild_index):
+        columns = ("duration", "bitrate") + METADATA_FIELDS
+        if len(files) > METADATA_BATCH:
+            cached = {row[0]: row for row in conn.execute("SELECT * FROM metadata")}
+        else:
+            cached = {}
+            for f in files:
+                row = conn.execute("SELECT * FROM metadata WHERE filename = ?", (f,)).fetchone()
+                if row:
+                    cached[f] = row
+        todo = []
+        for f in files:
+            try:
+                st = os.stat(os.path.join(self.directory, f))
+            except OSError:
+                continue
+            row = cached.get(f)
+            if row and row[1] == st.st_mtime_ns and row[2] == st.st_size:
+                self._apply(f, dict(zip(columns, row[3:])), update_index=not rebuild_index)
+            else:
+                todo.append((f, st))
+        if rebuild_index:
+            search_index.rebuild(list(catalog.files), {f: track_tags(f) for f in catalog.files})
+        if not todo:
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            paths = [os.path.join(self.directory, f) for f, _ in todo]
+            for i, ((f, st), metadata) in enumerate(zip(todo, pool.map(read_track_metadata, paths))):
+                self._apply(f, metadata)
+                conn.execute(
+                    "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (f, st.st_mtime_ns, st.st_size, *(metadata.get(c) for c in columns))
+                )
+                if (i + 1) % METADATA_BATCH == 0:
+                    conn.commit()
+        conn.commit()
+
+metadata_scanner = MetadataScanner(METADATA_DB_FILE, "audio")
+
+# --- Index de positionnement des MP3 ---
+
+SEEK_INDEX_STEP = 38         # Trames entre deux entrées de l'index (~1 s à 44,1 kHz)
+SEEK_INDEX_MEMORY = 16       # Index gardés en mémoire
+
+MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),    # MPEG-1 Layer III
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),        # MPEG-2 et 2.5 Layer III
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+def parse_mp3_frame_header(header):
+    """
+    Décode l'en-tête (4 octets) d'une trame MPEG Layer III.
+    
+    :return: (longueur de la trame en octets, échantillons, fréquence) ou None si l'en-tête est invalide
+    """
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 3
+    layer = (header[1] >> 1) & 3
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 1
+    if mpeg1:
+        return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+    return 72 * bitrate // sample_rate + padding, 576, sample_rate
+
+def mp3_audio_start(data):
+    """Retourne l'offset du premier octet après un éventuel tag ID3v2."""
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    return 10 + size + (10 if data[5] & 0x10 else 0)
+
+def find_mp3_frame(data, offset):
+    """Cherche la prochaine trame valide (suivie d'une autre trame valide) à partir d'offset."""
+    while True:
+        offset = data.find(b"\xff", offset)
+        if offset < 0:
+            return None
+        frame = parse_mp3_frame_header(data[offset:offset + 4])
+        if frame and parse_mp3_frame_header(data[offset + frame[0]:offset + frame[0] + 4]):
+            return offset
+        offset += 1
+
+class Mp3SeekIndex:
+    """
+    Table (offset, échantillon) d'une entrée toutes les SEEK_INDEX_STEP trames,
+    construite en parcourant les en-têtes de trames (exacte pour les MP3 VBR).
+    """
+
+    def __init__(self, sample_rate, total_samples, offsets, samples):
+        self.sample_rate = sample_rate
+        self.total_samples = total_samples
+        self.offsets = offsets       # array("Q") des offsets des trames indexées
+        self.samples = samples       # array("Q") des échantillons écoulés avant ces trames
+
+    @classmethod
+    def scan(cls, path):
+        """Parcourt les trames d'un MP3. Retourne None si aucune trame n'est trouvée."""
+        offsets, samples = array.array("Q"), array.array("Q")
+        sample_rate = None
+        total = 0
+        count = 0
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = find_mp3_frame(data, mp3_audio_start(data))
+            while offset is not None:
+                frame = parse_mp3_frame_header(data[offset:offset + 4])
+                if frame is None or offset + frame[0] > len(data):
+                    offset = find_mp3_frame(data, offset + 1)
+                    continue
+                length, frame_samples, rate = frame
+                if sample_rate is None:
+                    sample_rate = rate
+                    # Trame d'information Xing/Info/VBRI : ignorée par les décodeurs
+                    head = data[offset + 4:offset + 40]
+                    if b"Xing" in head or b"Info" in head or data[offset + 36:offset + 40] == b"VBRI":
+                        offset += length
+                        continue
+                if count % SEEK_INDEX_STEP == 0:
+                    offsets.append(offset)
+                    samples.append(total)
+                total += frame_samples
+                count += 1
+                offset += length
+        if sample_rate is None or not offsets:
+            return None
+        return cls(sample_rate, total, offsets, samples)
+
+    def locate(self, path, seconds):
+        """
+        Trouve la trame contenant une position.
+        
+        :return: (offset de la trame, position exacte en secondes de son début)
+        """
+        target = max(0, int(seconds * self.sample_rate))
+        i = max(0, bisect.bisect_right(self.samples, target) - 1)
+        offset, sample = self.offsets[i], self.samples[i]
+        # Au plus SEEK_INDEX_STEP en-têtes à lire depuis l'entrée de l'index
+        with open(path, "rb") as f:
+            for _ in range(SEEK_INDEX_STEP):
+                f.seek(offset)
+                frame = parse_mp3_frame_header(f.read(4))
+                if frame is None or sample + frame[1] > target:
+                    break
+                offset += frame[0]
+                sample += frame[1]
+        return offset, sample / self.sample_rate
+
+class Mp3SeekIndexStore:
+    """
+    Index de positionnement des MP3, construits en arrière-plan au lancement d'un
+    morceau et mis en cache dans la base des métadonnées (date de modification et
+    taille du fichier comprises), puis gardés en mémoire pour les derniers morceaux.
+    """
+
+    def __init__(self, db_path, directory):
+        self.db_path = db_path
+        self.directory = directory
+        self.memory = OrderedDict()     # {fichier: (mtime_ns, taille, Mp3SeekIndex)}
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.thread = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS seek_index (
+                filename TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                sample_rate INTEGER, total_samples INTEGER,
+                offsets BLOB, samples BLOB
+            )
+        """)
+        return conn
+
+    def _remember(self, filename, st, index):
+        with self.lock:
+            self.memory[filename] = (st.st_mtime_ns, st.st_size, index)
+            self.memory.move_to_end(filename)
+            if len(self.memory) > SEEK_INDEX_MEMORY:
+                self.memory.popitem(last=False)
+
+    def get(self, filename):
+        """Retourne l'index à jour d'un MP3, ou None s'il n'a pas encore été construit."""
+        if not filename or not filename.lower().endswith(".mp3"):
+            return None
+        try:
+            st = os.stat(os.path.join(self.directory, filename))
+        except OSError:
+            return None
+        with self.lock:
+            cached = self.memory.get(filename)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT sample_rate, total_samples, offsets, samples FROM seek_index WHERE filename = ? AND mtime_ns = ? AND size = ?",
+                (filename, st.st_mtime_ns, st.st_size)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        index = Mp3SeekIndex(row[0], row[1], array.array("Q", row[2]), array.array("Q", row[3]))
+        self._remember(filename, st, index)
+        return index
+
+    def request(self, filename):
+        """Programme la construction de l'index d'un MP3 s'il manque."""
+        if not filename.lower().endswith(".mp3"):
+            return
+        self.requests.put(filename)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            filename = self.requests.get()
+            try:
+                if self.get(filename) is None and os.path.exists(os.path.join(self.directory, filename)):
+                    self.build(filename)
+            except Exception as e:
+                print(f"Erreur index de positionnement de {filename} : {e}")
+
+    @timed("seek_index_build")
+    def build(self, filename):
+        """Parcourt un MP3 et enregistre son index."""
+        path = os.path.join(self.directory, filename)
+        st = os.stat(path)
+        index = Mp3SeekIndex.scan(path)
+        if index is None:
+            return None
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO seek_index VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (filename, st.st_mtime_ns, st.st_size, index.sample_rate, index.total_samples,
+                     index.offsets.tobytes(), index.samples.tobytes())
+                )
+        finally:
+            conn.close()
+        self._remember(filename, st, index)
+        return index
+
+seek_index_store = Mp3SeekIndexStore(METADATA_DB_FILE, "audio")
+
+class FileSlice(io.RawIOBase):
+    """Fichier en lecture seule vu à partir d'un offset (le début d'une trame MP3)."""
+
+    def __init__(self, path, start):
+        super().__init__()
+        self.file = open(path, "rb")
+        self.start = start
+        self.file.seek(start)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self.file.readinto(buffer)
+
+    def seek(self, position, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position += self.start
+        return self.file.seek(position, whence) - self.start
+
+    def tell(self):
+        return self.file.tell() - self.start
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+# --- Surveillance des dossiers ---
+
+WATCH_DEBOUNCE_S = 0.5       # Calme requis avant d'appliquer les changements regroupés
+WATCH_MAX_DELAY_S = 3.0      # Délai maximal d'application pendant un flot continu de changements
+WATCH_POLL_S = 5.0           # Période de scrutation quand inotify n'est pas disponible
+
+# Masques inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+class DirectoryWatcher:
+    """
+    Surveille des dossiers et signale, par lots, les fichiers ajoutés, supprimés
+    ou renommés. Utilise inotify sous Linux (écritures terminées, déplacements et
+    suppressions), sinon compare périodiquement le contenu des dossiers. Les
+    événements sont regroupés jusqu'à un court calme, de sorte qu'une copie de
+    milliers de fichiers ne produit que quelques lots.
+    """
+
+    def __init__(self, directories, on_changes):
+        """
+        :param directories: Dossiers à surveiller (créés s'ils n'existent pas)
+        :param on_changes: Fonction appelée (depuis le thread de surveillance) avec un lot
+            {dossier: {"present": set, "absent": set, "renamed": {ancien: nouveau}}},
+            ou None si les événements ont débordé (relecture complète nécessaire)
+        """
+        self.directories = list(directories)
+        self.on_changes = on_changes
+        self.touched = {d: set() for d in self.directories}
+        self.renamed = {d: {} for d in self.directories}
+        self.first_event = None
+        self.last_event = None
+        self.thread = None
+
+    def start(self):
+        for d in self.directories:
+            os.makedirs(d, exist_ok=True)
+        try:
+            fd = self._open_inotify()
+        except OSError as e:
+            print(f"Surveillance par scrutation des dossiers ({e})")
+            target, args = self._run_polling, ()
+        else:
+            target, args = self._run_inotify, (fd,)
+        self.thread = threading.Thread(target=target, args=args, daemon=True)
+        self.thread.start()
+
+    def _touch(self, directory, name):
+        now = time.monotonic()
+        self.touched[directory].add(name)
+        self.first_event = self.first_event or now
+        self.last_event = now
+
+    def _rename(self, directory, old, new):
+        renamed = self.renamed[directory]
+        # Renommages successifs a -> b -> c : seul a -> c est conservé
+        origin = next((k for k, v in renamed.items() if v == old), old)
+        renamed[origin] = new
+        self._touch(directory, new)
+
+    def _due(self):
+        """Indique si le lot en attente doit être appliqué."""
+        if self.first_event is None:
+            return False
+        now = time.monotonic()
+        return now - self.last_event >= WATCH_DEBOUNCE_S or now - self.first_event >= WATCH_MAX_DELAY_S
+
+    def _flush(self):
+        changes = {}
+        for d in self.directories:
+            present, absent = set(), set()
+            for name in self.touched[d]:
+                (present if os.path.exists(os.path.join(d, name)) else absent).add(name)
+            renamed = {old: new for old, new in self.renamed[d].items() if new in present and old != new}
+            absent -= set(renamed)
+            present -= set(renamed.values())
+            if present or absent or renamed:
+                changes[d] = {"present": present, "absent": absent, "renamed": renamed}
+            self.touched[d] = set()
+            self.renamed[d] = {}
+        self.first_event = self.last_event = None
+        if changes:
+            self.on_changes(changes)
+
+    # --- inotify ---
+
+    def _open_inotify(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify indisponible sur cette plateforme")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.watches = {}
+        mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+        for d in self.directories:
+            wd = libc.inotify_add_watch(fd, os.fsencode(d), mask)
+            if wd < 0:
+                os.close(fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch {d}")
+            self.watches[wd] = d
+        return fd
+
+    def _run_inotify(self, fd):
+        moves = {}    # {cookie: (dossier, ancien nom)} en attente de leur IN_MOVED_TO
+        while True:
+            timeout = WATCH_DEBOUNCE_S if self.first_event is not None else None
+            readable, _, _ = select.select([fd], [], [], timeout)
+            if readable:
+                data = os.read(fd, 64 * 1024)
+                offset = 0
+                while offset < len(data):
+                    wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+                    name = os.fsdecode(data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0"))
+                    offset += INOTIFY_EVENT.size + length
+                    if mask & IN_Q_OVERFLOW:
+                        moves.clear()
+                        self.touched = {d: set() for d in self.directories}
+                        self.renamed = {d: {} for d in self.directories}
+                        self.first_event = self.last_event = None
+                        self.on_changes(None)
+                        continue
+                    directory = self.watches.get(wd)
+                    if directory is None or mask & IN_ISDIR:
+                        continue
+                    if mask & IN_MOVED_FROM:
+                        moves[cookie] = (directory, name)
+                        self._touch(directory, name)
+                    elif mask & IN_MOVED_TO and moves.get(cookie, (None,))[0] == directory:
+                        self._rename(directory, moves.pop(cookie)[1], name)
+                    else:
+                        self._touch(directory, name)
+            if self._due():
+                # Déplacements sans arrivée dans un dossier surveillé : simples suppressions
+                moves.clear()
+                self._flush()
+
+    # --- Scrutation ---
+
+    def _listing(self, directory):
+        try:
+            with os.scandir(directory) as entries:
+                return {e.name: (e.stat().st_mtime_ns, e.stat().st_size) for e in entries if e.is_file()}
+        except OSError:
+            return {}
+
+    def _run_polling(self):
+        listings = {d: self._listing(d) for d in self.directories}
+        while True:
+            time.sleep(WATCH_POLL_S)
+            for d in self.directories:
+                listing = self._listing(d)
+                previous = listings[d]
+                for name in previous.keys() ^ listing.keys():
+                    self._touch(d, name)
+                for name in previous.keys() & listing.keys():
+                    if previous[name] != listing[name]:
+                        self._touch(d, name)
+                listings[d] = listing
+            if self.first_event is not None:
+                self._flush()
+
+mark_startup("données")
+
+# --- Initialisation de pygame ---
+
+def init_audio():
+    """Importe pygame puis initialise le mixer et la file d'événements (fin de morceau)."""
+    global pygame
+    import pygame
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.mixer.init()
+    pygame.display.init()
+
+# --- Configuration de CustomTkinter ---
+ctk.set_appearance_mode(app_data["settings"].get("theme", "Dark"))
+ctk.set_default_color_theme("green")
+
+# --- Variables Globales ---
+
+audio_duration = 0  
+seek_offset = 0                  # Position (s) à laquelle la lecture a été (re)lancée
+is_paused = False
+cover_img_global = None
+loop_enabled = False
+shuffle_enabled = app_data["settings"].get("shuffle", False)
+
+# Gestion de la playlist active
+current_playlist = None            # Nom de la playlist en cours
+current_playlist_entry = None      # Entrée (occurrence) de la playlist active en cours de lecture
+current_playlist_selected = None   # Playlist affichée dans l'onglet Playlists
+
+# Dictionnaires et listes de gestion
+playlists = {}                   # Autres playlists que "Favoris"
+current_file = None              # Fichier en cours de lecture
+queued_track = None              # (fichier, playlist, entrée) mis en file dans pygame pour l'enchaînement
+prefetched_covers = {}           # {fichier: pochette composée préparée à l'avance}
+cover_placeholder_img = None     # Pochette neutre affichée pendant le rendu
+library_list = None              # Liste virtualisée de la bibliothèque
+
+# --- Fonctions utilitaires ---
+
+def round_rectangle_points(x1, y1, x2, y2, radius=6):
+    """Retourne les points du polygone lissé d'un rectangle aux coins arrondis."""
+    if x2 - x1 < 2 * radius:
+        radius = (x2 - x1) / 2
+    if y2 - y1 < 2 * radius:
+        radius = (y2 - y1) / 2
+    return [
+        x1+radius, y1,
+        x2-radius, y1,
+        x2, y1,
+        x2, y1+radius,
+        x2, y2-radius,
+        x2, y2,
+        x2-radius, y2,
+        x1+radius, y2,
+        x1, y2,
+        x1, y2-radius,
+        x1, y1+radius,
+        x1, y1
+    ]
+
+def round_rectangle(canvas, x1, y1, x2, y2, radius=6, **kwargs):
+    """Dessine un rectangle aux coins arrondis sur le canvas."""
+    return canvas.create_polygon(round_rectangle_points(x1, y1, x2, y2, radius), smooth=True, **kwargs)
+
+def add_rounded_corners(im, radius):
+    """
+    Ajoute des coins arrondis à une image.
+    
+    :param im: Image PIL
+    :param radius: Rayon des coins
+    :return: Image modifiée avec transparence aux coins
+    """
+    im = im.convert("RGBA")
+    circle = Image.new('L', (radius * 2, radius * 2), 0)
+    draw = ImageDraw.Draw(circle)
+    draw.ellipse((0, 0, radius * 2, radius * 2), fill=255)
+    alpha = Image.new('L', im.size, 255)
+    w, h = im.size
+    alpha.paste(circle.crop((0, 0, radius, radius)), (0, 0))
+    alpha.paste(circle.crop((radius, 0, radius * 2, radius)), (w - radius, 0))
+    alpha.paste(circle.crop((0, radius, radius, radius * 2)), (0, h - radius))
+    alpha.paste(circle.crop((radius, radius, radius * 2, radius * 2)), (w - radius, h - radius))
+    im.putalpha(alpha)
+    return im
+
+def create_default_cover(size=(300, 300)):
+    """
+    Crée une pochette par défaut en cas d'absence d'image.
+    
+    :param size: Taille de l'image
+    :return: Image PIL générée
+    """
+    img = Image.new("RGB", size, color="#333333")
+    draw = ImageDraw.Draw(img)
+    font_size = int(size[0] // 10)
+    try:
+        font = ImageFont.truetype("arial.ttf", font_size)
+    except Exception:
+        font = ImageFont.load_default()
+    text = "No Cover"
+    text_width, text_height = draw.textsize(text, font=font)
+    pos = ((size[0] - text_width) // 2, (size[1] - text_height) // 2)
+    draw.text(pos, text, fill="#FFFFFF", font=font)
+    return img
+
+# --- Cache disque des pochettes composées ---
+
+COVER_DIR = "Pochette_album"
+COVER_CACHE_DIR = os.path.join(".cache", "covers")
+COVER_CACHE_VERSION = 1
+
+# Géométries utilisées par le lecteur : (taille nette, taille du fond flouté, rayon du flou, rayon des coins)
+LIBRARY_COVER_GEOMETRY = (60, 70, 5, 10)
+NOW_PLAYING_COVER_GEOMETRY = (300, 340, 10, 30)
+
+def cover_path_for(filename):
+    """Retourne le chemin de la pochette associée à un fichier audio."""
+    base_name = os.path.splitext(filename)[0]
+    return os.path.join(COVER_DIR, f"{base_name}.jpg")
+
+def cover_cache_key(cover_path, geometry):
+    """
+    Calcule la clé de cache d'une pochette composée.
+    
+    :param cover_path: Chemin de l'image source (ou None pour la pochette par défaut)
+    :param geometry: Tuple (taille nette, taille du fond, flou, rayon)
+    :return: Empreinte hexadécimale basée sur le chemin, mtime, taille et géométrie
+    """
+    if cover_path and os.path.exists(cover_path):
+        st = os.stat(cover_path)
+        source = f"{os.path.abspath(cover_path)}|{st.st_mtime_ns}|{st.st_size}"
+    else:
+        source = "default"
+    raw = f"{COVER_CACHE_VERSION}|{source}|{'x'.join(str(v) for v in geometry)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def open_cover_source(cover_path, target_size):
+    """
+    Ouvre l'image source en décodage réduit lorsque c'est possible (JPEG).
+    
+    :param cover_path: Chemin de l'image source
+    :param target_size: Taille minimale souhaitée (largeur, hauteur)
+    :return: Image PIL en RGB
+    """
+    img = Image.open(cover_path)
+    # Le décodeur JPEG peut sauter directement à une échelle 1/2, 1/4 ou 1/8
+    img.draft("RGB", target_size)
+    return img.convert("RGB")
+
+def compose_cover(img, geometry):
+    """
+    Compose la pochette : image nette centrée sur un fond flouté, coins arrondis.
+    
+    :param img: Image PIL source
+    :param geometry: Tuple (taille nette, taille du fond, flou, rayon)
+    :return: Image RGBA finale
+    """
+    inner, outer, blur_radius, corner_radius = geometry
+    cover_clear = ImageOps.fit(img, (inner, inner), method=Image.LANCZOS, centering=(0.5, 0.5))
+    bg_size = (outer, outer)
+    blurred = cover_clear.resize(bg_size).filter(ImageFilter.GaussianBlur(radius=blur_radius))
+    composite = blurred.copy()
+    offset = ((bg_size[0]-cover_clear.width)//2, (bg_size[1]-cover_clear.height)//2)
+    composite.paste(cover_clear, offset)
+    return add_rounded_corners(composite, radius=corner_radius)
+
+@timed("cover_render")
+def render_cover(cover_path, geometry):
+    """
+    Retourne la pochette composée, depuis le cache disque si elle y est déjà.
+    
+    :param cover_path: Chemin de l'image source (absente -> pochette par défaut)
+    :param geometry: Tuple (taille nette, taille du fond, flou, rayon)
+    :return: Image RGBA finale
+    """
+    key = cover_cache_key(cover_path, geometry)
+    cached_path = os.path.join(COVER_CACHE_DIR, f"{key}.png")
+    if os.path.exists(cached_path):
+        try:
+            with Image.open(cached_path) as cached:
+                return cached.convert("RGBA")
+        except Exception:
+            pass
+    inner, outer = geometry[0], geometry[1]
+    if cover_path and os.path.exists(cover_path):
+        try:
+            img = open_cover_source(cover_path, (outer, outer))
+        except Exception:
+            img = create_default_cover(size=(inner, inner))
+    else:
+        img = create_default_cover(size=(inner, inner))
+    final_img = compose_cover(img, geometry)
+    try:
+        os.makedirs(COVER_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cached_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        final_img.save(tmp_path, format="PNG", compress_level=1)
+        os.replace(tmp_path, cached_path)
+    except Exception as e:
+        print(f"Erreur écriture cache pochette : {e}")
+    return final_img
+
+class CoverRenderer:
+    """
+    Rend une pochette dans un thread dédié. Seule la dernière demande compte :
+    les demandes remplacées avant d'être traitées sont abandonnées, et le résultat
+    d'un rendu devenu obsolète entre-temps n'est pas transmis.
+    """
+
+    def __init__(self, geometry):
+        self.geometry = geometry
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pending = None
+        self.generation = 0
+        self.thread = None
+
+    def request(self, filename, on_ready):
+        """
+        Demande le rendu de la pochette d'un fichier.
+        
+        :param filename: Nom du fichier audio
+        :param on_ready: Fonction (fichier, image) appelée depuis le thread de rendu
+        """
+        with self.lock:
+            self.generation += 1
+            self.pending = (self.generation, filename, on_ready)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+
+    def cancel(self):
+        """Abandonne la demande en cours."""
+        with self.lock:
+            self.generation += 1
+            self.pending = None
+
+    def _run(self):
+        while True:
+            self.wakeup.wait()
+            with self.lock:
+                job, self.pending = self.pending, None
+                self.wakeup.clear()
+            if job is None:
+                continue
+            generation, filename, on_ready = job
+            try:
+                img = render_cover(cover_path_for(filename), self.geometry)
+            except Exception as e:
+                print(f"Erreur chargement cover : {e}")
+                continue
+            with self.lock:
+                stale = generation != self.generation
+            if not stale:
+                on_ready(filename, img)
+
+now_playing_renderer = CoverRenderer(NOW_PLAYING_COVER_GEOMETRY)
+
+# --- Formes d'onde ---
+
+WAVEFORM_POINTS = 300        # Intervalles résumés par morceau
+WAVEFORM_RATE = 4000         # Fréquence (Hz) du décodage mono servant au calcul
+WAVEFORM_FILE = os.path.join(".cache", f"waveforms-{WAVEFORM_POINTS}.dat")
+WAVEFORM_GROWTH = 1024       # Enregistrements ajoutés à chaque agrandissement du fichier
+
+def decode_waveform_samples(path):
+    """
+    Décode un fichier audio en échantillons mono 16 bits à WAVEFORM_RATE via FFmpeg.
+    
+    :return: Tableau numpy int16, ou None si FFmpeg est indisponible ou échoue
+    """
+    import numpy as np
+    ffmpeg_path = find_ffmpeg()
+    if not ffmpeg_path:
+        return None
+    result = subprocess.run(
+        [ffmpeg_path, "-v", "error", "-i", path, "-ac", "1", "-ar", str(WAVEFORM_RATE), "-f", "s16le", "-"],
+        capture_output=True,
+        creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+    )
+    if result.returncode != 0:
+        return None
+    return np.frombuffer(result.stdout, dtype="<i2")
+
+def summarize_waveform(samples, points=WAVEFORM_POINTS):
+    """
+    Calcule la crête et la valeur RMS de chaque intervalle (opérations vectorisées).
+    
+    :param samples: Échantillons int16
+    :return: (crêtes, RMS) en uint8 (0-255), points valeurs chacun
+    """
+    import numpy as np
+    amplitude = np.abs(samples.astype(np.float32)) / 32768
+    if len(amplitude) < points:
+        amplitude = np.pad(amplitude, (0, points - len(amplitude)))
+    edges = np.linspace(0, len(amplitude), points + 1).astype(np.int64)
+    peak = np.maximum.reduceat(amplitude, edges[:-1])
+    rms = np.sqrt(np.add.reduceat(amplitude * amplitude, edges[:-1]) / np.diff(edges))
+    return (np.clip(peak, 0, 1) * 255).round().astype(np.uint8), (np.clip(rms, 0, 1) * 255).round().astype(np.uint8)
+
+class WaveformStore:
+    """
+    Résumés de forme d'onde des morceaux, calculés une seule fois en arrière-plan.
+    Ils sont stockés dans un fichier binaire à enregistrements de taille fixe
+    (date de modification, taille, crêtes, RMS), indexé par l'identifiant stable du
+    catalogue et lu par projection mémoire : afficher une forme d'onde ne coûte
+    qu'une lecture de quelques centaines d'octets.
+    """
+
+    def __init__(self, path, points=WAVEFORM_POINTS):
+        self.path = path
+        self.points = points
+        self.memmap = None
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.pending = set()
+        self.thread = None
+
+    def _dtype(self):
+        import numpy as np
+        return np.dtype([("mtime_ns", "<i8"), ("size", "<i8"), ("peak", "u1", (self.points,)), ("rms", "u1", (self.points,))])
+
+    def _records(self, minimum=0):
+        """Retourne la projection mémoire du fichier, agrandi si nécessaire (verrou tenu)."""
+        import numpy as np
+        dtype = self._dtype()
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size < minimum * dtype.itemsize:
+            # La projection doit être libérée avant de modifier la taille du fichier (Windows)
+            self.memmap = None
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            count = (minimum // WAVEFORM_GROWTH + 1) * WAVEFORM_GROWTH
+            with open(self.path, "ab") as f:
+                f.truncate(count * dtype.itemsize)
+        elif size == 0:
+            return None
+        if self.memmap is None:
+            self.memmap = np.memmap(self.path, dtype=dtype, mode="r+")
+        return self.memmap
+
+    def get(self, filename):
+        """
+        Retourne le résumé à jour d'un morceau.
+        
+        :return: (crêtes, RMS) en flottants 0-1, ou None s'il n'a pas encore été calculé
+        """
+        track_id = catalog.id_for(filename)
+        if track_id is None:
+            return None
+        try:
+            st = os.stat(os.path.join(catalog.directory, filename))
+            with self.lock:
+                records = self._records()
+                if records is None or track_id >= len(records):
+                    return None
+                record = records[track_id]
+                if record["mtime_ns"] != st.st_mtime_ns or record["size"] != st.st_size:
+                    return None
+                return record["peak"] / 255, record["rms"] / 255
+        except (ImportError, OSError, ValueError):
+            return None
+
+    def request(self, filename, on_ready=None):
+        """
+        Programme le calcul du résumé d'un morceau s'il manque ou est périmé.
+        
+        :param on_ready: Fonction appelée (depuis le thread de calcul) avec le nom du fichier
+        """
+        self.requests.put((filename, on_ready))
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            filename, on_ready = self.requests.get()
+            try:
+                if self.get(filename) is None and self.compute(filename) and on_ready:
+                    on_ready(filename)
+            except ImportError:
+                return    # numpy absent : barre de progression simple
+            except Exception as e:
+                print(f"Erreur forme d'onde de {filename} : {e}")
+
+    @timed("waveform_compute")
+    def compute(self, filename):
+        """Décode un morceau et enregistre son résumé. Retourne True en cas de succès."""
+        track_id = catalog.id_for(filename)
+        if track_id is None:
+            return False
+        path = os.path.join(catalog.directory, filename)
+        st = os.stat(path)
+        samples = decode_waveform_samples(path)
+        if samples is None:
+            return False
+        peak, rms = summarize_waveform(samples, self.points)
+        with self.lock:
+            records = self._records(track_id + 1)
+            records[track_id] = (st.st_mtime_ns, st.st_size, peak, rms)
+            records.flush()
+        return True
+
+waveform_store = WaveformStore(WAVEFORM_FILE)
+
+# --- Fondu enchaîné ---
+
+CROSSFADE_CHOICES = {"Désactivé": 0, "3 s": 3, "6 s": 6, "10 s": 10}
+CROSSFADE_LEAD_S = 2.0           # Décodage lancé avant le début du fondu
+CROSSFADE_MARGIN_S = 0.5         # Fin de morceau décodée en plus, avant le début prévu du fondu
+CROSSFADE_BLOCK_S = 0.25         # Durée d'un bloc PCM joué sur le canal
+CROSSFADE_BUFFER_BLOCKS = 8      # Blocs décodés d'avance au maximum (file bornée)
+CROSSFADE_DECLICK_S = 0.01       # Rampe d'entrée du premier bloc, qui prend le relais du flux
+
+class CrossfadeEngine:
+    """
+    Fondu enchaîné entre deux morceaux. La fin du morceau en cours est décodée par
+    FFmpeg en PCM au format du mixer, par blocs NumPy placés dans une file bornée
+    (FFmpeg est freiné par le tube quand elle est pleine) ; au début du fondu, elle
+    passe sur un canal réservé avec une rampe de gain vectorisée, pendant que le
+    morceau suivant démarre en fondu d'entrée sur pygame.mixer.music. Le mixer de
+    SDL additionne les deux : le morceau suivant n'a jamais à changer de source.
+    """
+
+    def __init__(self):
+        self.session = 0         # Incrémentée à chaque préparation ou annulation
+        self.blocks = None       # File bornée de (horodatage, échantillons) ; None marque la fin
+        self.process = None
+        self.channel = None
+        self.lock = threading.Lock()
+
+    def prepare(self, path, start):
+        """
+        Lance en arrière-plan le décodage de la fin d'un morceau.
+        
+        :param path: Fichier du morceau en cours
+        :param start: Position (s) à partir de laquelle décoder
+        :return: False si le fondu est indisponible (numpy ou FFmpeg absent, mixer non 16 bits)
+        """
+        self.cancel()
+        if importlib.util.find_spec("numpy") is None:
+            return False    # numpy absent : enchaînement sans fondu
+        mixer = pygame.mixer.get_init()
+        ffmpeg_path = find_ffmpeg()
+        if mixer is None or mixer[1] != -16 or not ffmpeg_path:
+            return False
+        frequency, _, channels = mixer
+        with self.lock:
+            session = self.session
+            self.blocks = queue.Queue(maxsize=CROSSFADE_BUFFER_BLOCKS)
+        command = [
+            ffmpeg_path, "-v", "error", "-ss", f"{start:.3f}", "-i", path, "-vn", "-threads", "1",
+            "-ac", str(channels), "-ar", str(frequency), "-f", "s16le", "-"
+        ]
+        threading.Thread(target=self._decode, args=(session, self.blocks, command, start, frequency, channels), daemon=True).start()
+        return True
+
+    def ready(self):
+        """Indique si le début de la fin du morceau est décodé."""
+        return self.blocks is not None and not self.blocks.empty()
+
+    def start(self, position, fade_s, volume):
+        """
+        Joue la fin décodée à partir de la position courante, en fondu sortant.
+        
+        :param position: Position (s) du morceau au moment du relais
+        :param fade_s: Durée du fondu
+        :param volume: Volume du lecteur (0-1)
+        """
+        if self.channel is None:
+            pygame.mixer.set_reserved(1)
+            self.channel = pygame.mixer.Channel(0)
+        self.channel.set_volume(volume)
+        threading.Thread(target=self._feed, args=(self.session, self.blocks, position, fade_s), daemon=True).start()
+
+    def cancel(self):
+        """Arrête le décodage et la fin de morceau en cours de fondu."""
+        with self.lock:
+            self.session += 1
+            process, self.process = self.process, None
+            self.blocks = None
+        if process is not None and process.poll() is None:
+            process.kill()
+        if self.channel is not None:
+            self.channel.stop()
+
+    def set_volume(self, volume):
+        """Suit le volume du lecteur pendant un fondu (fin de morceau sur le canal réservé)."""
+        if self.channel is not None:
+            self.channel.set_volume(volume)
+
+    def pause(self):
+        if self.channel is not None:
+            self.channel.pause()
+
+    def resume(self):
+        if self.channel is not None:
+            self.channel.unpause()
+
+    def _put(self, session, blocks, item):
+        """Ajoute un bloc en attendant une place ; False si la session a été annulée."""
+        while session == self.session:
+            try:
+                blocks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode(self, session, blocks, command, start, frequency, channels):
+        import numpy as np
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+        )
+        with self.lock:
+            if session != self.session:
+                process.kill()
+                return
+            self.process = process
+        frame_bytes = 2 * channels
+        block_bytes = int(CROSSFADE_BLOCK_S * frequency) * frame_bytes
+        timestamp = start
+        try:
+            while True:
+                data = process.stdout.read(block_bytes)
+                if len(data) < frame_bytes:
+                    break
+                samples = np.frombuffer(data[:len(data) - len(data) % frame_bytes], dtype="<i2").reshape(-1, channels)
+                if not self._put(session, blocks, (timestamp, samples)):
+                    return
+                timestamp += len(samples) / frequency
+            self._put(session, blocks, None)
+        finally:
+            process.stdout.close()
+            process.wait()
+
+    def _feed(self, session, blocks, position, fade_s):
+        import numpy as np
+        frequency = pygame.mixer.get_init()[0]
+        declick = int(CROSSFADE_DECLICK_S * frequency)
+        first = True
+        while session == self.session:
+            try:
+                item = blocks.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            timestamp, samples = item
+            # Échantillons déjà joués par le flux avant le relais
+            skip = max(0, int(round((position - timestamp) * frequency)))
+            if skip >= len(samples):
+                continue
+            samples = samples[skip:]
+            elapsed = (timestamp - position) + (skip + np.arange(len(samples), dtype=np.float32)) / frequency
+            gain = np.clip(1 - elapsed / fade_s, 0, 1)
+            if first:
+                ramp = min(declick, len(gain))
+                gain[:ramp] *= np.linspace(0, 1, ramp, dtype=np.float32)
+                first = False
+            pcm = (samples * gain[:, None]).astype(np.int16)
+            sound = pygame.mixer.Sound(buffer=pcm.tobytes())
+            # Un bloc joué et un en file : le canal n'attend jamais le décodage
+            while session == self.session and self.channel.get_queue() is not None:
+                time.sleep(CROSSFADE_BLOCK_S / 4)
+            if session != self.session:
+                break
+            if self.channel.get_busy():
+                self.channel.queue(sound)
+            else:
+                self.channel.play(sound)
+            if gain[-1] == 0:
+                break
+        with self.lock:
+            if session == self.session:
+                process, self.process = self.process, None
+                if process is not None and process.poll() is None:
+                    process.kill()
+
+crossfade_engine = CrossfadeEngine()
+
+def notify(message):
+    """Affiche une notification discrète en haut à gauche."""
+    notif = ctk.CTkLabel(root, text=message, fg_color="#444444", text_color="white")
+    notif.place(relx=0.01, rely=0.01, anchor="nw")
+    root.after(3000, notif.destroy)
+
+# --- Fonctions de téléchargement et lecture ---
+
+def paste_url():
+    """Colle l'URL du presse-papiers dans le champ dédié."""
+    try:
+        clipboard = root.clipboard_get()
+        youtube_url_entry.delete(0, tk.END)
+        youtube_url_entry.insert(0, clipboard)
+    except Exception:
+        messagebox.showerror("Erreur", "Impossible de récupérer le presse-papiers.")
+
+def download_youtube(play_now=False):
+    """
+    Ajoute l'URL YouTube (vidéo, playlist ou chaîne) à la file de téléchargements.
+    
+    :param play_now: Lancer la lecture pendant le téléchargement
+    """
+    url = youtube_url_entry.get().strip()
+    if not url:
+        messagebox.showerror("Erreur", "Veuillez entrer une URL YouTube valide.")
+        return
+    youtube_url_entry.delete(0, tk.END)
+    download_manager.add(url, play_now=play_now)
+    refresh_downloads_view()
+
+def download_track(url, progress_hook):
+    """
+    Télécharge une vidéo, extrait son audio en un seul passage et récupère sa miniature.
+    En mode "native", un flux Opus est copié tel quel (sans réencodage) ; sinon
+    l'audio est converti en MP3 au débit configuré.
+    
+    :param url: URL de la vidéo
+    :param progress_hook: Fonction de progression yt-dlp
+    :return: Nom du fichier audio créé dans le dossier audio
+    """
+    import yt_dlp
+    os.makedirs("audio", exist_ok=True)
+    ffmpeg_path = find_ffmpeg()
+    if not ffmpeg_path:
+        raise RuntimeError("FFmpeg introuvable.")
+    settings = app_data["settings"]
+    native = settings.get("audio_format", "mp3") == "native"
+    ydl_opts = {
+        'format': 'bestaudio[acodec=opus]/bestaudio/best' if native else 'bestaudio/best',
+        'outtmpl': os.path.join("audio", '%(title)s.%(ext)s'),
+        'noplaylist': True,
+        'quiet': True,
+        'ffmpeg_location': ffmpeg_path,
+        'progress_hooks': [progress_hook],
+    }
+    with instrumentation.measure("download"), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info_dict = ydl.extract_info(url, download=True)
+        downloaded_file = ydl.prepare_filename(info_dict)
+    cleaned_title = re.sub(r'[<>:"/\\|?*]', '', info_dict.get('title', 'audio'))
+    acodec = info_dict.get('acodec') or ""
+    if acodec == "mp3":
+        extension, codec_args = "mp3", ["-c:a", "copy"]
+    elif native and acodec == "opus":
+        extension, codec_args = "opus", ["-c:a", "copy"]
+    else:
+        extension = "mp3"
+        codec_args = ["-ar", "44100", "-ac", "2", "-c:a", "libmp3lame", "-b:a", settings.get("audio_bitrate", "192k")]
+    output_filename = os.path.join("audio", f"{cleaned_title}.{extension}")
+    if os.path.abspath(downloaded_file) != os.path.abspath(output_filename):
+        try:
+            convert_audio(ffmpeg_path, downloaded_file, output_filename, codec_args)
+        finally:
+            if os.path.exists(downloaded_file):
+                os.remove(downloaded_file)
+    if 'thumbnail' in info_dict and info_dict['thumbnail']:
+        try:
+            fetch_thumbnail(info_dict['thumbnail'], cover_path_for(os.path.basename(output_filename)))
+        except Exception as e:
+            print(f"Erreur téléchargement miniature : {e}")
+    return os.path.basename(output_filename)
+
+# --- Miniatures ---
+
+THUMBNAIL_TIMEOUT = (5, 15)      # Délais (connexion, lecture) en secondes
+THUMBNAIL_CONCURRENCY = 4        # Requêtes de miniatures simultanées
+COVER_SOURCE_SIZE = 340          # Côté des pochettes enregistrées (plus grande taille affichée)
+
+http_session = None
+http_session_lock = threading.Lock()
+thumbnail_slots = threading.BoundedSemaphore(THUMBNAIL_CONCURRENCY)
+
+def get_http_session():
+    """Retourne la session HTTP partagée (connexions persistantes réutilisées)."""
+    global http_session
+    with http_session_lock:
+        if http_session is None:
+            import requests
+            http_session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=THUMBNAIL_CONCURRENCY, pool_maxsize=THUMBNAIL_CONCURRENCY)
+            http_session.mount("https://", adapter)
+            http_session.mount("http://", adapter)
+        return http_session
+
+@timed("thumbnail")
+def fetch_thumbnail(url, cover_path):
+    """
+    Télécharge une miniature via la session partagée et l'enregistre normalisée.
+    
+    :param url: URL de la miniature
+    :param cover_path: Chemin de la pochette à créer
+    """
+    with thumbnail_slots:
+        response = get_http_session().get(url, timeout=THUMBNAIL_TIMEOUT)
+    response.raise_for_status()
+    store_cover(response.content, cover_path)
+
+def store_cover(content, cover_path):
+    """
+    Enregistre une pochette recadrée au format carré canonique, puis prépare
+    les rendus utilisés par le lecteur pour que l'affichage n'ait plus rien à décoder.
+    
+    :param content: Contenu brut de l'image (JPEG, WebP...)
+    :param cover_path: Chemin de la pochette à créer
+    """
+    img = Image.open(io.BytesIO(content))
+    img.draft("RGB", (COVER_SOURCE_SIZE, COVER_SOURCE_SIZE))
+    img = ImageOps.fit(img.convert("RGB"), (COVER_SOURCE_SIZE, COVER_SOURCE_SIZE), method=Image.LANCZOS, centering=(0.5, 0.5))
+    os.makedirs(COVER_DIR, exist_ok=True)
+    tmp_path = f"{cover_path}.tmp"
+    img.save(tmp_path, format="JPEG", quality=90)
+    os.replace(tmp_path, cover_path)
+    for geometry in (LIBRARY_COVER_GEOMETRY, NOW_PLAYING_COVER_GEOMETRY):
+        render_cover(cover_path, geometry)
+
+# Limite le nombre de conversions FFmpeg simultanées au nombre de cœurs
+ffmpeg_slots = threading.BoundedSemaphore(os.cpu_count() or 2)
+
+@timed("conversion")
+def convert_audio(ffmpeg_path, source, destination, codec_args):
+    """
+    Extrait l'audio d'un fichier avec FFmpeg dans un sous-processus géré.
+    
+    :param ffmpeg_path: Chemin de FFmpeg
+    :param source: Fichier téléchargé
+    :param destination: Fichier audio à créer
+    :param codec_args: Arguments de codec FFmpeg (copie de flux ou réencodage)
+    """
+    command = [ffmpeg_path, "-y", "-loglevel", "error", "-i", source, "-vn", *codec_args, destination]
+    with ffmpeg_slots:
+        result = subprocess.run(
+            command,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+        )
+    if result.returncode != 0:
+        if os.path.exists(destination):
+            os.remove(destination)
+        raise RuntimeError(f"Erreur FFmpeg : {result.stderr.strip()[-300:]}")
+
+COLLECTION_PATH_PREFIXES = ("/@", "/channel/", "/c/", "/user/")    # Chaînes YouTube
+
+def is_collection_url(url):
+    """
+    Indique, sans requête réseau, si une URL désigne une playlist ou une chaîne à
+    développer. Une vidéo ouverte depuis une playlist (watch?v=...&list=...) reste
+    une seule vidéo, comme avec l'option noplaylist de yt-dlp.
+    
+    :param url: URL saisie
+    """
+    parsed = urllib.parse.urlparse(url)
+    query = urllib.parse.parse_qs(parsed.query)
+    if "v" in query or parsed.netloc.endswith("youtu.be"):
+        return False
+    return "list" in query or parsed.path.startswith(COLLECTION_PATH_PREFIXES)
+
+@timed("expand_url")
+def expand_url(url):
+    """
+    Développe une URL de playlist ou de chaîne en liste de vidéos.
+    
+    :param url: URL saisie
+    :return: Liste [(url, titre)] si l'URL contient plusieurs vidéos, sinon None
+    """
+    import yt_dlp
+    with yt_dlp.YoutubeDL({"extract_flat": "in_playlist", "quiet": True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+    if info.get("_type") not in ("playlist", "multi_video"):
+        return None
+    videos = []
+    for entry in info.get("entries") or []:
+        if not entry:
+            continue
+        entry_url = entry.get("url") or entry.get("webpage_url")
+        if entry.get("_type") == "playlist" or entry.get("ie_key") == "YoutubeTab":
+            # Onglets d'une chaîne (Vidéos, Shorts...) : un niveau de plus
+            videos.extend(expand_url(entry_url) or [])
+        elif entry_url:
+            if not entry_url.startswith("http"):
+                entry_url = f"https://www.youtube.com/watch?v={entry.get('id', entry_url)}"
+            videos.append((entry_url, entry.get("title") or entry_url))
+    return videos
+
+@functools.lru_cache(maxsize=None)
+def find_ffmpeg():
+    """Retourne le chemin vers FFmpeg s'il est disponible."""
+    if shutil.which("ffmpeg"):
+        return "ffmpeg"
+    common_path = r"C:\ffmpeg\bin\ffmpeg.exe"
+    if os.path.exists(common_path):
+        return common_path
+    return None
+
+# --- Lecture pendant le téléchargement ---
+
+STREAM_DIR = os.path.join(".cache", "streams")    # Fichiers en cours d'écriture lus par le lecteur
+PROGRESSIVE_MIN_BUFFER_S = 5     # Audio (s) à avoir d'avance avant de lancer la lecture
+PROGRESSIVE_POLL_S = 0.2         # Période de suivi du fichier écrit par FFmpeg
+PROGRESSIVE_LOW_BUFFER_S = 3     # Avance (s) en deçà de laquelle la lecture est suspendue
+PROGRESSIVE_UNKNOWN_SIZE = 1 << 40    # Taille annoncée quand la durée est inconnue
+
+class ProgressiveStream(io.RawIOBase):
+    """
+    Fichier MP3 en cours d'écriture par FFmpeg, lu par pygame pendant le téléchargement :
+    une lecture ne rend que les données déjà écrites, sans jamais attendre la suite
+    (watch_progressive_buffer suspend la lecture avant). Le fichier temporaire est
+    supprimé une fois le téléchargement terminé et le flux fermé.
+    """
+
+    def __init__(self, path, expected_size, bitrate):
+        """
+        :param path: Fichier temporaire écrit par FFmpeg
+        :param expected_size: Taille annoncée à pygame (majorant de la taille finale)
+        :param bitrate: Débit constant de l'encodage, en bits par seconde
+        """
+        super().__init__()
+        self.path = path
+        open(path, "wb").close()
+        self.file = open(path, "rb")
+        self.expected_size = expected_size
+        self.bitrate = bitrate
+        self.finished = False
+        # Au chargement, pygame cherche des tags en fin de fichier : ces lectures
+        # ne doivent pas attendre la fin du téléchargement
+        self.probing = True
+
+    def _written(self):
+        return os.fstat(self.file.fileno()).st_size
+
+    def buffered_seconds(self):
+        """Durée d'audio déjà écrite."""
+        return self._written() * 8 / self.bitrate
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        # Ces lectures ont lieu dans le thread audio de pygame, qui garde le verrou du
+        # mixer : elles ne doivent jamais attendre, seules les données écrites sont rendues
+        position = self.file.tell()
+        count = self.file.readinto(buffer)
+        if self.probing and count < len(buffer):
+            # Fin annoncée pas encore écrite : des zéros, pris pour une absence de tag
+            buffer[count:] = bytes(len(buffer) - count)
+            self.file.seek(position + len(buffer))
+            count = len(buffer)
+        return count
+
+    def seek(self, position, whence=io.SEEK_SET):
+        if whence == io.SEEK_END:
+            end = self._written() if self.finished else self.expected_size
+            return self.file.seek(end + position)
+        return self.file.seek(position, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def finish(self):
+        """Signale la fin de l'écriture (réussie ou non)."""
+        self.finished = True
+        self._discard()
+
+    def close(self):
+        if not self.closed:
+            self.file.close()
+            super().close()
+        self._discard()
+
+    def _discard(self):
+        if self.finished and self.closed:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+def progressive_ready(buffered, elapsed, duration):
+    """
+    Indique si la lecture peut démarrer sans que la tête de lecture rattrape le
+    téléchargement : avec un débit de r secondes d'audio par seconde, la fin du
+    morceau arrive à temps si l'avance couvre duration × (1 - r).
+    
+    :param buffered: Audio déjà écrit (s)
+    :param elapsed: Temps écoulé depuis le début de l'écriture (s)
+    :param duration: Durée du morceau (s), ou None si inconnue
+    """
+    if buffered < PROGRESSIVE_MIN_BUFFER_S:
+        return False
+    if not duration:
+        return True
+    rate = buffered / max(elapsed, 1e-3)
+    return buffered >= max(0, duration * (1 - rate)) + PROGRESSIVE_MIN_BUFFER_S
+
+def stream_track(url, progress_hook, on_ready):
+    """
+    Télécharge une vidéo en encodant son audio en MP3 au fil de l'eau, pour permettre
+    sa lecture avant la fin du téléchargement. Le flux est lu directement par FFmpeg ;
+    le MP3 obtenu est copié dans le dossier audio une fois complet.
+    
+    :param url: URL de la vidéo
+    :param progress_hook: Fonction de progression (même format que les rappels de yt-dlp)
+    :param on_ready: Fonction appelée (depuis ce thread) avec (ProgressiveStream, nom du fichier, durée) dès que la lecture peut commencer
+    :return: Nom du fichier audio créé dans le dossier audio
+    """
+    import yt_dlp
+    requested_at = time.monotonic()
+    ffmpeg_path = find_ffmpeg()
+    if not ffmpeg_path:
+        raise RuntimeError("FFmpeg introuvable.")
+    with instrumentation.measure("stream_resolve"), yt_dlp.YoutubeDL({'format': 'bestaudio/best', 'noplaylist': True, 'quiet': True}) as ydl:
+        info_dict = ydl.extract_info(url, download=False)
+    media_url = info_dict.get("url")
+    if not media_url:
+        raise RuntimeError("Ce flux ne peut pas être lu pendant son téléchargement.")
+    cleaned_title = re.sub(r'[<>:"/\\|?*]', '', info_dict.get('title', 'audio'))
+    filename = f"{cleaned_title}.mp3"
+    duration = info_dict.get("duration")
+    bitrate_setting = app_data["settings"].get("audio_bitrate", "192k")
+    bitrate = int(bitrate_setting.rstrip("k")) * 1000
+    estimated_size = int(duration * bitrate / 8) if duration else None
+    expected_size = int(estimated_size * 1.05) + 65536 if estimated_size else PROGRESSIVE_UNKNOWN_SIZE
+
+    thumbnail_thread = None
+    if info_dict.get('thumbnail'):
+        def load_thumbnail():
+            try:
+                fetch_thumbnail(info_dict['thumbnail'], cover_path_for(filename))
+            except Exception as e:
+                print(f"Erreur téléchargement miniature : {e}")
+        thumbnail_thread = threading.Thread(target=load_thumbnail, daemon=True)
+        thumbnail_thread.start()
+
+    os.makedirs(STREAM_DIR, exist_ok=True)
+    partial = os.path.join(STREAM_DIR, f"{uuid.uuid4().hex}.mp3")
+    stream = ProgressiveStream(partial, expected_size, bitrate)
+    headers = "".join(f"{key}: {value}\r\n" for key, value in (info_dict.get("http_headers") or {}).items())
+    command = [
+        ffmpeg_path, "-y", "-loglevel", "error",
+        *(["-headers", headers] if headers else []),
+        "-i", media_url, "-vn",
+        "-ar", "44100", "-ac", "2", "-c:a", "libmp3lame", "-b:a", bitrate_setting,
+        # Pas d'en-tête Xing réécrit à la fin : le début du fichier est déjà lu
+        "-write_xing", "0", "-flush_packets", "1", "-f", "mp3", partial
+    ]
+    ready = False
+    try:
+        # Pas de place de ffmpeg_slots : l'encodage suit le débit du réseau et ne doit
+        # pas priver les conversions du processeur. Les erreurs vont dans un fichier,
+        # lu à la fin, pour qu'un tube plein ne bloque jamais FFmpeg.
+        with open(f"{partial}.log", "w+") as errors:
+            process = subprocess.Popen(
+                command,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=errors,
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+            )
+            encoding_started = time.monotonic()
+            while True:
+                done = process.poll() is not None
+                written = os.path.getsize(partial)
+                if estimated_size:
+                    progress_hook({"status": "downloading", "downloaded_bytes": written, "total_bytes": estimated_size})
+                if not ready and not done and progressive_ready(written * 8 / bitrate, time.monotonic() - encoding_started, duration):
+                    ready = True
+                    instrumentation.record("progressive_start", (time.monotonic() - requested_at) * 1000)
+                    on_ready(stream, filename, duration)
+                if done:
+                    break
+                time.sleep(PROGRESSIVE_POLL_S)
+            errors.seek(0)
+            message = errors.read()
+        os.remove(f"{partial}.log")
+        if process.returncode != 0:
+            raise RuntimeError(f"Erreur FFmpeg : {message.strip()[-300:]}")
+        os.makedirs("audio", exist_ok=True)
+        shutil.copyfile(partial, os.path.join("audio", filename))
+    finally:
+        stream.finish()
+        if not ready:
+            stream.close()
+    if thumbnail_thread is not None:
+        thumbnail_thread.join()
+    return filename
+
+# --- File de téléchargements ---
+
+DOWNLOAD_RETRIES = 3       # Nombre d'essais par morceau
+DOWNLOAD_BACKOFF = 2.0     # Attente (s) avant le 2e essai, doublée ensuite
+
+class DownloadManager:
+    """
+    File de téléchargements persistante traitée par un nombre limité de threads.
+    Chaque élément garde son statut et sa progression ; les échecs sont retentés
+    avec un délai croissant, et les URL de playlist ou de chaîne sont développées
+    en un élément par vidéo. Les threads ne touchent jamais à l'interface :
+    celle-ci lit l'état des éléments périodiquement.
+    """
+
+    def __init__(self, jobs, workers, lock):
+        """
+        :param jobs: Liste persistante des éléments (app_data["downloads"])
+        :param workers: Nombre de téléchargements simultanés
+        :param lock: Verrou partagé avec l'enregistrement des données persistantes
+        """
+        self.jobs = jobs
+        self.workers = max(1, int(workers))
+        self.running = 0
+        self.cond = threading.Condition(lock)
+        self.completed = []     # Fichiers terminés pas encore pris en compte par l'interface
+        # Les éléments interrompus à la fermeture sont remis en attente, les terminés oubliés
+        self.jobs[:] = [job for job in self.jobs if job["status"] != "terminé"]
+        for job in self.jobs:
+            if job["status"] == "en cours":
+                job["status"] = "en attente"
+            job["not_before"] = 0
+            job.pop("play_now", None)
+        # Fichiers de lecture progressive laissés par une session précédente
+        shutil.rmtree(STREAM_DIR, ignore_errors=True)
+
+    def add(self, url, title=None, expanded=False, play_now=False):
+        """
+        Ajoute une URL à la file et démarre les threads si nécessaire.
+        
+        :param play_now: Lancer la lecture dès qu'assez d'audio est téléchargé
+        """
+        job = {
+            "id": uuid.uuid4().hex,
+            "url": url,
+            "title": title or url,
+            "status": "en attente",
+            "progress": 0,
+            "attempts": 0,
+            "not_before": 0,
+            "expanded": expanded,
+            "play_now": play_now,
+            "error": None,
+        }
+        with self.cond:
+            self.jobs.append(job)
+            self.cond.notify()
+        save_app_data(app_data)
+        self.start()
+        return job
+
+    def start(self):
+        """Lance autant de threads que nécessaire pour traiter la file."""
+        with self.cond:
+            pending = sum(1 for job in self.jobs if job["status"] == "en attente")
+            while self.running < min(self.workers, pending):
+                self.running += 1
+                threading.Thread(target=self._worker, daemon=True).start()
+
+    def set_workers(self, workers):
+        """Change le nombre de téléchargements simultanés."""
+        with self.cond:
+            self.workers = max(1, int(workers))
+            self.cond.notify_all()
+        self.start()
+
+    def retry(self, job_id):
+        """Remet en attente un élément en erreur."""
+        with self.cond:
+            for job in self.jobs:
+                if job["id"] == job_id and job["status"] == "erreur":
+                    job.update(status="en attente", attempts=0, not_before=0, error=None, progress=0)
+        save_app_data(app_data)
+        self.start()
+
+    def clear_finished(self):
+        """Retire de la file les éléments terminés ou en erreur."""
+        with self.cond:
+            self.jobs[:] = [job for job in self.jobs if job["status"] not in ("terminé", "erreur")]
+        save_app_data(app_data)
+
+    def snapshot(self):
+        """Retourne une copie de l'état des éléments, pour l'affichage."""
+        with self.cond:
+            return [dict(job) for job in self.jobs]
+
+    def take_completed(self):
+        """Retourne et vide la liste des fichiers terminés depuis le dernier appel."""
+        with self.cond:
+            completed, self.completed = self.completed, []
+        return completed
+
+    def _next_job(self):
+        """Retourne (élément prêt, None) ou (None, attente en secondes)."""
+        now = time.time()
+        wait = None
+        for job in self.jobs:
+            if job["status"] != "en attente":
+                continue
+            if job["not_before"] <= now:
+                return job, None
+            delay = job["not_before"] - now
+            wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                if self.running > self.workers:
+                    self.running -= 1
+                    return
+                job, wait = self._next_job()
+                if job is None:
+                    if wait is None:
+                        # Plus rien à faire : le thread s'arrête
+                        self.running -= 1
+                        return
+                    self.cond.wait(timeout=wait)
+                    continue
+                job["status"] = "en cours"
+                job["progress"] = 0
+            try:
+                self._process(job)
+            except Exception as e:
+                with self.cond:
+                    job["attempts"] += 1
+                    job["error"] = str(e)
+                    if job["attempts"] < DOWNLOAD_RETRIES:
+                        job["status"] = "en attente"
+                        job["not_before"] = time.time() + DOWNLOAD_BACKOFF * 2 ** (job["attempts"] - 1)
+                    else:
+                        job["status"] = "erreur"
+                    self.cond.notify_all()
+            save_app_data(app_data)
+
+    def _process(self, job):
+        """Télécharge un élément, ou le développe s'il s'agit d'une playlist."""
+        # Un nouvel essai après une erreur se fait en téléchargement classique
+        with self.cond:
+            play_now = job.pop("play_now", False)
+        if not job["expanded"]:
+            # Seules les playlists et chaînes sont développées : une vidéo seule n'est
+            # extraite qu'une fois, par le téléchargement lui-même
+            videos = expand_url(job["url"]) if is_collection_url(job["url"]) else None
+            with self.cond:
+                job["expanded"] = True
+            if videos is not None:
+                for i, (url, title) in enumerate(videos):
+                    self.add(url, title, expanded=True, play_now=play_now and i == 0)
+                with self.cond:
+                    job["title"] = f"{job['title']} ({len(videos)} vidéos)"
+                    job["status"] = "terminé"
+                    job["progress"] = 1
+                return
+
+        def progress_hook(d):
+            if d["status"] == "downloading":
+                total = d.get("total_bytes") or d.get("total_bytes_estimate")
+                if total:
+                    with self.cond:
+                        job["progress"] = min(1, d.get("downloaded_bytes", 0) / total)
+
+        started = []
+        if play_now:
+            def on_ready(stream, filename, duration):
+                started.append(filename)
+                root.after(0, start_progressive_playback, stream, filename, duration)
+            track_file = stream_track(job["url"], progress_hook, on_ready)
+        else:
+            track_file = download_track(job["url"], progress_hook)
+        catalog.add(track_file)
+        search_index.add(track_file, track_tags(track_file))
+        metadata_scanner.scan([track_file])
+        waveform_store.request(track_file)
+        if play_now:
+            root.after(0, finish_progressive_track if started else play_audio_by_filename, track_file)
+        with self.cond:
+            job["title"] = os.path.splitext(track_file)[0]
+            job["status"] = "terminé"
+            job["progress"] = 1
+            job["error"] = None
+            self.completed.append(track_file)
+
+download_manager = DownloadManager(app_data.setdefault("downloads", []), app_data["settings"].get("download_workers", 3), app_data_lock)
+
+DOWNLOAD_REFRESH_MS = 500    # Période de rafraîchissement de la file affichée
+
+downloads_rows = None            # Lignes de la file de téléchargements (KeyedRowList)
+downloads_after_id = None        # Rafraîchissement programmé de la file
+
+def create_download_row(parent, job_id):
+    """Crée la ligne d'un élément de la file de téléchargements."""
+    frame = ctk.CTkFrame(parent, fg_color="#2b2b2b", corner_radius=5)
+    label = ctk.CTkLabel(frame, text="", text_color="white", fg_color="#2b2b2b", anchor="w")
+    label.pack(side=ctk.LEFT, fill=ctk.X, expand=True, padx=10, pady=5)
+    frame.retry_button = ctk.CTkButton(
+        frame,
+        text="Réessayer",
+        width=80,
+        fg_color="#cc3333",
+        text_color="white",
+        command=lambda: (download_manager.retry(job_id), refresh_downloads_view())
+    )
+    return frame, label
 
-# --- Gestion des données de l'application ---
+def format_download_job(job):
+    """Retourne le texte affiché pour un élément de la file."""
+    text = f"{job['title']} — {job['status']}"
+    if job["status"] == "en cours":
+        text += f" {int(job['progress'] * 100)}%"
+    elif job["status"] == "en attente" and job["attempts"]:
+        text += f" (essai {job['attempts'] + 1}/{DOWNLOAD_RETRIES})"
+    elif job["status"] == "erreur" and job["error"]:
+        text += f" : {job['error']}"
+    return text
 
-APP_DATA_FILE = "app_data.json"
-DEFAULT_DATA = {
-    "playlists": {"Favoris": []},
-    "history": [],
-    "settings": {
-        "theme": "Dark",
-        "window_size": "950x900",   # Taille par défaut de la fenêtre
-        "window_state": "zoomed"     # État par défaut de la fenêtre
-    },
-    "tags": {}  # Stockage des tags par fichier
-}
+def refresh_downloads_view():
+    """Met à jour la file de téléchargements affichée et la progression globale."""
+    global downloads_after_id
+    if downloads_after_id is not None:
+        root.after_cancel(downloads_after_id)
+        downloads_after_id = None
+    jobs = download_manager.snapshot()
+    downloads_rows.reconcile(job["id"] for job in jobs)
+    for job in jobs:
+        frame, label = downloads_rows.rows[job["id"]]
+        text = format_download_job(job)
+        if label.cget("text") != text:
+            label.configure(text=text)
+        show_retry = job["status"] == "erreur"
+        if show_retry != bool(frame.retry_button.winfo_manager()):
+            if show_retry:
+                frame.retry_button.pack(side=ctk.RIGHT, padx=10, pady=5)
+            else:
+                frame.retry_button.pack_forget()
 
-def load_app_data():
-    """Charge les données de l'application depuis un fichier JSON."""
-    try:
-        with open(APP_DATA_FILE, "r") as f:
-            return json.load(f)
-    except Exception:
-        return DEFAULT_DATA.copy()
+    completed = download_manager.take_completed()
+    if completed:
+        search_library()
+        notify(f"Téléchargement terminé : {completed[-1]}" if len(completed) == 1 else f"{len(completed)} téléchargements terminés")
 
-def save_app_data(data):
-    """Enregistre les données de l'application dans un fichier JSON."""
-    with open(APP_DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    running = sum(1 for job in jobs if job["status"] == "en cours")
+    waiting = sum(1 for job in jobs if job["status"] == "en attente")
+    if running or waiting:
+        tracked = [job for job in jobs if job["status"] != "erreur"]
+        progress = sum(job["progress"] for job in tracked) / len(tracked)
+        if not progress_bar.winfo_manager():
+            progress_bar.pack(fill=ctk.X, pady=5, before=status_label)
+            download_percentage_label.pack(pady=5, before=status_label)
+        progress_bar.set(progress)
+        download_percentage_label.configure(text=f"{int(progress * 100)}%")
+        status_label.configure(text=f"{running} en cours, {waiting} en attente")
+        downloads_after_id = root.after(DOWNLOAD_REFRESH_MS, refresh_downloads_view)
+    else:
+        progress_bar.pack_forget()
+        download_percentage_label.pack_forget()
+        errors = sum(1 for job in jobs if job["status"] == "erreur")
+        status_label.configure(text=f"Prêt ({errors} en erreur)" if errors else "Prêt")
 
-app_data = load_app_data()
+def clear_finished_downloads():
+    """Vide la file des éléments terminés ou en erreur."""
+    download_manager.clear_finished()
+    refresh_downloads_view()
 
-# --- Initialisation de pygame ---
+AUDIO_FORMAT_CHOICES = {
+    "MP3 128 kb/s": ("mp3", "128k"),
+    "MP3 192 kb/s": ("mp3", "192k"),
+    "MP3 320 kb/s": ("mp3", "320k"),
+    "Natif (sans réencodage)": ("native", "192k"),
+}
 
-os.environ["SDL_VIDEODRIVER"] = "dummy"
-pygame.mixer.init()
-pygame.display.init()
+def current_audio_format_choice():
+    """Retourne le libellé correspondant au format de téléchargement configuré."""
+    settings = app_data["settings"]
+    current = (settings.get("audio_format", "mp3"), settings.get("audio_bitrate", "192k"))
+    for label, choice in AUDIO_FORMAT_CHOICES.items():
+        if choice == current or (current[0] == "native" and choice[0] == "native"):
+            return label
+    return "MP3 192 kb/s"
 
-# --- Configuration de CustomTkinter ---
-ctk.set_appearance_mode(app_data["settings"].get("theme", "Dark"))
-ctk.set_default_color_theme("green")
+def set_audio_format(value):
+    """Change le format des téléchargements et sauvegarde le paramètre."""
+    audio_format, bitrate = AUDIO_FORMAT_CHOICES[value]
+    app_data["settings"]["audio_format"] = audio_format
+    app_data["settings"]["audio_bitrate"] = bitrate
+    save_app_data(app_data)
 
-# --- Variables Globales ---
+def toggle_shuffle_weighting():
+    """Active ou désactive la pondération de la lecture aléatoire (prise en compte au prochain tour)."""
+    app_data["settings"]["shuffle_weighted"] = bool(shuffle_weighting_switch.get())
+    save_app_data(app_data)
 
-audio_duration = 0  
-playback_start_time = None
-total_paused_duration = 0
-last_pause_time = None
-is_paused = False
-cover_img_global = None
-loop_enabled = False
+def toggle_gapless():
+    """Active ou désactive l'enchaînement sans blanc et sauvegarde le paramètre."""
+    app_data["settings"]["gapless"] = bool(gapless_switch.get())
+    save_app_data(app_data)
+    if current_file is not None:
+        prepare_next_track()
 
-# Gestion de la playlist active
-current_playlist = None            # Nom de la playlist en cours
-current_playlist_index = 0         # Index du morceau actuellement joué
-current_playlist_selected = None   # Playlist affichée dans l'onglet Playlists
+PROGRESS_REFRESH_CHOICES = {"100 ms": 100, "250 ms": 250, "500 ms": 500, "1 s": 1000}
 
-# Dictionnaires et listes de gestion
-playlists = {}                   # Autres playlists que "Favoris"
-library_items = {}               # {filename: frame_widget}
-library_title_widgets = {}       # Pour la mise en évidence dans la bibliothèque
+def set_progress_refresh(value):
+    """Change la période de rafraîchissement de la barre de progression."""
+    app_data["settings"]["progress_refresh_ms"] = PROGRESS_REFRESH_CHOICES[value]
+    save_app_data(app_data)
 
-# --- Fonctions utilitaires ---
+def set_download_workers(value):
+    """Change le nombre de téléchargements simultanés et sauvegarde le paramètre."""
+    app_data["settings"]["download_workers"] = int(value)
+    download_manager.set_workers(int(value))
+    save_app_data(app_data)
 
-def round_rectangle(canvas, x1, y1, x2, y2, radius=6, **kwargs):
-    """Dessine un rectangle aux coins arrondis sur le canvas."""
-    if x2 - x1 < 2 * radius:
-        radius = (x2 - x1) / 2
-    if y2 - y1 < 2 * radius:
-        radius = (y2 - y1) / 2
-    points = [
-        x1+radius, y1,
-        x2-radius, y1,
-        x2, y1,
-        x2, y1+radius,
-        x2, y2-radius,
-        x2, y2,
-        x2-radius, y2,
-        x1+radius, y2,
-        x1, y2,
-        x1, y2-radius,
-        x1, y1+radius,
-        x1, y1
-    ]
-    return canvas.create_polygon(points, smooth=True, **kwargs)
+# --- Panneau de débogage (instrumentation) ---
 
-def add_rounded_corners(im, radius):
-    """
-    Ajoute des coins arrondis à une image.
-    
-    :param im: Image PIL
-    :param radius: Rayon des coins
-    :return: Image modifiée avec transparence aux coins
-    """
-    im = im.convert("RGBA")
-    circle = Image.new('L', (radius * 2, radius * 2), 0)
-    draw = ImageDraw.Draw(circle)
-    draw.ellipse((0, 0, radius * 2, radius * 2), fill=255)
-    alpha = Image.new('L', im.size, 255)
-    w, h = im.size
-    alpha.paste(circle.crop((0, 0, radius, radius)), (0, 0))
-    alpha.paste(circle.crop((radius, 0, radius * 2, radius)), (w - radius, 0))
-    alpha.paste(circle.crop((0, radius, radius, radius * 2)), (0, h - radius))
-    alpha.paste(circle.crop((radius, radius, radius * 2, radius * 2)), (w - radius, h - radius))
-    im.putalpha(alpha)
-    return im
+debug_textbox = None             # Résumé des mesures affiché dans l'onglet Paramètres
 
-def create_default_cover(size=(300, 300)):
-    """
-    Crée une pochette par défaut en cas d'absence d'image.
-    
-    :param size: Taille de l'image
-    :return: Image PIL générée
-    """
-    img = Image.new("RGB", size, color="#333333")
-    draw = ImageDraw.Draw(img)
-    font_size = int(size[0] // 10)
-    try:
-        font = ImageFont.truetype("arial.ttf", font_size)
-    except Exception:
-        font = ImageFont.load_default()
-    text = "No Cover"
-    text_width, text_height = draw.textsize(text, font=font)
-    pos = ((size[0] - text_width) // 2, (size[1] - text_height) // 2)
-    draw.text(pos, text, fill="#FFFFFF", font=font)
-    return img
+def toggle_instrumentation():
+    """Active ou désactive l'instrumentation des performances et sauvegarde le paramètre."""
+    enabled = bool(instrumentation_switch.get())
+    app_data["settings"]["instrumentation"] = enabled
+    save_app_data(app_data)
+    if enabled:
+        instrumentation.start(root)
+    else:
+        instrumentation.stop()
+    refresh_debug_panel()
 
-def notify(message):
-    """Affiche une notification discrète en haut à gauche."""
-    notif = ctk.CTkLabel(root, text=message, fg_color="#444444", text_color="white")
-    notif.place(relx=0.01, rely=0.01, anchor="nw")
-    root.after(3000, notif.destroy)
+def format_instrumentation_report(report):
+    """Met en forme les mesures recueillies pour le panneau de débogage."""
+    if not instrumentation.enabled and not report["operations"]:
+        return "Instrumentation désactivée."
+    lines = [f"{'Opération':<18}{'Appels':>8}{'Moy.':>10}{'p95':>10}{'Max':>10}"]
+    for name, stats in report["operations"].items():
+        lines.append(
+            f"{name:<18}{stats['count']:>8}{stats['mean_ms']:>8.1f}ms"
+            f"{stats['p95_ms']:>8.0f}ms{stats['max_ms']:>8.0f}ms"
+        )
+    stalls = report["stalls"]
+    lines.append("")
+    lines.append(f"Blocages de l'interface (> {report['stall_threshold_ms']} ms) : {len(stalls)}")
+    for stall in stalls[-5:][::-1]:
+        lines.append(f"  {stall['at']}  {stall['duration_ms']:.0f} ms")
+        lines.extend(f"    {frame}" for frame in stall["stack"][-6:])
+    return "\n".join(lines)
 
-# --- Fonctions de téléchargement et lecture ---
+def refresh_debug_panel():
+    """Actualise le résumé des mesures affiché dans l'onglet Paramètres."""
+    if debug_textbox is None:
+        return
+    debug_textbox.configure(state="normal")
+    debug_textbox.delete("1.0", "end")
+    debug_textbox.insert("1.0", format_instrumentation_report(instrumentation.snapshot()))
+    debug_textbox.configure(state="disabled")
 
-def paste_url():
-    """Colle l'URL du presse-papiers dans le champ dédié."""
+def export_instrumentation():
+    """Écrit les mesures recueillies dans un fichier JSON."""
     try:
-        clipboard = root.clipboard_get()
-        youtube_url_entry.delete(0, tk.END)
-        youtube_url_entry.insert(0, clipboard)
-    except Exception:
-        messagebox.showerror("Erreur", "Impossible de récupérer le presse-papiers.")
-
-def download_youtube():
-    """Télécharge l'audio depuis une URL YouTube."""
-    url = youtube_url_entry.get()
-    if not url:
-        messagebox.showerror("Erreur", "Veuillez entrer une URL YouTube valide.")
+        instrumentation.dump()
+    except Exception as e:
+        messagebox.showerror("Erreur", f"Export impossible : {e}")
         return
-    youtube_url_entry.delete(0, tk.END)
-    download_youtube_button.configure(state=ctk.DISABLED)
-    status_label.configure(text="Téléchargement en cours...")
-    progress_bar.pack(fill=ctk.X, pady=5)
-    download_percentage_label.pack(pady=5)
-    progress_bar.set(0)
-    download_percentage_label.configure(text="0%")
-
-    def download_thread():
-        try:
-            os.makedirs("audio", exist_ok=True)
-            ffmpeg_path = find_ffmpeg()
-            if not ffmpeg_path:
-                messagebox.showerror("Erreur", "FFmpeg introuvable.")
-                return
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'outtmpl': os.path.join("audio", '%(title)s.%(ext)s'),
-                'noplaylist': True,
-                'ffmpeg_location': ffmpeg_path,
-                'progress_hooks': [update_progress],
-            }
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info_dict = ydl.extract_info(url, download=True)
-                downloaded_file = ydl.prepare_filename(info_dict)
-            cleaned_title = re.sub(r'[<>:"/\\|?*]', '', info_dict.get('title', 'audio'))
-            output_filename = os.path.join("audio", f"{cleaned_title}.mp3")
-            os.system(f'{ffmpeg_path} -i "{downloaded_file}" -vn -ar 44100 -ac 2 -b:a 192k "{output_filename}"')
-            if os.path.exists(downloaded_file):
-                os.remove(downloaded_file)
-            if 'thumbnail' in info_dict and info_dict['thumbnail']:
-                thumbnail_url = info_dict['thumbnail']
-                try:
-                    response = requests.get(thumbnail_url)
-                    if response.status_code == 200:
-                        os.makedirs("Pochette_album", exist_ok=True)
-                        thumbnail_path = os.path.join("Pochette_album", f"{cleaned_title}.jpg")
-                        with open(thumbnail_path, "wb") as f:
-                            f.write(response.content)
-                except Exception as e:
-                    print(f"Erreur téléchargement miniature : {e}")
-            messagebox.showinfo("Succès", f"Téléchargement terminé:\n{output_filename}")
-            status_label.configure(text="Prêt")
-            update_library_view()
-            update_playlists_view()
-        except Exception as e:
-            messagebox.showerror("Erreur", f"Une erreur est survenue: {str(e)}")
-            status_label.configure(text="Erreur")
-        finally:
-            download_youtube_button.configure(state=ctk.NORMAL)
-            progress_bar.pack_forget()
-            download_percentage_label.pack_forget()
-            progress_bar.set(0)
-
-    threading.Thread(target=download_thread).start()
-
-def update_progress(d):
-    """Met à jour la barre de progression durant le téléchargement."""
-    if d['status'] == 'downloading':
-        percent_str = re.search(r'(\d+\.\d+)%', d['_percent_str'])
-        if percent_str:
-            percent = float(percent_str.group(1))
-            progress_bar.set(percent / 100)
-            download_percentage_label.configure(text=f"{int(percent)}%")
-            root.update_idletasks()
+    notify(f"Mesures exportées dans {INSTRUMENTATION_FILE}")
 
-def find_ffmpeg():
-    """Retourne le chemin vers FFmpeg s'il est disponible."""
-    if os.system("ffmpeg -version") == 0:
-        return "ffmpeg"
-    common_path = r"C:\ffmpeg\bin\ffmpeg.exe"
-    if os.path.exists(common_path):
-        return common_path
-    return None
+def reset_instrumentation():
+    """Efface les mesures recueillies."""
+    instrumentation.reset()
+    refresh_debug_panel()
 
-def play_audio_by_filename(filename, playlist_name=None):
+@timed("play_start")
+def play_audio_by_filename(filename, playlist_name=None, playlist_entry=None, fade_ms=0):
     """
     Joue un fichier audio et gère l'affichage de la pochette, la lecture et la mise à jour de la playlist.
     
     :param filename: Nom du fichier audio
     :param playlist_name: Nom de la playlist si applicable
+    :param playlist_entry: Occurrence jouée dans la playlist (morceaux en double)
+    :param fade_ms: Durée du fondu d'entrée (fondu enchaîné), sinon un fondu en cours est interrompu
     """
-    global audio_duration, playback_start_time, total_paused_duration, is_paused, cover_img_global, current_playlist, current_playlist_index
+    global queued_track
     selected_file = os.path.join("audio", filename)
     try:
         pygame.mixer.music.load(selected_file)
     except Exception as e:
         messagebox.showerror("Erreur", f"Impossible de lire le fichier : {e}")
         return
+    release_music_stream()
+    queued_track = None
+    if not fade_ms:
+        crossfade_engine.cancel()
+    pygame.mixer.music.play(fade_ms=fade_ms)
+    pygame.mixer.music.set_endevent(pygame.USEREVENT)
+    start_track_ui(filename, playlist_name, playlist_entry)
+
+def start_progressive_playback(stream, filename, duration):
+    """
+    Lance la lecture d'un morceau encore en téléchargement (mode « Lire maintenant »).
+    
+    :param stream: ProgressiveStream du fichier en cours d'écriture
+    :param filename: Nom qu'aura le fichier dans le dossier audio
+    :param duration: Durée annoncée par la plateforme (s), ou None
+    """
+    global queued_track, music_stream
+    try:
+        pygame.mixer.music.load(stream, "mp3")
+    except Exception as e:
+        stream.close()
+        messagebox.showerror("Erreur", f"Impossible de lire le fichier : {e}")
+        return
+    stream.probing = False
+    release_music_stream()
+    music_stream = stream
+    queued_track = None
     pygame.mixer.music.play()
     pygame.mixer.music.set_endevent(pygame.USEREVENT)
+    # Le fichier n'existe pas encore : la durée ne peut pas être lue
+    catalog.metadata.setdefault(filename, {}).setdefault("duration", duration or 0)
+    start_track_ui(filename)
+    watch_progressive_buffer()
+
+def finish_progressive_track(filename):
+    """Complète l'affichage d'un morceau lu pendant son téléchargement, désormais dans la bibliothèque."""
+    if filename != current_file:
+        return
+    now_playing_renderer.request(filename, lambda f, img: root.after(0, show_rendered_cover, f, img))
+    load_waveform(filename)
+    seek_index_store.request(filename)
+    update_library_highlight()
+
+buffer_after_id = None           # Prochaine vérification de l'avance du téléchargement
+buffering = False                # Lecture suspendue en attendant le téléchargement
+
+def watch_progressive_buffer():
+    """
+    Suit l'avance du téléchargement sur la lecture d'un morceau en cours de
+    téléchargement : la lecture est suspendue quand la tête de lecture s'approche
+    de la fin des données écrites, puis reprise une fois l'avance reconstituée.
+    """
+    global buffer_after_id, buffering
+    if buffer_after_id is not None:
+        root.after_cancel(buffer_after_id)
+        buffer_after_id = None
+    stream = music_stream
+    if not isinstance(stream, ProgressiveStream) or stream.closed:
+        # Autre morceau chargé : sa lecture a déjà démarré
+        buffering = False
+        return
+    ahead = stream.buffered_seconds() - get_playback_position()
+    if not buffering and not stream.finished and not is_paused and ahead < PROGRESSIVE_LOW_BUFFER_S:
+        pygame.mixer.music.pause()
+        buffering = True
+        now_playing_label.configure(text=f"Mise en mémoire tampon : {current_file}")
+    elif buffering and (stream.finished or ahead >= PROGRESSIVE_MIN_BUFFER_S):
+        buffering = False
+        now_playing_label.configure(text=f"En cours de lecture : {current_file}")
+        if not is_paused:
+            pygame.mixer.music.unpause()
+            ensure_progress_loop()
+            schedule_end_check()
+            schedule_crossfade()
+    if not stream.finished or buffering:
+        buffer_after_id = root.after(int(PROGRESSIVE_POLL_S * 1000), watch_progressive_buffer)
+
+def get_track_duration(filename):
+    """Retourne la durée d'un morceau, en la lisant si l'analyse ne l'a pas encore fournie."""
+    metadata = catalog.metadata.setdefault(filename, {})
+    if "duration" not in metadata:
+        scanned = read_track_metadata(os.path.join("audio", filename))
+        metadata.update(duration=scanned["duration"], bitrate=scanned["bitrate"])
+    return metadata["duration"]
+
+def load_duration_async(filename):
+    """Lit la durée d'un morceau hors du thread de l'interface puis l'affiche."""
+    duration = get_track_duration(filename)
+    root.after(0, apply_track_duration, filename, duration)
+
+def apply_track_duration(filename, duration):
+    """Affiche la durée lue en arrière-plan si le morceau est toujours en cours."""
+    global audio_duration
+    if filename == current_file:
+        audio_duration = duration
+        total_time_label.configure(text=format_time(audio_duration))
+        schedule_end_check()
+        schedule_crossfade()
+
+def start_track_ui(filename, playlist_name=None, playlist_entry=None):
+    """
+    Met à jour l'interface et l'état de lecture pour un morceau qui vient de démarrer,
+    puis prépare le morceau suivant.
+    
+    :param filename: Nom du fichier audio
+    :param playlist_name: Nom de la playlist si applicable
+    :param playlist_entry: Occurrence jouée dans la playlist, sinon déduite de la précédente
+    """
+    global audio_duration, seek_offset, is_paused, current_playlist, current_playlist_entry, current_file, end_event_pending
+    current_file = filename
+    end_event_pending = True
     update_now_playing(filename)
-    playback_start_time = time.time()
-    total_paused_duration = 0
-    last_pause_time = None
+    seek_offset = 0
     is_paused = False
     current_time_label.configure(text="0:00")
     
-    # Récupération de la durée audio
-    if MP3 is not None:
-        try:
-            audio = MP3(selected_file)
-            audio_duration = audio.info.length
-            total_time_label.configure(text=format_time(audio_duration))
-        except Exception:
-            audio_duration = 0
-            total_time_label.configure(text="0:00")
+    # Durée audio : fournie par l'analyse des métadonnées, sinon lue en arrière-plan
+    metadata = catalog.metadata.get(filename, {})
+    if "duration" in metadata:
+        audio_duration = metadata["duration"]
     else:
         audio_duration = 0
-        total_time_label.configure(text="0:00")
+        threading.Thread(target=load_duration_async, args=(filename,), daemon=True).start()
+    total_time_label.configure(text=format_time(audio_duration))
+    schedule_end_check()
+    schedule_crossfade()
+    ensure_progress_loop()
     
-    # Affichage de la pochette
-    base_name = os.path.splitext(filename)[0]
-    cover_path = os.path.join("Pochette_album", f"{base_name}.jpg")
-    if not os.path.exists(cover_path):
-        img = create_default_cover(size=(300,300))
+    # Affichage de la pochette : immédiat si elle a été préparée à l'avance,
+    # sinon une pochette neutre en attendant le rendu en arrière-plan
+    final_img = prefetched_covers.pop(filename, None)
+    if final_img is not None:
+        now_playing_renderer.cancel()
+        show_now_playing_cover(final_img)
     else:
-        img = Image.open(cover_path)
-    try:
-        cover_clear = ImageOps.fit(img, (300,300), method=Image.LANCZOS, centering=(0.5,0.5))
-        bg_size = (340,340)
-        blurred = cover_clear.resize(bg_size).filter(ImageFilter.GaussianBlur(radius=10))
-        composite = blurred.copy()
-        offset = ((bg_size[0]-cover_clear.width)//2, (bg_size[1]-cover_clear.height)//2)
-        composite.paste(cover_clear, offset)
-        final_img = add_rounded_corners(composite, radius=30)
-        cover_img_global = ctk.CTkImage(light_image=final_img, size=(340,340))
-        cover_label.configure(image=cover_img_global)
-    except Exception as e:
-        print(f"Erreur chargement cover : {e}")
+        show_now_playing_cover(None)
+        now_playing_renderer.request(filename, lambda f, img: root.after(0, show_rendered_cover, f, img))
+    draw_progress(0)
+    load_waveform(filename)
+    seek_index_store.request(filename)
 
+    # Favoris et playlist affichée ne changent pas : seule la mise en évidence suit le morceau
     update_library_highlight()
     add_to_history(filename)
-    update_favorites_view()
-    update_playlists_view()
 
     # Mise à jour de la playlist active si applicable
     if playlist_name is not None:
         current_playlist = playlist_name
-        playlist_tracks = app_data["playlists"].get(playlist_name, [])
-        try:
-            current_playlist_index = playlist_tracks.index(filename)
-        except ValueError:
-            current_playlist_index = 0
+        playlist = playlist_store.get(playlist_name)
+        near = playlist_entry if playlist_entry is not None else current_playlist_entry
+        current_playlist_entry = playlist.find(catalog.id_for(filename), near) if playlist is not None else None
     else:
         current_playlist = None
 
+    if shuffle_enabled:
+        note_shuffled_track(filename)
+    prepare_next_track()
+
+def show_now_playing_cover(img):
+    """
+    Affiche la pochette du morceau en cours.
+    
+    :param img: Image composée, ou None pour la pochette neutre
+    """
+    global cover_img_global, cover_placeholder_img
+    if img is None:
+        if cover_placeholder_img is None:
+            size = NOW_PLAYING_COVER_GEOMETRY[1]
+            placeholder = add_rounded_corners(Image.new("RGB", (size, size), "#333333"), radius=NOW_PLAYING_COVER_GEOMETRY[3])
+            cover_placeholder_img = ctk.CTkImage(light_image=placeholder, size=(size, size))
+        cover_img_global = cover_placeholder_img
+    else:
+        cover_img_global = ctk.CTkImage(light_image=img, size=(340,340))
+    cover_label.configure(image=cover_img_global)
+
+def show_rendered_cover(filename, img):
+    """Affiche une pochette rendue en arrière-plan si le morceau est toujours en cours."""
+    if filename == current_file:
+        show_now_playing_cover(img)
+
+def peek_next_track():
+    """
+    Détermine le morceau qui suivra le morceau en cours, sans rien modifier.
+    
+    :return: (fichier, playlist, entrée de la playlist ou None) ou None
+    """
+    if current_file is None:
+        return None
+    if loop_enabled:
+        return current_file, current_playlist, current_playlist_entry
+    if shuffle_enabled:
+        next_file = peek_shuffled_track()
+        return (next_file, current_playlist, None) if next_file is not None else None
+    if current_playlist:
+        found = playlist_neighbour(current_playlist, current_playlist_entry)
+        return (found[1], current_playlist, found[0]) if found is not None else None
+    next_file = catalog.next_after(current_file)
+    return (next_file, None, None) if next_file is not None else None
+
+def prefetch_track(filename):
+    """Prépare en arrière-plan la durée et la pochette d'un morceau."""
+    try:
+        get_track_duration(filename)
+        prefetched_covers[filename] = render_cover(cover_path_for(filename), NOW_PLAYING_COVER_GEOMETRY)
+        waveform_store.request(filename)
+        seek_index_store.request(filename)
+    except Exception as e:
+        print(f"Erreur préchargement de {filename} : {e}")
+
+def prepare_next_track():
+    """
+    Met le morceau suivant en file dans pygame pour un enchaînement sans blanc,
+    et précharge ses métadonnées et sa pochette pendant la lecture en cours.
+    """
+    global queued_track
+    # pygame ne permet pas de retirer un morceau de la file : un morceau déjà en file y reste
+    if not app_data["settings"].get("gapless", True):
+        return
+    upcoming = peek_next_track()
+    if upcoming is None:
+        return
+    try:
+        pygame.mixer.music.queue(os.path.join("audio", upcoming[0]))
+    except Exception as e:
+        print(f"Impossible de mettre en file {upcoming[0]} : {e}")
+        return
+    queued_track = upcoming
+    prefetched_covers.clear()
+    threading.Thread(target=prefetch_track, args=(upcoming[0],), daemon=True).start()
+
 def update_now_playing(file):
     """Met à jour l'affichage du morceau en cours et affiche une notification."""
     now_playing_label.configure(text=f"En cours de lecture : {file}")
     notify(f"Lancement de {file}")
 
 def update_library_highlight():
-    """Met en évidence le fichier audio actuellement lu dans la bibliothèque."""
-    current_file = now_playing_label.cget("text").replace("En cours de lecture : ", "")
-    for file, widget in library_title_widgets.items():
-        widget.configure(text_color="#1cd061" if file == current_file else "white")
+    """Met en évidence le fichier audio actuellement lu dans la bibliothèque, les favoris et la playlist affichée."""
+    for rows in (library_list, favorites_rows, playlist_contents_rows):
+        if rows is not None:
+            rows.set_highlight(current_file)
 
 def pause_audio():
     """Permet de mettre en pause ou reprendre la lecture."""
-    global is_paused, last_pause_time, total_paused_duration
-    if pygame.mixer.music.get_busy() or is_paused:
+    global is_paused
+    if pygame.mixer.music.get_busy() or is_paused or buffering:
         if not is_paused:
             pygame.mixer.music.pause()
+            crossfade_engine.pause()
             is_paused = True
-            last_pause_time = time.time()
             pause_btn.configure(image=play_img)
         else:
-            pygame.mixer.music.unpause()
+            if not buffering:
+                # En attente du téléchargement : watch_progressive_buffer reprendra la lecture
+                pygame.mixer.music.unpause()
+            crossfade_engine.resume()
             is_paused = False
-            if last_pause_time is not None:
-                total_paused_duration += time.time() - last_pause_time
-            last_pause_time = None
             pause_btn.configure(image=pause_img)
+            ensure_progress_loop()
+        schedule_end_check()
+        schedule_crossfade()
     else:
         messagebox.showwarning("Aucune lecture", "Aucun fichier audio en lecture.")
 
 def next_track():
     """Passe au morceau suivant dans la playlist ou dans la bibliothèque."""
-    global current_playlist, current_playlist_index
+    if shuffle_enabled:
+        next_file = peek_shuffled_track()
+        if next_file is not None:
+            play_audio_by_filename(next_file, current_playlist)
+        return
     if current_playlist:
-        playlist_tracks = app_data["playlists"].get(current_playlist, [])
-        if not playlist_tracks:
-            return
-        current_playlist_index = (current_playlist_index + 1) % len(playlist_tracks)
-        next_file = playlist_tracks[current_playlist_index]
-        play_audio_by_filename(next_file, current_playlist)
+        found = playlist_neighbour(current_playlist, current_playlist_entry)
+        if found is not None:
+            entry, next_file = found
+            play_audio_by_filename(next_file, current_playlist, entry)
     else:
-        audio_files = sorted([f for f in os.listdir("audio") if f.endswith(".mp3")])
-        current_title = now_playing_label.cget("text").replace("En cours de lecture : ", "")
-        try:
-            current_index = audio_files.index(current_title)
-        except ValueError:
-            current_index = -1
-        next_index = (current_index + 1) % len(audio_files)
-        play_audio_by_filename(audio_files[next_index])
+        next_file = catalog.next_after(current_file)
+        if next_file is not None:
+            play_audio_by_filename(next_file)
+
+def playlist_neighbour(playlist_name, entry, backwards=False):
+    """
+    Retourne l'occurrence voisine dans une playlist (avec retour au début), en passant
+    les morceaux dont le fichier est absent.
+    
+    :param entry: Entrée de départ (None : avant la première)
+    :return: (entrée, fichier) ou None
+    """
+    playlist = playlist_store.get(playlist_name)
+    if playlist is None:
+        return None
+    for _ in range(len(playlist)):
+        entry = playlist.before(entry) if backwards else playlist.after(entry)
+        file = catalog.filename_for(playlist.track_of[entry])
+        if file is not None:
+            return entry, file
+    return None
 
 def previous_track():
     """Reprend le morceau précédent dans la playlist ou la bibliothèque."""
-    global current_playlist, current_playlist_index
+    if shuffle_enabled:
+        key, shuffle = get_shuffle_queue()
+        track_id = shuffle.back()
+        save_shuffle_queue(key)
+        if track_id is not None:
+            play_audio_by_filename(catalog.filename_for(track_id), current_playlist)
+        return
     if current_playlist:
-        playlist_tracks = app_data["playlists"].get(current_playlist, [])
-        if not playlist_tracks:
-            return
-        current_playlist_index = (current_playlist_index - 1) % len(playlist_tracks)
-        prev_file = playlist_tracks[current_playlist_index]
-        play_audio_by_filename(prev_file, current_playlist)
+        found = playlist_neighbour(current_playlist, current_playlist_entry, backwards=True)
+        if found is not None:
+            entry, prev_file = found
+            play_audio_by_filename(prev_file, current_playlist, entry)
     else:
-        audio_files = sorted([f for f in os.listdir("audio") if f.endswith(".mp3")])
-        current_title = now_playing_label.cget("text").replace("En cours de lecture : ", "")
-        try:
-            current_index = audio_files.index(current_title)
-        except ValueError:
-            current_index = 0
-        previous_index = (current_index - 1) % len(audio_files)
-        play_audio_by_filename(audio_files[previous_index])
+        prev_file = catalog.previous_before(current_file)
+        if prev_file is not None:
+            play_audio_by_filename(prev_file)
 
 def toggle_loop():
     """Active ou désactive la boucle de lecture."""
     global loop_enabled
     loop_enabled = not loop_enabled
     loop_btn.configure(image=loop_img if loop_enabled else no_loop_img)
+    if current_file is not None:
+        prepare_next_track()
+
+# --- Lecture aléatoire ---
+
+SHUFFLE_HISTORY = 200            # Morceaux mémorisés pour revenir en arrière
+SHUFFLE_RECENCY_DAYS = 30        # Au-delà, une lecture ne pénalise plus un morceau
+LIBRARY_SHUFFLE_KEY = "bibliothèque"
+SHUFFLE_ON_COLOR = "#1cd061"
+SHUFFLE_OFF_COLOR = "#333333"
+SHUFFLE_FILE = "shuffle.json"    # Files aléatoires, enregistrées à part de app_data.json
+SHUFFLE_SAVE_DELAY_MS = 10000    # Regroupement des enregistrements des files aléatoires
+
+def shuffle_weight(stats, now):
+    """
+    Poids d'un morceau dans le tirage pondéré : les morceaux peu joués, ou pas
+    joués depuis longtemps, sortent plus tôt dans le tour.
+    
+    :param stats: (nombre de lectures, dernière lecture), ou None si jamais joué
+    :param now: Horodatage courant
+    """
+    if not stats:
+        return 1.0
+    count, last_played = stats
+    age_days = (now - last_played) / 86400 if last_played else SHUFFLE_RECENCY_DAYS
+    return (0.1 + min(age_days, SHUFFLE_RECENCY_DAYS) / SHUFFLE_RECENCY_DAYS) / math.sqrt(1 + count)
+
+class ShuffleQueue:
+    """
+    File de lecture aléatoire d'un contexte (bibliothèque ou playlist), par identifiants
+    du catalogue : chaque morceau sort une fois avant qu'un nouveau tour soit tiré.
+    Les morceaux à venir forment une pile (le prochain en fin de liste) ; suivant,
+    précédent, ajout et retrait se font en temps constant, les retraits laissant
+    des trous compactés de temps en temps.
+    """
+
+    def __init__(self, data=None):
+        """
+        :param data: État enregistré par to_dict(), ou None pour une file vide
+        """
+        data = data or {}
+        self.upcoming = list(data.get("upcoming", []))     # Pile des morceaux à venir (None : retiré)
+        self.dealt = set(data.get("dealt", []))            # Morceaux déjà sortis dans ce tour
+        self.history = list(data.get("history", []))[-SHUFFLE_HISTORY:]
+        self.slots = {track_id: i for i, track_id in enumerate(self.upcoming)}
+        self.members = set(self.slots) | self.dealt
+        self.holes = 0
+        self.version = None
+
+    def to_dict(self):
+        """Retourne l'état à enregistrer."""
+        return {
+            "upcoming": [track_id for track_id in self.upcoming if track_id is not None],
+            "dealt": sorted(self.dealt),
+            "history": list(self.history),
+        }
+
+    def sync(self, members, version=None):
+        """
+        Prend en compte les morceaux ajoutés ou retirés du contexte.
+        
+        :param members: Identifiants du contexte
+        :param version: Version du contexte : rien n'est comparé si elle n'a pas changé
+        """
+        if version is not None and version == self.version:
+            return
+        members = set(members)
+        members.discard(None)
+        for track_id in members - self.members:
+            self.add(track_id)
+        for track_id in self.members - members:
+            self.discard(track_id)
+        self.version = version
+
+    def add(self, track_id):
+        """Place un nouveau morceau à un rang aléatoire du tour en cours, après le prochain."""
+        if track_id in self.members:
+            return
+        self.members.add(track_id)
+        following = self._pop_top()
+        self.upcoming.append(track_id)
+        self.slots[track_id] = len(self.upcoming) - 1
+        self._swap(len(self.upcoming) - 1, random.randrange(len(self.upcoming)))
+        if following is not None:
+            self._push(following)
+
+    def discard(self, track_id):
+        """Retire un morceau du contexte."""
+        self.members.discard(track_id)
+        self.dealt.discard(track_id)
+        slot = self.slots.pop(track_id, None)
+        if slot is not None:
+            self.upcoming[slot] = None
+            self.holes += 1
+            if self.holes > 16 and self.holes * 2 > len(self.upcoming):
+                self._compact()
+
+    def peek(self, weights=None):
+        """
+        Retourne le prochain morceau sans le sortir de la file, en tirant un nouveau
+        tour si le précédent est épuisé.
+        
+        :param weights: Fonction retournant une fonction de poids par identifiant (appelée seulement pour un nouveau tour), ou None pour un tirage uniforme
+        :return: Identifiant, ou None si le contexte est vide
+        """
+        while self.upcoming and self.upcoming[-1] is None:
+            self.upcoming.pop()
+            self.holes -= 1
+        if not self.upcoming:
+            if not self.members:
+                return None
+            self._deal(weights() if weights else None)
+        return self.upcoming[-1]
+
+    def played(self, track_id):
+        """Enregistre le lancement d'un morceau (suivant, choisi à la main ou enchaîné)."""
+        if track_id not in self.members:
+            return
+        slot = self.slots.pop(track_id, None)
+        if slot is not None:
+            if slot == len(self.upcoming) - 1:
+                self.upcoming.pop()
+            else:
+                self.upcoming[slot] = None
+                self.holes += 1
+        self.dealt.add(track_id)
+        if not self.history or self.history[-1] != track_id:
+            self.history.append(track_id)
+            if len(self.history) > SHUFFLE_HISTORY:
+                del self.history[0]
+
+    def back(self):
+        """
+        Revient au morceau précédent : le morceau en cours redevient le prochain.
+        
+        :return: Identifiant du morceau précédent, ou None
+        """
+        while len(self.history) >= 2:
+            current = self.history.pop()
+            previous = self.history.pop()
+            if current in self.members and current not in self.slots:
+                self.dealt.discard(current)
+                self._push(current)
+            if previous in self.members:
+                return previous
+            self.history.append(current)
+        return None
+
+    def _deal(self, weight=None):
+        """Tire un nouveau tour avec tous les morceaux du contexte."""
+        order = list(self.members)
+        if weight is None:
+            random.shuffle(order)
+        else:
+            # Tirage pondéré sans remise (clés u^(1/poids)) : les plus grandes clés sortent en premier
+            keys = {track_id: random.random() ** (1 / max(weight(track_id), 1e-6)) for track_id in order}
+            order.sort(key=keys.__getitem__)
+        if len(order) > 1 and self.history and order[-1] == self.history[-1]:
+            # Pas deux fois de suite le même morceau d'un tour à l'autre
+            order[-1], order[0] = order[0], order[-1]
+        self.upcoming = order
+        self.slots = {track_id: i for i, track_id in enumerate(order)}
+        self.dealt = set()
+        self.holes = 0
+
+    def _pop_top(self):
+        while self.upcoming:
+            track_id = self.upcoming.pop()
+            if track_id is not None:
+                del self.slots[track_id]
+                return track_id
+            self.holes -= 1
+        return None
+
+    def _push(self, track_id):
+        self.upcoming.append(track_id)
+        self.slots[track_id] = len(self.upcoming) - 1
+
+    def _swap(self, i, j):
+        a, b = self.upcoming[i], self.upcoming[j]
+        self.upcoming[i], self.upcoming[j] = b, a
+        if a is not None:
+            self.slots[a] = j
+        if b is not None:
+            self.slots[b] = i
+
+    def _compact(self):
+        self.upcoming = [track_id for track_id in self.upcoming if track_id is not None]
+        self.slots = {track_id: i for i, track_id in enumerate(self.upcoming)}
+        self.holes = 0
+
+def load_shuffle_data():
+    """Charge les files aléatoires enregistrées (reprises de app_data.json pour les anciennes versions)."""
+    legacy = app_data.pop("shuffle", None)
+    if legacy is not None:
+        save_app_data(app_data)
+    try:
+        with open(SHUFFLE_FILE, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Erreur lecture {SHUFFLE_FILE} : {e}")
+    return legacy or {}
+
+shuffle_data = load_shuffle_data()    # {clé du contexte: état enregistré}
+shuffle_queues = {}              # {clé du contexte: ShuffleQueue}
+dirty_shuffle_queues = set()     # Clés des files modifiées depuis le dernier enregistrement
+shuffle_save_after_id = None     # Enregistrement des files programmé
+shuffle_writer = AppDataWriter(SHUFFLE_FILE)
+atexit.register(shuffle_writer.flush)
+
+def get_shuffle_queue():
+    """
+    Retourne la file aléatoire du contexte en cours (playlist active ou bibliothèque),
+    mise à jour des morceaux ajoutés ou retirés.
+    
+    :return: (clé du contexte, ShuffleQueue)
+    """
+    key = f"playlist:{current_playlist}" if current_playlist else LIBRARY_SHUFFLE_KEY
+    shuffle = shuffle_queues.get(key)
+    if shuffle is None:
+        shuffle = shuffle_queues[key] = ShuffleQueue(shuffle_data.get(key))
+    if current_playlist:
+        playlist = playlist_store.get(current_playlist)
+        if playlist is None:
+            shuffle.sync(())
+        else:
+            present = (track_id for track_id in playlist.track_ids() if track_id in catalog.by_id)
+            shuffle.sync(present, (playlist.version, catalog.version))
+    else:
+        shuffle.sync(catalog.by_id, catalog.version)
+    return key, shuffle
+
+def save_shuffle_queue(key):
+    """
+    Marque une file aléatoire comme modifiée. Sa sérialisation, proportionnelle à la
+    taille du contexte, n'a lieu qu'à l'enregistrement groupé ou à la fermeture.
+    """
+    global shuffle_save_after_id
+    dirty_shuffle_queues.add(key)
+    if shuffle_save_after_id is None and root is not None:
+        shuffle_save_after_id = root.after(SHUFFLE_SAVE_DELAY_MS, flush_shuffle_queues)
+
+def flush_shuffle_queues():
+    """Sérialise les files aléatoires modifiées et programme leur écriture."""
+    global shuffle_save_after_id
+    shuffle_save_after_id = None
+    if not dirty_shuffle_queues:
+        return
+    for key in dirty_shuffle_queues:
+        shuffle_data[key] = shuffle_queues[key].to_dict()
+    dirty_shuffle_queues.clear()
+    shuffle_writer.mark_dirty(json.dumps(shuffle_data))
+
+atexit.register(flush_shuffle_queues)    # Exécuté avant shuffle_writer.flush (ordre inverse)
+
+def shuffle_weights():
+    """Retourne la fonction de poids des morceaux selon l'historique, ou None si désactivée."""
+    if not app_data["settings"].get("shuffle_weighted", True):
+        return None
+    stats = history_store.all_stats()
+    now = time.time()
+    return lambda track_id: shuffle_weight(stats.get(catalog.filename_for(track_id)), now)
 
-def shuffle_playlist():
-    """Lit un fichier audio aléatoire parmi ceux disponibles."""
-    audio_files = sorted([f for f in os.listdir("audio") if f.endswith(".mp3")])
-    random.shuffle(audio_files)
-    if audio_files:
-        play_audio_by_filename(audio_files[0])
+def peek_shuffled_track():
+    """Retourne le prochain morceau de la file aléatoire, ou None."""
+    key, shuffle = get_shuffle_queue()
+    track_id = shuffle.peek(shuffle_weights)
+    save_shuffle_queue(key)
+    return catalog.filename_for(track_id) if track_id is not None else None
+
+def note_shuffled_track(filename):
+    """Sort de la file aléatoire du contexte en cours un morceau qui vient de démarrer."""
+    key, shuffle = get_shuffle_queue()
+    shuffle.played(catalog.id_for(filename))
+    save_shuffle_queue(key)
+
+def toggle_shuffle():
+    """Active ou désactive la lecture aléatoire ; lance un morceau si rien n'est joué."""
+    global shuffle_enabled
+    shuffle_enabled = not shuffle_enabled
+    app_data["settings"]["shuffle"] = shuffle_enabled
+    save_app_data(app_data)
+    shuffle_btn.configure(fg_color=SHUFFLE_ON_COLOR if shuffle_enabled else SHUFFLE_OFF_COLOR)
+    if current_file is None:
+        if shuffle_enabled:
+            next_track()
+        return
+    if shuffle_enabled:
+        note_shuffled_track(current_file)
+    prepare_next_track()
 
 def set_volume(value):
     """Ajuste le volume de la lecture."""
     volume = float(value) / 100
     pygame.mixer.music.set_volume(volume)
+    crossfade_engine.set_volume(volume)
 
 def check_music_end():
     """Surveille la fin de la lecture pour passer au morceau suivant ou relancer en boucle."""
+    global queued_track, end_event_pending
     for event in pygame.event.get():
         if event.type == pygame.USEREVENT:
-            if loop_enabled:
-                play_audio_by_filename(now_playing_label.cget("text").replace("En cours de lecture : ", ""), current_playlist)
+            end_event_pending = False
+            if queued_track is not None and pygame.mixer.music.get_busy():
+                # pygame a déjà enchaîné sur le morceau en file : seule l'interface est à mettre à jour
+                next_file, playlist_name, entry = queued_track
+                queued_track = None
+                start_track_ui(next_file, playlist_name, entry)
+            elif loop_enabled:
+                play_audio_by_filename(current_file, current_playlist, current_playlist_entry)
             else:
                 next_track()
-    root.after(100, check_music_end)
+    if end_check_after_id is None:
+        schedule_end_check()
+
+END_POLL_FAST_MS = 50        # Sondage rapproché à l'approche de la fin du morceau
+END_POLL_MAX_MS = 5000       # Intervalle maximal pendant la lecture (durée inconnue ou imprécise)
+END_POLL_MARGIN_MS = 250     # Marge avant la fin estimée où le sondage devient rapproché
+
+end_check_after_id = None        # Prochaine vérification de fin de morceau programmée
+end_event_pending = False        # Fin du morceau en cours pas encore traitée (événement de pygame attendu)
+
+def schedule_end_check():
+    """
+    (Re)programme la vérification de fin de morceau selon l'état de lecture :
+    aucune vérification à l'arrêt ou en pause, des vérifications espacées pendant
+    la lecture, puis rapprochées juste avant la fin estimée.
+    """
+    global end_check_after_id, end_event_pending
+    if end_check_after_id is not None:
+        root.after_cancel(end_check_after_id)
+        end_check_after_id = None
+    if current_file is None or is_paused or buffering:
+        return
+    if not pygame.mixer.music.get_busy():
+        # Morceau terminé juste après la lecture des événements : son événement de fin
+        # est encore en file, une dernière vérification le traite
+        if end_event_pending:
+            end_event_pending = False
+            end_check_after_id = root.after(END_POLL_FAST_MS, run_end_check)
+        return
+    if audio_duration > 0:
+        remaining_ms = (audio_duration - get_playback_position()) * 1000 - END_POLL_MARGIN_MS
+        delay = int(min(max(remaining_ms, END_POLL_FAST_MS), END_POLL_MAX_MS))
+    else:
+        delay = END_POLL_MAX_MS // 10
+    end_check_after_id = root.after(delay, run_end_check)
+
+def run_end_check():
+    """Exécute une vérification programmée de fin de morceau."""
+    global end_check_after_id
+    end_check_after_id = None
+    check_music_end()
+
+crossfade_after_id = None        # Préparation ou début du fondu enchaîné programmé
+
+def schedule_crossfade():
+    """(Re)programme le fondu enchaîné vers le morceau suivant selon la position de lecture."""
+    global crossfade_after_id
+    if crossfade_after_id is not None:
+        root.after_cancel(crossfade_after_id)
+        crossfade_after_id = None
+    fade_s = app_data["settings"].get("crossfade_s", 0)
+    if not fade_s or current_file is None or is_paused or audio_duration <= fade_s + CROSSFADE_LEAD_S:
+        return
+    remaining = audio_duration - get_playback_position()
+    if remaining > fade_s:
+        delay = remaining - fade_s - CROSSFADE_LEAD_S
+        crossfade_after_id = root.after(max(0, int(delay * 1000)), prepare_crossfade)
+
+def prepare_crossfade():
+    """Lance le décodage de la fin du morceau en cours puis programme le début du fondu."""
+    global crossfade_after_id
+    crossfade_after_id = None
+    fade_s = app_data["settings"].get("crossfade_s", 0)
+    start = max(0, audio_duration - fade_s - CROSSFADE_MARGIN_S)
+    if crossfade_engine.prepare(os.path.join(catalog.directory, current_file), start):
+        remaining = audio_duration - get_playback_position()
+        crossfade_after_id = root.after(max(0, int((remaining - fade_s) * 1000)), start_crossfade)
+
+def start_crossfade():
+    """
+    Passe la fin du morceau en cours sur le canal du fondu et lance le suivant en fondu
+    d'entrée. Sans fin décodée à temps, le morceau se termine normalement.
+    """
+    global crossfade_after_id
+    crossfade_after_id = None
+    fade_s = app_data["settings"].get("crossfade_s", 0)
+    position = get_playback_position()
+    remaining = audio_duration - position
+    if is_paused or not pygame.mixer.music.get_busy() or not crossfade_engine.ready():
+        return
+    if remaining > fade_s + 0.25:
+        # Retard (pause, positionnement) : nouveau calcul
+        schedule_crossfade()
+        return
+    upcoming = queued_track or peek_next_track()
+    if upcoming is None or remaining <= 0:
+        crossfade_engine.cancel()
+        return
+    crossfade_engine.start(position, remaining, pygame.mixer.music.get_volume())
+    next_file, playlist_name, entry = upcoming
+    play_audio_by_filename(next_file, playlist_name, entry, fade_ms=int(remaining * 1000))
+
+def set_crossfade(value):
+    """Change la durée du fondu enchaîné et sauvegarde le paramètre."""
+    app_data["settings"]["crossfade_s"] = CROSSFADE_CHOICES[value]
+    save_app_data(app_data)
+    if current_file is not None:
+        schedule_crossfade()
 
 def on_canvas_click(event):
     """Permet de chercher dans la piste en cliquant sur la barre de progression."""
-    global playback_start_time, total_paused_duration, is_paused
+    global seek_offset, is_paused
     canvas_width = progress_canvas.winfo_width()
     new_fraction = event.x / canvas_width
     new_time = new_fraction * audio_duration
     try:
-        pygame.mixer.music.play(start=new_time)
+        new_time = seek_playback(new_time)
     except Exception as e:
         print("La recherche n'est peut-être pas supportée :", e)
-    playback_start_time = time.time() - new_time
-    total_paused_duration = 0
+        return
+    # get_pos() repart de zéro à chaque play() : la position réelle est décalée de new_time
+    seek_offset = new_time
     is_paused = False
     pause_btn.configure(image=pause_img)
+    crossfade_engine.cancel()
+    schedule_end_check()
+    schedule_crossfade()
+    ensure_progress_loop()
+
+music_stream = None              # Flux chargé dans pygame à la place d'un fichier (positionnement, lecture progressive)
+
+def seek_playback(seconds):
+    """
+    Positionne la lecture du morceau en cours. Un MP3 indexé est rouvert directement
+    au début de la trame visée (latence constante, position exacte) ; sinon pygame
+    parcourt le fichier jusqu'à la position.
+    
+    :return: Position réelle de reprise en secondes
+    """
+    global music_stream, queued_track
+    if isinstance(music_stream, ProgressiveStream) and not music_stream.finished:
+        # Pas de positionnement au-delà de ce qui est déjà téléchargé
+        seconds = max(0, min(seconds, music_stream.buffered_seconds() - PROGRESSIVE_MIN_BUFFER_S))
+        pygame.mixer.music.play(start=seconds)
+        return seconds
+    index = seek_index_store.get(current_file)
+    if index is None:
+        pygame.mixer.music.play(start=seconds)
+        return seconds
+    path = os.path.join(catalog.directory, current_file)
+    offset, start = index.locate(path, seconds)
+    stream = FileSlice(path, offset)
+    try:
+        pygame.mixer.music.load(stream, "mp3")
+    except Exception:
+        stream.close()
+        raise
+    pygame.mixer.music.play()
+    release_music_stream()
+    music_stream = stream
+    # load() vide la file de pygame : le morceau suivant y est remis
+    queued_track = None
+    prepare_next_track()
+    return start
+
+def release_music_stream():
+    """Ferme le flux chargé précédemment (pygame a chargé une autre source)."""
+    global music_stream
+    if music_stream is not None:
+        music_stream.close()
+        music_stream = None
+
+def get_playback_position():
+    """
+    Retourne la position de lecture en secondes, mesurée par le mixer
+    (le temps en pause n'est pas compté par get_pos()).
+    """
+    if current_file is None:
+        return 0
+    pos = pygame.mixer.music.get_pos()
+    if pos < 0:
+        return audio_duration
+    return seek_offset + pos / 1000
+
+PROGRESS_HEIGHT = 36             # Hauteur du canvas de progression (forme d'onde)
+PROGRESS_BAR_HEIGHT = 8          # Hauteur de la barre simple (forme d'onde indisponible)
+
+progress_item = None             # Polygone persistant de la barre de progression
+waveform_peak_item = None        # Polygone des crêtes (forme d'onde complète)
+waveform_rms_item = None         # Polygone des valeurs RMS
+waveform_played_item = None      # Polygone des crêtes de la partie déjà lue
+current_waveform = None          # (crêtes, RMS) du morceau en cours, ou None
+progress_fraction = 0            # Fraction de lecture actuellement dessinée
+progress_drawn_width = None      # Largeur (px) actuellement dessinée
+progress_after_id = None         # Prochain rafraîchissement programmé
+
+def waveform_polygon(values, width, upto=None):
+    """
+    Retourne les points du polygone symétrique d'une forme d'onde.
+    
+    :param values: Amplitudes (0-1) de chaque intervalle
+    :param width: Largeur totale dessinée
+    :param upto: Abscisse à laquelle s'arrêter (partie déjà lue), ou None
+    """
+    mid = PROGRESS_HEIGHT / 2
+    step = width / max(len(values) - 1, 1)
+    count = len(values) if upto is None else min(len(values), int(upto // step) + 1)
+    if upto is not None and upto < 1:
+        return [0, mid, 0, mid, 0, mid]
+    top, bottom = [], []
+    for i in range(count):
+        x = i * step
+        h = max(values[i] * (mid - 1), 0.5)
+        top += (x, mid - h)
+        bottom += (x, mid + h)
+    if upto is not None and count < len(values):
+        h = max(values[count] * (mid - 1), 0.5)
+        top += (upto, mid - h)
+        bottom += (upto, mid + h)
+    for i in range(len(bottom) - 2, -1, -2):
+        top += (bottom[i], bottom[i + 1])
+    return top
+
+def set_waveform(summary):
+    """Remplace la forme d'onde affichée (None : barre de progression simple)."""
+    global current_waveform
+    current_waveform = None if summary is None else (summary[0].tolist(), summary[1].tolist())
+    redraw_waveform()
+
+def redraw_waveform(event=None):
+    """Redessine la forme d'onde à la largeur du canvas (changement de morceau ou redimensionnement)."""
+    global progress_drawn_width
+    if current_waveform is None:
+        for item in (waveform_peak_item, waveform_rms_item, waveform_played_item):
+            progress_canvas.itemconfigure(item, state="hidden")
+        progress_canvas.itemconfigure(progress_item, state="normal")
+    else:
+        width = progress_canvas.winfo_width()
+        progress_canvas.coords(waveform_peak_item, *waveform_polygon(current_waveform[0], width))
+        progress_canvas.coords(waveform_rms_item, *waveform_polygon(current_waveform[1], width))
+        for item in (waveform_peak_item, waveform_rms_item, waveform_played_item):
+            progress_canvas.itemconfigure(item, state="normal")
+        progress_canvas.itemconfigure(progress_item, state="hidden")
+    progress_drawn_width = None
+    draw_progress(progress_fraction)
+
+def draw_progress(fraction):
+    """Dessine la partie lue (barre ou forme d'onde) si sa largeur a changé."""
+    global progress_fraction, progress_drawn_width
+    progress_fraction = fraction
+    canvas_width = progress_canvas.winfo_width()
+    width = round(fraction * canvas_width)
+    if width == progress_drawn_width:
+        return
+    if current_waveform is None:
+        top = (PROGRESS_HEIGHT - PROGRESS_BAR_HEIGHT) / 2
+        progress_canvas.coords(progress_item, *round_rectangle_points(0, top, width, top + PROGRESS_BAR_HEIGHT, radius=6))
+    else:
+        progress_canvas.coords(waveform_played_item, *waveform_polygon(current_waveform[0], canvas_width, upto=width))
+    progress_drawn_width = width
+
+def load_waveform(filename):
+    """Affiche la forme d'onde d'un morceau, calculée en arrière-plan si elle manque."""
+    summary = waveform_store.get(filename)
+    set_waveform(summary)
+    if summary is None:
+        waveform_store.request(filename, lambda f: root.after(0, apply_waveform, f))
+
+def apply_waveform(filename):
+    """Affiche une forme d'onde calculée en arrière-plan si le morceau est toujours en cours."""
+    if filename == current_file:
+        set_waveform(waveform_store.get(filename))
 
 def update_canvas_progress():
-    """Met à jour la barre de progression de la lecture."""
-    if playback_start_time and audio_duration > 0:
-        elapsed = (last_pause_time - playback_start_time - total_paused_duration) if (is_paused and last_pause_time) else (time.time() - playback_start_time - total_paused_duration)
-        if elapsed < 0:
-            elapsed = 0
-        fraction = elapsed / audio_duration if audio_duration > 0 else 0
-        fraction = min(fraction, 1)
-        canvas_width = progress_canvas.winfo_width()
-        progress_canvas.delete("progress")
-        round_rectangle(progress_canvas, 0, 0, fraction * canvas_width, 8, radius=6, fill="#1cd061", outline="", tag="progress")
-        current_time_label.configure(text=format_time(elapsed))
-    root.after(1000, update_canvas_progress)
+    """
+    Met à jour la barre de progression de la lecture (items du canvas modifiés sur place).
+    Le rafraîchissement ne se reprogramme que tant qu'un morceau est joué.
+    """
+    global progress_after_id
+    progress_after_id = None
+    if current_file is not None and audio_duration > 0:
+        elapsed = min(max(get_playback_position(), 0), audio_duration)
+        draw_progress(elapsed / audio_duration)
+        text = format_time(elapsed)
+        if current_time_label.cget("text") != text:
+            current_time_label.configure(text=text)
+    if pygame.mixer.music.get_busy() and not is_paused:
+        progress_after_id = root.after(app_data["settings"].get("progress_refresh_ms", 250), update_canvas_progress)
+
+def ensure_progress_loop():
+    """Relance le rafraîchissement de la progression s'il est arrêté."""
+    if progress_after_id is None:
+        update_canvas_progress()
 
 def format_time(seconds):
     """Formate un temps en secondes au format minutes:secondes."""
@@ -447,136 +3909,552 @@ def format_time(seconds):
     sec = int(seconds % 60)
     return f"{minutes}:{sec:02d}"
 
-# --- Gestion de la bibliothèque ---
+# --- Réconciliation des listes ---
 
-def update_library_view():
-    """Actualise l'affichage de la bibliothèque audio."""
-    for widget in library_scrollable_frame.winfo_children():
-        widget.destroy()
-    library_items.clear()
-    library_title_widgets.clear()
-
-    if not os.path.exists("audio"):
-        return
-    all_files = sorted([f for f in os.listdir("audio") if f.endswith(".mp3")])
-    query = search_entry.get().lower()
-    filtered_files = []
-    for f in all_files:
-        match = query in f.lower()
-        tags = app_data["tags"].get(f, {})
-        tag_match = any(query in str(v).lower() for v in tags.values())
-        if match or tag_match or query == "":
-            filtered_files.append(f)
-    for file in filtered_files:
-        base_name = os.path.splitext(file)[0]
-        cover_path = os.path.join("Pochette_album", f"{base_name}.jpg")
-        if not os.path.exists(cover_path):
-            img = create_default_cover(size=(60,60))
+def stable_positions(positions):
+    """
+    Retourne les indices d'une plus longue sous-suite croissante de positions.
+    Les lignes correspondantes n'ont pas besoin d'être déplacées.
+    
+    :param positions: Anciennes positions (-1 pour une nouvelle ligne)
+    :return: Ensemble des indices à laisser en place
+    """
+    tails = []       # Indice de fin de la meilleure sous-suite de chaque longueur
+    previous = {}
+    for i, pos in enumerate(positions):
+        if pos < 0:
+            continue
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if positions[tails[mid]] < pos:
+                lo = mid + 1
+            else:
+                hi = mid
+        previous[i] = tails[lo - 1] if lo > 0 else None
+        if lo == len(tails):
+            tails.append(i)
         else:
-            try:
-                img = Image.open(cover_path)
-            except Exception:
-                img = create_default_cover(size=(60,60))
-        try:
-            cover_clear = ImageOps.fit(img, (60,60), method=Image.LANCZOS, centering=(0.5,0.5))
-            bg_size = (70,70)
-            blurred = cover_clear.resize(bg_size).filter(ImageFilter.GaussianBlur(radius=5))
-            composite = blurred.copy()
-            offset = ((bg_size[0]-cover_clear.width)//2, (bg_size[1]-cover_clear.height)//2)
-            composite.paste(cover_clear, offset)
-            final_img = add_rounded_corners(composite, radius=10)
-            cover_ctk = ctk.CTkImage(light_image=final_img, size=(70,70))
-        except Exception as e:
-            print(f"Erreur chargement cover pour {file} : {e}")
-            cover_ctk = ctk.CTkImage(light_image=create_default_cover(size=(60,60)), size=(70,70))
+            tails[lo] = i
+    stable = set()
+    i = tails[-1] if tails else None
+    while i is not None:
+        stable.add(i)
+        i = previous[i]
+    return stable
+
+def set_label_color(label, color):
+    """Change la couleur du texte d'un label CTk ou Tk."""
+    if isinstance(label, ctk.CTkLabel):
+        label.configure(text_color=color)
+    else:
+        label.configure(fg=color)
+
+class KeyedRowList:
+    """
+    Liste de lignes indexées par clé. Au lieu de tout détruire et reconstruire,
+    reconcile() n'applique que les insertions, suppressions et déplacements nécessaires,
+    et set_highlight() ne touche que les lignes dont la mise en évidence change.
+    """
+
+    def __init__(self, master, create_row, pack_options=None, create_placeholder=None, key_file=None):
+        """
+        :param master: Widget parent
+        :param create_row: Fonction (parent, clé) -> (frame, label) créant une ligne
+        :param pack_options: Options de pack des lignes
+        :param create_placeholder: Fonction (parent) -> widget affiché quand la liste est vide
+        :param key_file: Fonction clé -> nom de fichier (pour la mise en évidence)
+        """
+        self.body = ctk.CTkFrame(master, fg_color="transparent")
+        self.body.pack(fill=ctk.BOTH, expand=True)
+        self.create_row = create_row
+        self.pack_options = pack_options or {}
+        self.create_placeholder = create_placeholder
+        self.key_file = key_file or (lambda key: key)
+        self.rows = {}          # {clé: (frame, label)}
+        self.order = []         # Clés dans l'ordre d'affichage
+        self.by_file = {}       # {fichier: set(clés)}
+        self.highlighted = None
+        self.placeholder = None
+
+    def reconcile(self, keys):
+        """
+        Met à jour l'affichage pour correspondre à la liste de clés donnée.
         
-        item_frame = ctk.CTkFrame(library_scrollable_frame, fg_color="#2b2b2b", corner_radius=10)
-        item_frame.pack(fill=ctk.X, padx=10, pady=5)
-        img_label = ctk.CTkLabel(item_frame, image=cover_ctk, text="")
-        img_label.image = cover_ctk
+        :param keys: Clés uniques dans l'ordre souhaité
+        """
+        keys = list(keys)
+        if keys == self.order:
+            return
+        wanted = set(keys)
+        for key in self.order:
+            if key not in wanted:
+                frame, _ = self.rows.pop(key)
+                frame.destroy()
+                file_keys = self.by_file.get(self.key_file(key))
+                if file_keys is not None:
+                    file_keys.discard(key)
+                    if not file_keys:
+                        del self.by_file[self.key_file(key)]
+        old_positions = {key: i for i, key in enumerate(k for k in self.order if k in wanted)}
+        stable = stable_positions([old_positions.get(key, -1) for key in keys])
+
+        previous = None
+        for i, key in enumerate(keys):
+            if key not in self.rows:
+                frame, label = self.create_row(self.body, key)
+                self.rows[key] = (frame, label)
+                file = self.key_file(key)
+                self.by_file.setdefault(file, set()).add(key)
+                if label is not None and file == self.highlighted:
+                    set_label_color(label, "#1cd061")
+            frame = self.rows[key][0]
+            if i not in stable:
+                if previous is not None:
+                    frame.pack(after=previous, **self.pack_options)
+                else:
+                    slaves = [w for w in self.body.pack_slaves() if w is not frame and w is not self.placeholder]
+                    if slaves:
+                        frame.pack(before=slaves[0], **self.pack_options)
+                    else:
+                        frame.pack(**self.pack_options)
+            previous = frame
+        self.order = keys
+
+        if not keys and self.create_placeholder is not None:
+            if self.placeholder is None:
+                self.placeholder = self.create_placeholder(self.body)
+        elif self.placeholder is not None:
+            self.placeholder.destroy()
+            self.placeholder = None
+
+    def set_highlight(self, file):
+        """Met en évidence les lignes correspondant au fichier en cours de lecture."""
+        if file == self.highlighted:
+            return
+        for old_file, color in ((self.highlighted, "white"), (file, "#1cd061")):
+            for key in self.by_file.get(old_file, ()):
+                label = self.rows[key][1]
+                if label is not None:
+                    set_label_color(label, color)
+        self.highlighted = file
+
+def playlist_row_keys(playlist):
+    """Retourne les clés (entrée, fichier) des morceaux présents d'une playlist, dans l'ordre."""
+    if playlist is None:
+        return []
+    keys = []
+    for entry in playlist.entries():
+        file = catalog.filename_for(playlist.track_of[entry])
+        if file is not None:
+            keys.append((entry, file))
+    return keys
+
+# --- Gestion de la bibliothèque ---
+
+LIBRARY_ROW_HEIGHT = 90       # Pochette de 70 px + marges de 10 px
+LIBRARY_ROW_SPACING = 10      # Espace vertical entre deux lignes
+LIBRARY_OVERSCAN = 3          # Lignes gardées hors écran au-dessus et en dessous
+LIBRARY_COVER_MEMORY = 256    # Nombre de pochettes CTkImage gardées en mémoire
+
+class VirtualTrackList:
+    """
+    Liste de morceaux virtualisée : seules les lignes visibles (plus une petite marge)
+    existent en tant que widgets, et ce pool de lignes est recyclé pendant le défilement.
+    Le nombre de widgets reste donc constant quelle que soit la taille de la bibliothèque.
+    """
+
+    def __init__(self, master, on_play, on_favorite, is_favorite=None, row_height=LIBRARY_ROW_HEIGHT,
+                 spacing=LIBRARY_ROW_SPACING, overscan=LIBRARY_OVERSCAN):
+        """
+        :param master: Widget parent
+        :param on_play: Fonction appelée avec le nom du fichier au clic sur une ligne
+        :param on_favorite: Fonction appelée avec le nom du fichier au clic sur l'étoile
+        :param is_favorite: Fonction indiquant si un fichier est en favori
+        :param row_height: Hauteur d'une ligne
+        :param spacing: Espace entre deux lignes
+        :param overscan: Nombre de lignes supplémentaires hors écran
+        """
+        self.on_play = on_play
+        self.on_favorite = on_favorite
+        self.is_favorite = is_favorite or (lambda file: False)
+        self.row_height = row_height
+        self.stride = row_height + spacing
+        self.spacing = spacing
+        self.overscan = overscan
+        self.items = []
+        self.offset = 0
+        self.rows = []
+        self.highlighted = None
+        self.covers = OrderedDict()
+
+        self.frame = ctk.CTkFrame(master)
+        self.scrollbar = ctk.CTkScrollbar(self.frame, command=self.yview)
+        self.scrollbar.pack(side=ctk.RIGHT, fill=ctk.Y, padx=(0, 5), pady=5)
+        self.viewport = ctk.CTkFrame(self.frame, fg_color="transparent")
+        self.viewport.pack(side=ctk.LEFT, fill=ctk.BOTH, expand=True, padx=10)
+        self.viewport.bind("<Configure>", lambda e: self._render())
+        self.viewport.bind_all("<MouseWheel>", self._on_mousewheel, add="+")
+        self.viewport.bind_all("<Button-4>", self._on_mousewheel, add="+")
+        self.viewport.bind_all("<Button-5>", self._on_mousewheel, add="+")
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def set_items(self, items):
+        """Remplace la liste des fichiers affichés en conservant la position de défilement."""
+        self.items = list(items)
+        self.offset = min(self.offset, self._max_offset())
+        self._render()
+
+    def set_highlight(self, filename):
+        """Met en évidence un fichier sans reconstruire les lignes."""
+        if filename == self.highlighted:
+            return
+        for row in self.rows:
+            if row["file"] is not None and row["file"] in (filename, self.highlighted):
+                row["title"].configure(text_color="#1cd061" if row["file"] == filename else "white")
+        self.highlighted = filename
+
+    def refresh_row(self, filename):
+        """Met à jour la ligne visible d'un fichier (étoile de favori) sans toucher aux autres."""
+        for row in self.rows:
+            if row["file"] == filename:
+                row["fav"].configure(text="★" if self.is_favorite(filename) else "☆")
+
+    def invalidate_cover(self, filename):
+        """Oublie la pochette d'un fichier (remplacée sur le disque) et redessine sa ligne si elle est visible."""
+        self.covers.pop(filename, None)
+        for row in self.rows:
+            if row["file"] == filename:
+                self._bind_row(row, filename)
+
+    def clear_covers(self):
+        """Vide le cache mémoire des pochettes (après un rescan de la bibliothèque)."""
+        self.covers.clear()
+        for row in self.rows:
+            row["file"] = None
+
+    def yview(self, *args):
+        """Interface de défilement appelée par la barre de défilement."""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self._scroll_to(float(args[1]) * self._content_height())
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            step = self._viewport_height() if args[2] == "pages" else self.stride
+            self._scroll_to(self.offset + amount * step)
+
+    def _scaling(self):
+        return ctk.ScalingTracker.get_widget_scaling(self.viewport)
+
+    def _viewport_height(self):
+        return max(1, self.viewport.winfo_height() / self._scaling())
+
+    def _content_height(self):
+        return len(self.items) * self.stride
+
+    def _max_offset(self):
+        return max(0, self._content_height() - self._viewport_height())
+
+    def _scroll_to(self, offset):
+        self.offset = min(max(0, offset), self._max_offset())
+        self._render()
+
+    def _on_mousewheel(self, event):
+        if not str(event.widget).startswith(str(self.viewport)):
+            return
+        if event.num == 4:
+            direction = -1
+        elif event.num == 5:
+            direction = 1
+        else:
+            direction = -1 if event.delta > 0 else 1
+        self._scroll_to(self.offset + direction * self.stride)
+
+    def _create_row(self):
+        """Crée une ligne réutilisable (pochette, titre, bouton favori)."""
+        row = {"file": None}
+        item_frame = ctk.CTkFrame(self.viewport, fg_color="#2b2b2b", corner_radius=10, height=self.row_height)
+        item_frame.pack_propagate(False)
+        img_label = ctk.CTkLabel(item_frame, text="")
         img_label.pack(side=ctk.LEFT, padx=10, pady=10)
         title_frame = ctk.CTkFrame(item_frame, fg_color="#2b2b2b")
         title_frame.pack(side=ctk.LEFT, padx=10)
-        title_label = ctk.CTkLabel(title_frame, text=file, font=("Arial", 12, "bold"), text_color="white")
+        title_label = ctk.CTkLabel(title_frame, text="", font=("Arial", 12, "bold"), text_color="white")
         title_label.pack(anchor="w")
-        fav_btn = ctk.CTkButton(item_frame, text="☆", width=30, fg_color="#1cd061", command=lambda f=file: toggle_favorite(f))
+        fav_btn = ctk.CTkButton(item_frame, text="☆", width=30, fg_color="#1cd061",
+                                command=lambda: row["file"] and self.on_favorite(row["file"]))
         fav_btn.pack(side=ctk.RIGHT, padx=10)
         # Lancement de la lecture au clic sur l'item
-        item_frame.bind("<Button-1>", lambda e, filename=file: play_audio_by_filename(filename))
-        img_label.bind("<Button-1>", lambda e, filename=file: play_audio_by_filename(filename))
-        title_label.bind("<Button-1>", lambda e, filename=file: play_audio_by_filename(filename))
-        library_items[file] = item_frame
-        library_title_widgets[file] = title_label
+        for widget in (item_frame, img_label, title_label):
+            widget.bind("<Button-1>", lambda e: row["file"] and self.on_play(row["file"]))
+        row.update(frame=item_frame, image=img_label, title=title_label, fav=fav_btn)
+        return row
+
+    def _cover_for(self, file):
+        """Retourne la pochette CTkImage d'un fichier (cache mémoire LRU puis cache disque)."""
+        cover_ctk = self.covers.get(file)
+        if cover_ctk is not None:
+            self.covers.move_to_end(file)
+            return cover_ctk
+        try:
+            final_img = render_cover(cover_path_for(file), LIBRARY_COVER_GEOMETRY)
+            cover_ctk = ctk.CTkImage(light_image=final_img, size=(70,70))
+        except Exception as e:
+            print(f"Erreur chargement cover pour {file} : {e}")
+            cover_ctk = ctk.CTkImage(light_image=create_default_cover(size=(60,60)), size=(70,70))
+        self.covers[file] = cover_ctk
+        if len(self.covers) > LIBRARY_COVER_MEMORY:
+            self.covers.popitem(last=False)
+        return cover_ctk
+
+    def _bind_row(self, row, file):
+        """Associe une ligne du pool à un fichier."""
+        row["file"] = file
+        cover_ctk = self._cover_for(file)
+        row["image"].configure(image=cover_ctk)
+        row["image"].image = cover_ctk
+        row["title"].configure(text=file, text_color="#1cd061" if file == self.highlighted else "white")
+        row["fav"].configure(text="★" if self.is_favorite(file) else "☆")
+
+    def _render(self):
+        """Positionne les lignes du pool sur la fenêtre visible."""
+        height = self._viewport_height()
+        needed = math.ceil(height / self.stride) + 1 + 2 * self.overscan
+        while len(self.rows) < needed:
+            self.rows.append(self._create_row())
+        first = max(0, int(self.offset // self.stride) - self.overscan)
+        for i, row in enumerate(self.rows):
+            index = first + i
+            if index < len(self.items):
+                file = self.items[index]
+                if row["file"] != file:
+                    self._bind_row(row, file)
+                y = index * self.stride - self.offset + self.spacing // 2
+                row["frame"].place(x=0, y=y, relwidth=1)
+            else:
+                row["file"] = None
+                row["frame"].place_forget()
+        total = self._content_height()
+        if total <= height:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + height) / total)
+
+@timed("library_refresh")
+def update_library_view():
+    """Actualise l'affichage de la bibliothèque audio à partir du catalogue."""
+    if library_list is None:
+        return
+    library_list.clear_covers()
+    search_library()
+
+def is_favorite(filename):
+    """Indique si un fichier est dans les favoris."""
+    favorites = playlist_store.get("Favoris")
+    return favorites is not None and catalog.id_for(filename) in favorites
 
 def toggle_favorite(filename):
     """Ajoute ou retire un fichier des favoris."""
-    favoris = app_data["playlists"].setdefault("Favoris", [])
-    if filename in favoris:
-        favoris.remove(filename)
+    track_id = catalog.id_for(filename)
+    if track_id is None:
+        return
+    favorites = playlist_store.create("Favoris")
+    if track_id in favorites:
+        favorites.discard(track_id)
         notify(f"{filename} retiré des favoris")
     else:
-        favoris.append(filename)
+        favorites.append(track_id)
         notify(f"{filename} ajouté aux favoris")
-    save_app_data(app_data)
-    update_library_view()
+    playlist_store.save("Favoris")
+    library_list.refresh_row(filename)
     update_favorites_view()
 
+# --- Changements des dossiers surveillés ---
+
+library_watcher = None           # Surveillance des dossiers audio et pochettes
+
+def on_library_changes(changes):
+    """Transmet un lot de changements (thread de surveillance) au thread de l'interface."""
+    root.after(0, apply_library_changes, changes)
+
+@timed("library_changes")
+def apply_library_changes(changes):
+    """
+    Applique un lot de changements des dossiers surveillés au catalogue, à l'index de
+    recherche, aux playlists et aux pochettes, sans relire toute la bibliothèque.
+    
+    :param changes: Lot produit par DirectoryWatcher (None : relecture complète)
+    """
+    global current_file, queued_track
+    if changes is None:
+        # Trop d'événements d'un coup : seule une relecture complète est fiable
+        if catalog.load():
+            save_app_data(app_data)
+        metadata_scanner.scan(catalog.files, rebuild_index=True)
+        update_library_view()
+        return
+    audio = changes.get(catalog.directory)
+    covers = changes.get(COVER_DIR)
+    if audio:
+        added = {f for f in audio["present"] if is_audio_file(f)}
+        removed = {f for f in audio["absent"] if f in catalog}
+        renamed = {}
+        for old, new in audio["renamed"].items():
+            if old in catalog and is_audio_file(new):
+                renamed[old] = new
+            else:
+                if old in catalog:
+                    removed.add(old)
+                if is_audio_file(new):
+                    added.add(new)
+        # Les tags saisis suivent les renommages
+        for old, new in renamed.items():
+            if old in app_data["tags"]:
+                app_data["tags"][new] = app_data["tags"].pop(old)
+            if old in metadata_scanner.tags:
+                metadata_scanner.tags[new] = metadata_scanner.tags.pop(old)
+        removed_ids = [catalog.id_for(f) for f in removed]
+        new_files = catalog.apply_changes(added, removed, renamed)
+        # Historique et poids de la lecture aléatoire suivent aussi les renommages
+        if renamed:
+            history_store.rename(renamed)
+            update_history_view()
+        for f in removed | set(renamed):
+            search_index.remove(f)
+        for f in new_files + list(renamed.values()):
+            search_index.add(f, track_tags(f))
+        if added or renamed:
+            metadata_scanner.scan(sorted(added | set(renamed.values())))
+        # Playlists : les renommages gardent leur identifiant, les fichiers disparus sont retirés
+        if removed_ids:
+            playlist_store.discard_tracks(removed_ids)
+        for old, new in renamed.items():
+            old_cover, new_cover = cover_path_for(old), cover_path_for(new)
+            if os.path.exists(old_cover) and not os.path.exists(new_cover):
+                try:
+                    os.replace(old_cover, new_cover)
+                except OSError as e:
+                    print(f"Impossible de renommer la pochette {old_cover} : {e}")
+        if current_file in renamed:
+            current_file = renamed[current_file]
+            now_playing_label.configure(text=f"En cours de lecture : {current_file}")
+            update_library_highlight()
+        if queued_track is not None and queued_track[0] in renamed:
+            queued_track = (renamed[queued_track[0]],) + queued_track[1:]
+        if new_files or removed or renamed:
+            save_app_data(app_data)
+            search_library()
+            update_favorites_view()
+            if current_playlist_selected is not None and playlist_contents_rows is not None:
+                show_playlist_contents_modern(current_playlist_selected)
+            if new_files or removed:
+                notify(f"Bibliothèque : {len(new_files)} ajouté(s), {len(removed)} retiré(s)")
+    if covers:
+        names = covers["present"] | covers["absent"] | set(covers["renamed"]) | set(covers["renamed"].values())
+        bases = {os.path.splitext(name)[0] for name in names}
+        for base in bases:
+            for extension in AUDIO_EXTENSIONS:
+                f = base + extension
+                if f not in catalog:
+                    continue
+                prefetched_covers.pop(f, None)
+                if library_list is not None:
+                    library_list.invalidate_cover(f)
+                if f == current_file:
+                    now_playing_renderer.request(f, lambda f, img: root.after(0, show_rendered_cover, f, img))
+
 # --- Gestion de l'historique ---
 
+history_scroll = None            # Cadre de l'onglet Historique (créé à sa première ouverture)
+history_rows = None              # Lignes de l'historique (KeyedRowList)
+
+def create_history_row(parent, key):
+    """Crée la ligne d'historique associée à la clé (identifiant, horodatage, fichier)."""
+    _, played_at, file = key
+    frame = ctk.CTkFrame(parent)
+    label = ctk.CTkLabel(frame, text=f"{datetime.fromtimestamp(played_at).strftime('%d/%m %H:%M')} - {file}")
+    label.pack(side=ctk.LEFT, padx=5)
+    label.bind("<Button-1>", lambda e: play_audio_by_filename(file))
+    return frame, None
+
 def update_history_view():
-    """Affiche l'historique des lectures."""
-    for widget in history_scroll.winfo_children():
-        widget.destroy()
-    
-    for entry in reversed(app_data["history"]):
-        frame = ctk.CTkFrame(history_scroll)
-        frame.pack(fill=ctk.X, pady=2)
-        timestamp = datetime.fromisoformat(entry["timestamp"]).strftime("%d/%m %H:%M")
-        label = ctk.CTkLabel(frame, text=f"{timestamp} - {entry['file']}")
-        label.pack(side=ctk.LEFT, padx=5)
-        label.bind("<Button-1>", lambda e, f=entry['file']: play_audio_by_filename(f))
+    """Affiche les dernières lectures."""
+    global history_rows
+    if history_scroll is None:
+        return
+    if history_rows is None:
+        history_rows = KeyedRowList(history_scroll, create_history_row, pack_options={"fill": ctk.X, "pady": 2})
+    history_rows.reconcile(history_store.recent(HISTORY_VIEW_LIMIT))
 
 def add_to_history(filename):
-    """Ajoute une lecture à l'historique et limite celui-ci à 50 entrées."""
-    app_data["history"].append({
-        "file": filename,
-        "timestamp": datetime.now().isoformat()
-    })
-    if len(app_data["history"]) > 50:
-        app_data["history"] = app_data["history"][-50:]
-    save_app_data(app_data)
+    """Ajoute une lecture au journal d'historique."""
+    history_store.add(filename)
     update_history_view()
 
 # --- Gestion des favoris ---
 
+favorites_scroll = None          # Cadre de l'onglet Favoris (créé à sa première ouverture)
+favorites_shown = None           # (playlist, version, version du catalogue) des favoris affichés
+favorites_rows = None            # Lignes des favoris (KeyedRowList)
+
+def create_favorite_row(parent, key):
+    """Crée la ligne d'un favori (clé : entrée, fichier)."""
+    entry, file = key
+    frame = ctk.CTkFrame(parent, fg_color="#2b2b2b", corner_radius=5)
+    lbl = tk.Label(frame, text=file, bg="#2b2b2b", fg="white")
+    lbl.pack(anchor="w", padx=10)
+    lbl.bind("<Button-1>", lambda e: play_audio_by_filename(file, "Favoris", entry))
+    return frame, lbl
+
+def create_favorites_placeholder(parent):
+    """Crée le message affiché lorsqu'il n'y a aucun favori."""
+    placeholder = tk.Label(parent, text="Aucun favori.", bg="#2b2b2b", fg="white")
+    placeholder.pack(pady=10)
+    return placeholder
+
 def update_favorites_view():
-    """Actualise l'affichage des favoris."""
-    for widget in favorites_scroll.winfo_children():
-        widget.destroy()
-    fav_files = app_data["playlists"].get("Favoris", [])
-    if not fav_files:
-        tk.Label(favorites_scroll, text="Aucun favori.", bg="#2b2b2b", fg="white").pack(pady=10)
-        return
-    for file in fav_files:
-        frame = ctk.CTkFrame(favorites_scroll, fg_color="#2b2b2b", corner_radius=5)
-        frame.pack(fill=ctk.X, padx=10, pady=5)
-        lbl = tk.Label(frame, text=file, bg="#2b2b2b", fg="white")
-        lbl.pack(anchor="w", padx=10)
-        lbl.bind("<Button-1>", lambda e, f=file: play_audio_by_filename(f, "Favoris"))
+    """Actualise l'affichage des favoris s'ils ont changé depuis le dernier affichage."""
+    global favorites_rows, favorites_shown
+    if favorites_scroll is None:
+        return
+    playlist = playlist_store.get("Favoris")
+    shown = (playlist, playlist.version if playlist is not None else None, catalog.version)
+    if favorites_rows is not None and shown == favorites_shown:
+        return
+    favorites_shown = shown
+    if favorites_rows is None:
+        favorites_rows = KeyedRowList(
+            favorites_scroll,
+            create_favorite_row,
+            pack_options={"fill": ctk.X, "padx": 10, "pady": 5},
+            create_placeholder=create_favorites_placeholder,
+            key_file=lambda key: key[1]
+        )
+    favorites_rows.reconcile(playlist_row_keys(playlist))
 
 # --- Recherche dans la bibliothèque ---
 
+search_after_id = None           # Recherche programmée (anti-rebond)
+
+@timed("search")
 def search_library(event=None):
-    """Filtre la bibliothèque selon la requête saisie."""
-    query = search_entry.get().lower()
-    for file, frame in library_items.items():
-        match = query in file.lower()
-        tags = app_data["tags"].get(file, {})
-        tag_match = any(query in str(v).lower() for v in tags.values())
-        if match or tag_match or query == "":
-            frame.pack(fill=ctk.X, padx=10, pady=5)
-        else:
-            frame.pack_forget()
+    """Filtre la bibliothèque selon la requête saisie, via l'index de recherche."""
+    global search_after_id
+    search_after_id = None
+    if library_list is None:
+        return
+    results = search_index.search(search_entry.get())
+    library_list.set_items(catalog.files if results is None else results)
+
+def schedule_search(event=None):
+    """Relance la recherche après un court délai sans frappe (anti-rebond)."""
+    global search_after_id
+    if search_after_id is not None:
+        root.after_cancel(search_after_id)
+    search_after_id = root.after(SEARCH_DEBOUNCE_MS, search_library)
 
 # --- Paramètres d'affichage (Mode sombre/clair) ---
 
@@ -611,11 +4489,10 @@ def create_playlist():
         if not name:
             messagebox.showerror("Erreur", "Veuillez entrer un nom valide.", parent=dialog)
             return
-        if name in app_data["playlists"]:
+        if name in playlist_store:
             messagebox.showerror("Erreur", "Une playlist avec ce nom existe déjà.", parent=dialog)
             return
-        app_data["playlists"][name] = []
-        save_app_data(app_data)
+        playlist_store.create(name)
         refresh_playlist_buttons()
         notify(f"Playlist '{name}' créée.")
         dialog.destroy()
@@ -624,107 +4501,78 @@ def create_playlist():
     submit_btn.pack(pady=10)
     entry.focus()
 
-# --- Interface graphique principale ---
-
-root = ctk.CTk()
-root.title("Spotify-like Player")
-root.geometry(app_data["settings"].get("window_size", "950x900"))
-root.state(app_data["settings"].get("window_state", "zoomed"))
-
-# Chargement de l'icône
-icon_path = "img/icon.ico"
-try:
-    icon = Image.open(icon_path)
-    photo = ImageTk.PhotoImage(icon)
-    root.iconphoto(True, photo)
-except Exception as e:
-    print(f"Erreur chargement icône : {e}")
-
-# Cadre principal et Tabview
-main_frame = ctk.CTkFrame(root)
-main_frame.pack(fill=ctk.BOTH, expand=True, padx=20, pady=20)
-
-tabview = ctk.CTkTabview(main_frame)
-tabview.pack(fill=ctk.BOTH, expand=True)
-tabview.add("Téléchargement")
-tabview.add("Bibliothèque")
-tabview.add("Playlists")
-tabview.add("Historique")
-tabview.add("Favoris")
-tabview.add("Paramètres")
-
-# --- Onglet Téléchargement ---
-download_frame = tabview.tab("Téléchargement")
-ctk.CTkLabel(download_frame, text="Téléchargement YouTube", font=('Arial', 12, 'bold')).pack(anchor=ctk.W, pady=(10,0))
-url_frame = ctk.CTkFrame(download_frame)
-url_frame.pack(fill=ctk.X, pady=5, padx=10)
-youtube_url_entry = ctk.CTkEntry(url_frame, width=60)
-youtube_url_entry.pack(side=ctk.LEFT, fill=ctk.X, expand=True)
-paste_url_button = ctk.CTkButton(url_frame, text="Coller", command=paste_url, fg_color="#1cd061")
-paste_url_button.pack(side=ctk.LEFT, padx=5)
-download_youtube_button = ctk.CTkButton(download_frame, text="Télécharger", command=download_youtube, fg_color="#1cd061")
-download_youtube_button.pack(pady=10)
-progress_bar = ctk.CTkProgressBar(download_frame, orientation="horizontal", mode="determinate")
-download_percentage_label = ctk.CTkLabel(download_frame, text="0%", font=("Arial", 10))
-status_label = ctk.CTkLabel(download_frame, text="Prêt", text_color="green")
-status_label.pack(pady=5)
-
-# --- Onglet Bibliothèque ---
-library_frame = tabview.tab("Bibliothèque")
-search_frame = ctk.CTkFrame(library_frame)
-search_frame.pack(fill=ctk.X, padx=10, pady=5)
-search_entry = ctk.CTkEntry(search_frame, placeholder_text="Rechercher...")
-search_entry.pack(side=ctk.LEFT, fill=ctk.X, expand=True)
-search_entry.bind("<KeyRelease>", search_library)
-library_scrollable_frame = ctk.CTkScrollableFrame(library_frame, width=800, height=300)
-library_scrollable_frame.pack(fill=ctk.BOTH, expand=True, padx=10, pady=10)
-update_library_view()
-
-# --- Onglet Playlists ---
-playlists_frame = tabview.tab("Playlists")
-playlist_left_frame = ctk.CTkFrame(playlists_frame, width=250, fg_color="#1a1a1a", corner_radius=10)
-playlist_left_frame.pack(side=ctk.LEFT, fill=ctk.Y, padx=10, pady=(10,5))
-playlist_right_frame = ctk.CTkFrame(playlists_frame, fg_color="#1a1a1a", corner_radius=10)
-playlist_right_frame.pack(side=ctk.LEFT, fill=ctk.BOTH, expand=True, padx=10, pady=(10,5))
+# --- Gestion des boutons de playlists ---
 
-# Bouton de création de playlist
-btn_create_playlist = ctk.CTkButton(playlist_left_frame, text="Créer Playlist", command=lambda: create_playlist(), fg_color="#1cd061")
-btn_create_playlist.pack(padx=10, pady=(10,5), fill=ctk.X)
+playlist_buttons_frame = None    # Liste des playlists (créée à la première ouverture de l'onglet)
+playlist_button_rows = None      # Boutons de playlists (KeyedRowList)
 
-# Zone de scroll pour les playlists
-playlist_buttons_frame = ctk.CTkScrollableFrame(playlist_left_frame, height=300, fg_color="#1a1a1a")
-playlist_buttons_frame.pack(padx=10, pady=5, fill=ctk.BOTH, expand=True)
+def create_playlist_button(parent, name):
+    """Crée le bouton d'une playlist."""
+    btn = ctk.CTkButton(
+        parent,
+        text=name,
+        fg_color="#333333",
+        hover_color="#444444",
+        text_color="white",
+        command=lambda: show_playlist_contents_modern(name)
+    )
+    return btn, None
 
 def refresh_playlist_buttons():
-    """Rafraîchit l'affichage des boutons de playlists."""
-    for widget in playlist_buttons_frame.winfo_children():
-        widget.destroy()
+    """Affiche un bouton pour chaque playlist existante."""
+    global playlist_button_rows
+    if playlist_buttons_frame is None:
+        return
+    if playlist_button_rows is None:
+        playlist_button_rows = KeyedRowList(playlist_buttons_frame, create_playlist_button, pack_options={"padx": 5, "pady": 5, "fill": ctk.X})
+    playlist_button_rows.reconcile(playlist_store.names())
 
-# --- Gestion des boutons de playlists ---
+# --- Affichage du contenu d'une playlist ---
 
-def refresh_playlist_buttons():
-    """Crée un bouton pour chaque playlist existante."""
-    for widget in playlist_buttons_frame.winfo_children():
-        widget.destroy()
-    for name in app_data["playlists"].keys():
-        btn = ctk.CTkButton(
-            playlist_buttons_frame,
-            text=name,
+playlist_contents_frame = None   # Cadre du contenu de la playlist affichée
+playlist_contents_title = None   # Titre de la playlist affichée
+playlist_contents_rows = None    # Morceaux de la playlist affichée (KeyedRowList)
+playlist_contents_shown = None   # (playlist, version, version du catalogue) affichée
+
+def create_playlist_song_row(parent, key):
+    """Crée la ligne d'un morceau de la playlist affichée (clé : entrée, fichier)."""
+    entry, file = key
+    frame = ctk.CTkFrame(parent, fg_color="#2b2b2b", corner_radius=5)
+    lbl = ctk.CTkLabel(frame, text=file, text_color="white", fg_color="#2b2b2b")
+    lbl.pack(side=ctk.LEFT, padx=10, pady=5)
+    btn_remove = ctk.CTkButton(
+        frame,
+        text="Supprimer",
+        width=80,
+        fg_color="#cc3333",
+        text_color="white",
+        command=lambda: remove_from_playlist(current_playlist_selected, entry)
+    )
+    btn_remove.pack(side=ctk.RIGHT, padx=10, pady=5)
+    for text, offset in (("▼", 1), ("▲", -1)):
+        ctk.CTkButton(
+            frame,
+            text=text,
+            width=30,
             fg_color="#333333",
             hover_color="#444444",
-            text_color="white",
-            command=lambda n=name: show_playlist_contents_modern(n)
-        )
-        btn.pack(padx=5, pady=5, fill=ctk.X)
-
-def update_playlists_view():
-    """Mets à jour l'affichage des playlists (pour compatibilité)."""
-    refresh_playlist_buttons()
-
-# --- Affichage du contenu d'une playlist ---
+            command=lambda offset=offset: move_in_playlist(current_playlist_selected, entry, offset)
+        ).pack(side=ctk.RIGHT, padx=(0, 5), pady=5)
+    # Lancer le morceau en cliquant sur l'item
+    frame.bind("<Button-1>", lambda e: play_audio_by_filename(file, current_playlist_selected, entry))
+    lbl.bind("<Button-1>", lambda e: play_audio_by_filename(file, current_playlist_selected, entry))
+    return frame, lbl
 
-playlist_contents_frame = ctk.CTkFrame(playlist_right_frame, fg_color="#1a1a1a", corner_radius=10)
-playlist_contents_frame.pack(padx=10, pady=10, fill=ctk.BOTH, expand=True)
+def create_playlist_placeholder(parent):
+    """Crée le message affiché pour une playlist vide."""
+    lbl_info = ctk.CTkLabel(
+        parent,
+        text="Playlist vide.",
+        text_color="white",
+        fg_color="#1a1a1a"
+    )
+    lbl_info.pack(pady=20)
+    return lbl_info
 
 def show_playlist_contents_modern(playlist_name):
     """
@@ -732,71 +4580,83 @@ def show_playlist_contents_modern(playlist_name):
     
     :param playlist_name: Nom de la playlist à afficher.
     """
-    global current_playlist_selected
+    global current_playlist_selected, playlist_contents_title, playlist_contents_rows, playlist_contents_shown
     current_playlist_selected = playlist_name
-    # Réinitialisation du cadre de contenu
-    for widget in playlist_contents_frame.winfo_children():
-        widget.destroy()
-    # En-tête avec le titre de la playlist et le bouton pour lancer la lecture
-    header_frame = ctk.CTkFrame(playlist_contents_frame, fg_color="#1a1a1a")
-    header_frame.pack(fill=ctk.X, pady=10)
-    lbl_title = ctk.CTkLabel(
-        header_frame,
-        text=playlist_name,
-        font=("Arial", 16, "bold"),
-        text_color="white",
-        fg_color="#1a1a1a"
-    )
-    lbl_title.pack(side=ctk.LEFT, padx=10)
-    btn_play = ctk.CTkButton(
-        header_frame,
-        text="Lire la playlist",
-        fg_color="#1cd061",
-        command=lambda: play_playlist(playlist_name)
-    )
-    btn_play.pack(side=ctk.RIGHT, padx=10)
-    # Affichage des morceaux
-    songs = app_data["playlists"].get(playlist_name, [])
-    if not songs:
-        lbl_info = ctk.CTkLabel(
-            playlist_contents_frame,
-            text="Playlist vide.",
+    # En-tête avec le titre de la playlist et le bouton pour lancer la lecture (créé une seule fois)
+    if playlist_contents_title is None:
+        header_frame = ctk.CTkFrame(playlist_contents_frame, fg_color="#1a1a1a")
+        header_frame.pack(fill=ctk.X, pady=10)
+        playlist_contents_title = ctk.CTkLabel(
+            header_frame,
+            text=playlist_name,
+            font=("Arial", 16, "bold"),
             text_color="white",
             fg_color="#1a1a1a"
         )
-        lbl_info.pack(pady=20)
+        playlist_contents_title.pack(side=ctk.LEFT, padx=10)
+        btn_play = ctk.CTkButton(
+            header_frame,
+            text="Lire la playlist",
+            fg_color="#1cd061",
+            command=lambda: play_playlist(current_playlist_selected)
+        )
+        btn_play.pack(side=ctk.RIGHT, padx=10)
+        playlist_contents_rows = KeyedRowList(
+            playlist_contents_frame,
+            create_playlist_song_row,
+            pack_options={"fill": ctk.X, "padx": 5, "pady": 5},
+            create_placeholder=create_playlist_placeholder,
+            key_file=lambda key: key[1]
+        )
+        playlist_contents_rows.set_highlight(current_file)
     else:
-        for file in songs:
-            frame = ctk.CTkFrame(playlist_contents_frame, fg_color="#2b2b2b", corner_radius=5)
-            frame.pack(fill=ctk.X, padx=5, pady=5)
-            lbl = ctk.CTkLabel(frame, text=file, text_color="white", fg_color="#2b2b2b")
-            lbl.pack(side=ctk.LEFT, padx=10, pady=5)
-            btn_remove = ctk.CTkButton(
-                frame,
-                text="Supprimer",
-                width=80,
-                fg_color="#cc3333",
-                text_color="white",
-                command=lambda f=file, pl=playlist_name: remove_from_playlist(pl, f)
-            )
-            btn_remove.pack(side=ctk.RIGHT, padx=10, pady=5)
-            # Lancer le morceau en cliquant sur l'item
-            frame.bind("<Button-1>", lambda e, f=file, pl=playlist_name: play_audio_by_filename(f, pl))
-            lbl.bind("<Button-1>", lambda e, f=file, pl=playlist_name: play_audio_by_filename(f, pl))
+        playlist_contents_title.configure(text=playlist_name)
+    # Affichage des morceaux, seulement si la playlist ou le catalogue ont changé
+    playlist = playlist_store.get(playlist_name)
+    shown = (playlist, playlist.version if playlist is not None else None, catalog.version)
+    if shown != playlist_contents_shown:
+        playlist_contents_shown = shown
+        playlist_contents_rows.reconcile(playlist_row_keys(playlist))
 
-def remove_from_playlist(playlist_name, file):
+def remove_from_playlist(playlist_name, entry):
     """
     Retire un morceau de la playlist et met à jour l'affichage.
     
     :param playlist_name: Nom de la playlist.
-    :param file: Nom du fichier à retirer.
+    :param entry: Occurrence à retirer.
     """
-    if file in app_data["playlists"].get(playlist_name, []):
-        app_data["playlists"][playlist_name].remove(file)
-        save_app_data(app_data)
-        refresh_playlist_buttons()
-        show_playlist_contents_modern(playlist_name)
-        notify(f"{file} retiré de {playlist_name}")
+    playlist = playlist_store.get(playlist_name)
+    track_id = playlist.remove_entry(entry) if playlist is not None else None
+    if track_id is None:
+        return
+    playlist_store.save(playlist_name)
+    refresh_playlist_buttons()
+    show_playlist_contents_modern(playlist_name)
+    notify(f"{catalog.filename_for(track_id)} retiré de {playlist_name}")
+
+def move_in_playlist(playlist_name, entry, offset):
+    """
+    Monte ou descend un morceau d'un rang dans la playlist.
+    
+    :param playlist_name: Nom de la playlist.
+    :param entry: Occurrence à déplacer.
+    :param offset: -1 pour monter, 1 pour descendre.
+    """
+    playlist = playlist_store.get(playlist_name)
+    if playlist is None or entry not in playlist.track_of:
+        return
+    if offset < 0:
+        target = playlist.prev[entry]          # Devant le précédent
+        if not target:
+            return
+    else:
+        following = playlist.next[entry]
+        if not following:
+            return
+        target = playlist.next[following]      # Derrière le suivant (0 : en fin de playlist)
+    playlist.move(entry, before=target)
+    playlist_store.save(playlist_name)
+    show_playlist_contents_modern(playlist_name)
 
 def play_playlist(playlist_name):
     """
@@ -804,9 +4664,10 @@ def play_playlist(playlist_name):
     
     :param playlist_name: Nom de la playlist à jouer.
     """
-    songs = app_data["playlists"].get(playlist_name, [])
-    if songs:
-        play_audio_by_filename(songs[0], playlist_name)
+    found = playlist_neighbour(playlist_name, None)
+    if found is not None:
+        entry, file = found
+        play_audio_by_filename(file, playlist_name, entry)
     else:
         messagebox.showwarning("Playlist vide", "Cette playlist est vide.")
 
@@ -814,106 +4675,326 @@ def add_current_to_playlist_modern():
     """
     Ajoute le morceau actuellement lu à la playlist sélectionnée.
     """
-    global current_playlist_selected
     if not current_playlist_selected:
         messagebox.showwarning("Aucune sélection", "Sélectionnez une playlist.")
         return
-    current_file = now_playing_label.cget("text").replace("En cours de lecture : ", "")
-    if current_file:
-        app_data["playlists"].setdefault(current_playlist_selected, [])
-        if current_file not in app_data["playlists"][current_playlist_selected]:
-            app_data["playlists"][current_playlist_selected].append(current_file)
-            save_app_data(app_data)
+    track_id = catalog.id_for(current_file) if current_file else None
+    if track_id is not None:
+        playlist = playlist_store.create(current_playlist_selected)
+        if track_id not in playlist:
+            playlist.append(track_id)
+            playlist_store.save(current_playlist_selected)
             show_playlist_contents_modern(current_playlist_selected)
             notify(f"{current_file} ajouté à {current_playlist_selected}")
 
-btn_add_current_modern = ctk.CTkButton(
-    playlist_left_frame,
-    text="Ajouter morceau en cours",
-    command=add_current_to_playlist_modern,
-    fg_color="#1cd061"
-)
-btn_add_current_modern.pack(padx=10, pady=(5,10), fill=ctk.X)
+# --- Interface graphique principale ---
+
+tabview = None                   # Onglets de la fenêtre principale
+built_tabs = set()               # Onglets déjà construits
+
+def build_main_window():
+    """Crée la fenêtre principale et ses onglets, vides jusqu'à leur première ouverture."""
+    global root, tabview
+    root = ctk.CTk()
+    root.title("Spotify-like Player")
+    root.geometry(app_data["settings"].get("window_size", "950x900"))
+    root.state(app_data["settings"].get("window_state", "zoomed"))
+
+    # Chargement de l'icône
+    icon_path = "img/icon.ico"
+    try:
+        icon = Image.open(icon_path)
+        root.icon_photo = ImageTk.PhotoImage(icon)
+        root.iconphoto(True, root.icon_photo)
+    except Exception as e:
+        print(f"Erreur chargement icône : {e}")
+
+    # Cadre principal et Tabview
+    main_frame = ctk.CTkFrame(root)
+    main_frame.pack(fill=ctk.BOTH, expand=True, padx=20, pady=20)
+
+    tabview = ctk.CTkTabview(main_frame, command=on_tab_changed)
+    tabview.pack(fill=ctk.BOTH, expand=True)
+    for name in TAB_BUILDERS:
+        tabview.add(name)
+
+def bind_player_keys():
+    """Installe les raccourcis clavier du lecteur (une fois le mixer initialisé)."""
+    root.bind("<space>", lambda e: pause_audio())
+    root.bind("<Right>", lambda e: next_track())
+    root.bind("<Left>", lambda e: previous_track())
+
+def ensure_tab(name):
+    """Construit le contenu d'un onglet s'il ne l'a pas encore été."""
+    if name not in built_tabs:
+        built_tabs.add(name)
+        TAB_BUILDERS[name](tabview.tab(name))
+
+def on_tab_changed():
+    """Construit l'onglet sélectionné lors de sa première ouverture."""
+    ensure_tab(tabview.get())
+
+# --- Onglet Téléchargement ---
+
+def build_download_tab(download_frame):
+    """Construit l'onglet Téléchargement."""
+    global youtube_url_entry, progress_bar, download_percentage_label, status_label, downloads_rows
+    ctk.CTkLabel(download_frame, text="Téléchargement YouTube", font=('Arial', 12, 'bold')).pack(anchor=ctk.W, pady=(10,0))
+    url_frame = ctk.CTkFrame(download_frame)
+    url_frame.pack(fill=ctk.X, pady=5, padx=10)
+    youtube_url_entry = ctk.CTkEntry(url_frame, width=60)
+    youtube_url_entry.pack(side=ctk.LEFT, fill=ctk.X, expand=True)
+    paste_url_button = ctk.CTkButton(url_frame, text="Coller", command=paste_url, fg_color="#1cd061")
+    paste_url_button.pack(side=ctk.LEFT, padx=5)
+    buttons_frame = ctk.CTkFrame(download_frame, fg_color="transparent")
+    buttons_frame.pack(pady=10)
+    download_youtube_button = ctk.CTkButton(buttons_frame, text="Télécharger", command=download_youtube, fg_color="#1cd061")
+    download_youtube_button.pack(side=ctk.LEFT, padx=5)
+    play_now_button = ctk.CTkButton(buttons_frame, text="Lire maintenant", command=lambda: download_youtube(play_now=True), fg_color="#1cd061")
+    play_now_button.pack(side=ctk.LEFT, padx=5)
+    progress_bar = ctk.CTkProgressBar(download_frame, orientation="horizontal", mode="determinate")
+    download_percentage_label = ctk.CTkLabel(download_frame, text="0%", font=("Arial", 10))
+    status_label = ctk.CTkLabel(download_frame, text="Prêt", text_color="green")
+    status_label.pack(pady=5)
+    downloads_header = ctk.CTkFrame(download_frame, fg_color="transparent")
+    downloads_header.pack(fill=ctk.X, padx=10)
+    ctk.CTkLabel(downloads_header, text="File de téléchargements", font=('Arial', 12, 'bold')).pack(side=ctk.LEFT)
+    ctk.CTkButton(downloads_header, text="Vider la liste", width=100, command=clear_finished_downloads, fg_color="#333333", hover_color="#444444").pack(side=ctk.RIGHT)
+    downloads_scroll = ctk.CTkScrollableFrame(download_frame)
+    downloads_scroll.pack(fill=ctk.BOTH, expand=True, padx=10, pady=5)
+    downloads_rows = KeyedRowList(downloads_scroll, create_download_row, pack_options={"fill": ctk.X, "padx": 5, "pady": 3})
+    refresh_downloads_view()
+
+# --- Onglet Bibliothèque ---
+
+def build_library_tab(library_frame):
+    """Construit l'onglet Bibliothèque."""
+    global search_entry, library_list
+    search_frame = ctk.CTkFrame(library_frame)
+    search_frame.pack(fill=ctk.X, padx=10, pady=5)
+    search_entry = ctk.CTkEntry(search_frame, placeholder_text="Rechercher...")
+    search_entry.pack(side=ctk.LEFT, fill=ctk.X, expand=True)
+    search_entry.bind("<KeyRelease>", schedule_search)
+    library_list = VirtualTrackList(
+        library_frame,
+        on_play=play_audio_by_filename,
+        on_favorite=toggle_favorite,
+        is_favorite=is_favorite
+    )
+    library_list.pack(fill=ctk.BOTH, expand=True, padx=10, pady=10)
+    library_list.set_highlight(current_file)
+    update_library_view()
+
+# --- Onglet Playlists ---
+
+def build_playlists_tab(playlists_frame):
+    """Construit l'onglet Playlists."""
+    global playlist_buttons_frame, playlist_contents_frame
+    playlist_left_frame = ctk.CTkFrame(playlists_frame, width=250, fg_color="#1a1a1a", corner_radius=10)
+    playlist_left_frame.pack(side=ctk.LEFT, fill=ctk.Y, padx=10, pady=(10,5))
+    playlist_right_frame = ctk.CTkFrame(playlists_frame, fg_color="#1a1a1a", corner_radius=10)
+    playlist_right_frame.pack(side=ctk.LEFT, fill=ctk.BOTH, expand=True, padx=10, pady=(10,5))
+
+    # Bouton de création de playlist
+    btn_create_playlist = ctk.CTkButton(playlist_left_frame, text="Créer Playlist", command=lambda: create_playlist(), fg_color="#1cd061")
+    btn_create_playlist.pack(padx=10, pady=(10,5), fill=ctk.X)
+
+    # Zone de scroll pour les playlists
+    playlist_buttons_frame = ctk.CTkScrollableFrame(playlist_left_frame, height=300, fg_color="#1a1a1a")
+    playlist_buttons_frame.pack(padx=10, pady=5, fill=ctk.BOTH, expand=True)
+
+    btn_add_current_modern = ctk.CTkButton(
+        playlist_left_frame,
+        text="Ajouter morceau en cours",
+        command=add_current_to_playlist_modern,
+        fg_color="#1cd061"
+    )
+    btn_add_current_modern.pack(padx=10, pady=(5,10), fill=ctk.X)
+
+    playlist_contents_frame = ctk.CTkFrame(playlist_right_frame, fg_color="#1a1a1a", corner_radius=10)
+    playlist_contents_frame.pack(padx=10, pady=10, fill=ctk.BOTH, expand=True)
 
-# Rafraîchissement initial des boutons de playlists
-refresh_playlist_buttons()
+    # Rafraîchissement initial des boutons de playlists
+    refresh_playlist_buttons()
 
 # --- Onglet Historique ---
-history_frame = tabview.tab("Historique")
-history_scroll = ctk.CTkScrollableFrame(history_frame)
-history_scroll.pack(fill=ctk.BOTH, expand=True)
+
+def build_history_tab(history_frame):
+    """Construit l'onglet Historique."""
+    global history_scroll
+    history_scroll = ctk.CTkScrollableFrame(history_frame)
+    history_scroll.pack(fill=ctk.BOTH, expand=True)
+    update_history_view()
 
 # --- Onglet Favoris ---
-favorites_frame = tabview.tab("Favoris")
-favorites_scroll = ctk.CTkScrollableFrame(favorites_frame)
-favorites_scroll.pack(fill=ctk.BOTH, expand=True)
-update_favorites_view()
+
+def build_favorites_tab(favorites_frame):
+    """Construit l'onglet Favoris."""
+    global favorites_scroll
+    favorites_scroll = ctk.CTkScrollableFrame(favorites_frame)
+    favorites_scroll.pack(fill=ctk.BOTH, expand=True)
+    update_favorites_view()
+    favorites_rows.set_highlight(current_file)
 
 # --- Onglet Paramètres ---
-settings_frame = tabview.tab("Paramètres")
-ctk.CTkLabel(settings_frame, text="Paramètres", font=("Arial", 14, "bold")).pack(pady=10)
-appearance_switch = ctk.CTkSwitch(settings_frame, text="Mode Sombre", command=toggle_mode)
-appearance_switch.pack(pady=5)
+
+def build_settings_tab(settings_frame):
+    """Construit l'onglet Paramètres."""
+    global appearance_switch, gapless_switch, shuffle_weighting_switch, instrumentation_switch, debug_textbox
+    ctk.CTkLabel(settings_frame, text="Paramètres", font=("Arial", 14, "bold")).pack(pady=10)
+    appearance_switch = ctk.CTkSwitch(settings_frame, text="Mode Sombre", command=toggle_mode)
+    appearance_switch.pack(pady=5)
+    gapless_switch = ctk.CTkSwitch(settings_frame, text="Enchaînement sans blanc", command=toggle_gapless)
+    if app_data["settings"].get("gapless", True):
+        gapless_switch.select()
+    gapless_switch.pack(pady=5)
+    shuffle_weighting_switch = ctk.CTkSwitch(settings_frame, text="Aléatoire : privilégier les morceaux peu écoutés", command=toggle_shuffle_weighting)
+    if app_data["settings"].get("shuffle_weighted", True):
+        shuffle_weighting_switch.select()
+    shuffle_weighting_switch.pack(pady=5)
+    ctk.CTkLabel(settings_frame, text="Fondu enchaîné").pack(pady=(10, 0))
+    crossfade_menu = ctk.CTkOptionMenu(settings_frame, values=list(CROSSFADE_CHOICES), command=set_crossfade, fg_color="#1cd061")
+    crossfade_menu.set(next((label for label, seconds in CROSSFADE_CHOICES.items() if seconds == app_data["settings"].get("crossfade_s", 0)), "Désactivé"))
+    crossfade_menu.pack(pady=5)
+    ctk.CTkLabel(settings_frame, text="Rafraîchissement de la progression").pack(pady=(10, 0))
+    progress_refresh_menu = ctk.CTkOptionMenu(settings_frame, values=list(PROGRESS_REFRESH_CHOICES), command=set_progress_refresh, fg_color="#1cd061")
+    progress_refresh_menu.set(next((label for label, ms in PROGRESS_REFRESH_CHOICES.items() if ms == app_data["settings"].get("progress_refresh_ms", 250)), "250 ms"))
+    progress_refresh_menu.pack(pady=5)
+    ctk.CTkLabel(settings_frame, text="Téléchargements simultanés").pack(pady=(10, 0))
+    download_workers_menu = ctk.CTkOptionMenu(settings_frame, values=[str(n) for n in range(1, 9)], command=set_download_workers, fg_color="#1cd061")
+    download_workers_menu.set(str(download_manager.workers))
+    download_workers_menu.pack(pady=5)
+    ctk.CTkLabel(settings_frame, text="Format des téléchargements").pack(pady=(10, 0))
+    audio_format_menu = ctk.CTkOptionMenu(settings_frame, values=list(AUDIO_FORMAT_CHOICES), command=set_audio_format, fg_color="#1cd061")
+    audio_format_menu.set(current_audio_format_choice())
+    audio_format_menu.pack(pady=5)
+
+    # Débogage : instrumentation des performances
+    ctk.CTkLabel(settings_frame, text="Débogage", font=("Arial", 12, "bold")).pack(pady=(20, 0))
+    instrumentation_switch = ctk.CTkSwitch(settings_frame, text="Mesurer les performances", command=toggle_instrumentation)
+    if instrumentation.enabled:
+        instrumentation_switch.select()
+    instrumentation_switch.pack(pady=5)
+    debug_buttons = ctk.CTkFrame(settings_frame, fg_color="transparent")
+    debug_buttons.pack(pady=5)
+    for text, command in (("Actualiser", refresh_debug_panel), ("Exporter (JSON)", export_instrumentation), ("Réinitialiser", reset_instrumentation)):
+        ctk.CTkButton(debug_buttons, text=text, width=120, command=command, fg_color="#333333", hover_color="#444444").pack(side=ctk.LEFT, padx=5)
+    debug_textbox = ctk.CTkTextbox(settings_frame, height=220, font=("Courier", 11))
+    debug_textbox.pack(fill=ctk.BOTH, expand=True, padx=20, pady=(5, 10))
+    refresh_debug_panel()
+
+TAB_BUILDERS = {
+    "Téléchargement": build_download_tab,
+    "Bibliothèque": build_library_tab,
+    "Playlists": build_playlists_tab,
+    "Historique": build_history_tab,
+    "Favoris": build_favorites_tab,
+    "Paramètres": build_settings_tab,
+}
 
 # --- Cadre du Player ---
-player_frame = ctk.CTkFrame(root)
-player_frame.pack(side=ctk.BOTTOM, fill=ctk.X, padx=20, pady=10)
-
-cover_frame = ctk.CTkFrame(player_frame, width=340, height=340, corner_radius=30)
-cover_frame.pack(pady=10)
-cover_label = ctk.CTkLabel(cover_frame, text="", width=340, height=340)
-cover_label.pack()
-
-audio_progress_frame = ctk.CTkFrame(player_frame)
-audio_progress_frame.pack(fill=ctk.X, pady=5)
-current_time_label = ctk.CTkLabel(audio_progress_frame, text="0:00")
-current_time_label.pack(side=ctk.LEFT, padx=(5, 10))
-progress_canvas = tk.Canvas(audio_progress_frame, width=400, height=8, bg='#1C1C1C', highlightthickness=0)
-progress_canvas.pack(side=ctk.LEFT, fill=ctk.X, expand=True)
-round_rectangle(progress_canvas, 0, 0, 0, 8, radius=6, fill="#1cd061", outline="", tag="progress")
-progress_canvas.bind("<Button-1>", on_canvas_click)
-total_time_label = ctk.CTkLabel(audio_progress_frame, text="0:00")
-total_time_label.pack(side=ctk.LEFT, padx=(10, 5))
-
-control_frame = ctk.CTkFrame(player_frame)
-control_frame.pack(pady=10)
-icon_size = 30
-play_img = ctk.CTkImage(Image.open("img/play.png").resize((icon_size, icon_size)))
-pause_img = ctk.CTkImage(Image.open("img/pause.png").resize((icon_size, icon_size)))
-next_img = ctk.CTkImage(Image.open("img/next.png").resize((icon_size, icon_size)))
-prev_img = ctk.CTkImage(Image.open("img/previous.png").resize((icon_size, icon_size)))
-loop_img = ctk.CTkImage(Image.open("img/loop.png").resize((icon_size, icon_size)))
-no_loop_img = ctk.CTkImage(Image.open("img/no_loop.png").resize((icon_size, icon_size)))
-shuffle_img = ctk.CTkImage(Image.open("img/shuffle.png").resize((icon_size, icon_size)))
-
-prev_btn = ctk.CTkButton(control_frame, image=prev_img, text="", command=previous_track, fg_color="#1cd061")
-prev_btn.grid(row=0, column=0, padx=5)
-pause_btn = ctk.CTkButton(control_frame, image=pause_img, text="", command=pause_audio, fg_color="#1cd061")
-pause_btn.grid(row=0, column=1, padx=5)
-next_btn = ctk.CTkButton(control_frame, image=next_img, text="", command=next_track, fg_color="#1cd061")
-next_btn.grid(row=0, column=2, padx=5)
-loop_btn = ctk.CTkButton(control_frame, image=loop_img, text="", command=toggle_loop, fg_color="#1cd061")
-loop_btn.grid(row=0, column=3, padx=5)
-shuffle_btn = ctk.CTkButton(control_frame, image=shuffle_img, text="", command=shuffle_playlist, fg_color="#1cd061")
-shuffle_btn.grid(row=0, column=4, padx=5)
-
-volume_frame = ctk.CTkFrame(control_frame)
-volume_frame.grid(row=0, column=5, padx=20)
-volume_scale = ctk.CTkSlider(volume_frame, from_=0, to=100, command=set_volume, width=100)
-volume_scale.set(50)
-volume_scale.pack(side=ctk.RIGHT)
-
-now_playing_label = ctk.CTkLabel(player_frame, text="Aucune lecture en cours", text_color="gray")
-now_playing_label.pack(pady=5)
-
-# --- Raccourcis clavier ---
-root.bind("<space>", lambda e: pause_audio())
-root.bind("<Right>", lambda e: next_track())
-root.bind("<Left>", lambda e: previous_track())
-
-# Actualisations et boucle principale
-update_library_view()
-update_playlists_view()
-check_music_end()
-update_canvas_progress()
-root.mainloop()
+
+def build_player():
+    """Construit le lecteur (pochette, progression et commandes) sous les onglets."""
+    global cover_label, current_time_label, progress_canvas, progress_item, total_time_label
+    global waveform_peak_item, waveform_rms_item, waveform_played_item
+    global play_img, pause_img, loop_img, no_loop_img, pause_btn, loop_btn, shuffle_btn, now_playing_label
+    player_frame = ctk.CTkFrame(root)
+    player_frame.pack(side=ctk.BOTTOM, fill=ctk.X, padx=20, pady=10)
+
+    cover_frame = ctk.CTkFrame(player_frame, width=340, height=340, corner_radius=30)
+    cover_frame.pack(pady=10)
+    cover_label = ctk.CTkLabel(cover_frame, text="", width=340, height=340)
+    cover_label.pack()
+
+    audio_progress_frame = ctk.CTkFrame(player_frame)
+    audio_progress_frame.pack(fill=ctk.X, pady=5)
+    current_time_label = ctk.CTkLabel(audio_progress_frame, text="0:00")
+    current_time_label.pack(side=ctk.LEFT, padx=(5, 10))
+    progress_canvas = tk.Canvas(audio_progress_frame, width=400, height=PROGRESS_HEIGHT, bg='#1C1C1C', highlightthickness=0)
+    progress_canvas.pack(side=ctk.LEFT, fill=ctk.X, expand=True)
+    top = (PROGRESS_HEIGHT - PROGRESS_BAR_HEIGHT) / 2
+    progress_item = round_rectangle(progress_canvas, 0, top, 0, top + PROGRESS_BAR_HEIGHT, radius=6, fill="#1cd061", outline="", tag="progress")
+    flat = waveform_polygon([0], 0, upto=0)
+    waveform_peak_item = progress_canvas.create_polygon(*flat, fill="#3a3a3a", outline="", state="hidden")
+    waveform_rms_item = progress_canvas.create_polygon(*flat, fill="#5a5a5a", outline="", state="hidden")
+    waveform_played_item = progress_canvas.create_polygon(*flat, fill="#1cd061", outline="", state="hidden")
+    progress_canvas.bind("<Button-1>", on_canvas_click)
+    progress_canvas.bind("<Configure>", redraw_waveform)
+    total_time_label = ctk.CTkLabel(audio_progress_frame, text="0:00")
+    total_time_label.pack(side=ctk.LEFT, padx=(10, 5))
+
+    control_frame = ctk.CTkFrame(player_frame)
+    control_frame.pack(pady=10)
+    icon_size = 30
+    play_img = ctk.CTkImage(Image.open("img/play.png").resize((icon_size, icon_size)))
+    pause_img = ctk.CTkImage(Image.open("img/pause.png").resize((icon_size, icon_size)))
+    next_img = ctk.CTkImage(Image.open("img/next.png").resize((icon_size, icon_size)))
+    prev_img = ctk.CTkImage(Image.open("img/previous.png").resize((icon_size, icon_size)))
+    loop_img = ctk.CTkImage(Image.open("img/loop.png").resize((icon_size, icon_size)))
+    no_loop_img = ctk.CTkImage(Image.open("img/no_loop.png").resize((icon_size, icon_size)))
+    shuffle_img = ctk.CTkImage(Image.open("img/shuffle.png").resize((icon_size, icon_size)))
+
+    prev_btn = ctk.CTkButton(control_frame, image=prev_img, text="", command=previous_track, fg_color="#1cd061")
+    prev_btn.grid(row=0, column=0, padx=5)
+    pause_btn = ctk.CTkButton(control_frame, image=pause_img, text="", command=pause_audio, fg_color="#1cd061")
+    pause_btn.grid(row=0, column=1, padx=5)
+    next_btn = ctk.CTkButton(control_frame, image=next_img, text="", command=next_track, fg_color="#1cd061")
+    next_btn.grid(row=0, column=2, padx=5)
+    loop_btn = ctk.CTkButton(control_frame, image=loop_img, text="", command=toggle_loop, fg_color="#1cd061")
+    loop_btn.grid(row=0, column=3, padx=5)
+    shuffle_btn = ctk.CTkButton(control_frame, image=shuffle_img, text="", command=toggle_shuffle, fg_color=SHUFFLE_ON_COLOR if shuffle_enabled else SHUFFLE_OFF_COLOR)
+    shuffle_btn.grid(row=0, column=4, padx=5)
+
+    volume_frame = ctk.CTkFrame(control_frame)
+    volume_frame.grid(row=0, column=5, padx=20)
+    volume_scale = ctk.CTkSlider(volume_frame, from_=0, to=100, command=set_volume, width=100)
+    volume_scale.set(50)
+    volume_scale.pack(side=ctk.RIGHT)
+
+    now_playing_label = ctk.CTkLabel(player_frame, text="Aucune lecture en cours", text_color="gray")
+    now_playing_label.pack(pady=5)
+
+# --- Démarrage ---
+
+def finish_startup():
+    """
+    Étapes lancées après la première image : audio, lecture du dossier audio,
+    analyse des métadonnées et reprise des téléchargements.
+    """
+    global library_watcher
+    if instrumentation.enabled:
+        instrumentation.start(root)
+    init_audio()
+    bind_player_keys()
+    mark_startup("audio")
+    # Surveillance lancée avant la lecture du dossier : aucun ajout ne peut échapper aux deux
+    library_watcher = DirectoryWatcher((catalog.directory, COVER_DIR), on_library_changes)
+    library_watcher.start()
+    if catalog.load():
+        save_app_data(app_data)
+    metadata_scanner.scan(catalog.files, rebuild_index=True)
+    update_library_view()
+    mark_startup("catalogue")
+    download_manager.start()
+    report_startup()
+
+def main():
+    """
+    Lance l'application : seuls la fenêtre, le lecteur et l'onglet visible sont
+    construits avant la première image, le reste l'est ensuite ou à la demande.
+    """
+    global root
+    build_main_window()
+    build_player()
+    ensure_tab(tabview.get())
+    mark_startup("interface")
+    root.update()
+    mark_startup("première image")
+    root.after(0, finish_startup)
+    root.mainloop()
+    # Fenêtre fermée : les derniers enregistrements sont sérialisés sans elle
+    root = None
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+Banc d'essai du lecteur sur des bibliothèques synthétiques.
+
+Génère des bibliothèques de MP3 silencieux (tags ID3 et pochettes compris) ainsi
+qu'un app_data.json volumineux, puis mesure sans interaction les chemins critiques
+de Downloader.py : chargement du catalogue et des données, analyse des métadonnées,
+recherche, morceau suivant, composition des pochettes et sauvegarde de app_data.
+L'affichage de la bibliothèque et le passage au morceau suivant via l'interface
+ne sont mesurés que si un affichage est disponible (sinon : xvfb-run).
+
+Chaque taille est mesurée dans un processus séparé. Les résultats (temps en ms,
+pic mémoire Python par mesure et mémoire maximale du processus) sont écrits en JSON
+pour suivre les régressions d'une version à l'autre.
+
+Utilisation :
+    python benchmark.py [--sizes 1000 10000 100000] [--repeat 5] [--workdir .bench] [--output resultats.json]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = (1000, 10000, 100000)
+GENERATOR_VERSION = 1            # À incrémenter si le contenu généré change
+COVER_VARIANTS = 16              # Pochettes distinctes (réutilisées cycliquement)
+COVER_SAMPLE = 100               # Pochettes composées par mesure
+NEXT_TRACK_STEPS = 1000          # Appels à catalog.next_after() par mesure
+UI_NEXT_TRACK_STEPS = 20         # Morceaux enchaînés via next_track() par mesure
+SEARCH_QUERIES = ("a", "amour", "nuit étoilée", "orage 0042", "introuvable xyz")
+
+WORDS = (
+    "amour", "nuit", "étoilée", "soleil", "pluie", "océan", "rêve", "orage", "forêt", "ville",
+    "lumière", "ombre", "café", "été", "hiver", "cœur", "route", "musique", "silence", "danse",
+)
+GENRES = ("Pop", "Rock", "Jazz", "Électro", "Classique", "Hip-Hop", "Folk", "Ambient")
+
+# --- Génération des bibliothèques ---
+
+def silent_mp3(frames=10):
+    """
+    Retourne un flux MP3 silencieux : trames MPEG-1 Layer III, 32 kb/s, 32 kHz,
+    mono, sans CRC (144 octets chacune, soit 36 ms de silence).
+    """
+    header = bytes([0xFF, 0xFB, 0x18, 0xC0])
+    return (header + bytes(140)) * frames
+
+def syncsafe(n):
+    """Encode un entier sur 4 octets de 7 bits (tailles ID3v2.4)."""
+    return bytes([(n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F])
+
+def id3_tag(fields):
+    """
+    Construit un tag ID3v2.4 (textes UTF-8).
+
+    :param fields: Liste [(identifiant de trame, texte)]
+    """
+    frames = b""
+    for frame_id, value in fields:
+        data = b"\x03" + value.encode("utf-8")
+        frames += frame_id.encode("ascii") + syncsafe(len(data)) + b"\x00\x00" + data
+    return b"ID3\x04\x00\x00" + syncsafe(len(frames)) + frames
+
+def cover_variants():
+    """Retourne des pochettes JPEG de 340 px (dégradés de couleurs différentes)."""
+    from io import BytesIO
+    from PIL import Image
+    gradient = Image.linear_gradient("L").resize((340, 340))
+    variants = []
+    for i in range(COVER_VARIANTS):
+        hue = Image.new("L", (340, 340), i * 256 // COVER_VARIANTS)
+        img = Image.merge("HSV", (hue, gradient, gradient.rotate(90))).convert("RGB")
+        buffer = BytesIO()
+        img.save(buffer, "JPEG", quality=85)
+        variants.append(buffer.getvalue())
+    return variants
+
+def library_tracks(size):
+    """Retourne la liste reproductible [(fichier, tags)] d'une bibliothèque synthétique."""
+    rng = random.Random(size)
+    tracks = []
+    for i in range(size):
+        artist = f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS).capitalize()}"
+        title = f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {i:04d}"
+        tags = {
+            "artist": artist,
+            "album": f"{rng.choice(WORDS).capitalize()} {i % 97}",
+            "title": title,
+            "genre": rng.choice(GENRES),
+        }
+        tracks.append((f"{artist} - {title}.mp3", tags))
+    return tracks
+
+def generate_library(directory, size):
+    """
+    Crée (une seule fois) les fichiers audio et les pochettes d'une bibliothèque.
+
+    :param directory: Dossier de la bibliothèque
+    :param size: Nombre de morceaux
+    """
+    marker = os.path.join(directory, ".bench_ready")
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if f.read().strip() == f"{GENERATOR_VERSION} {size}":
+                return
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(os.path.join(directory, "audio"))
+    os.makedirs(os.path.join(directory, "Pochette_album"))
+    audio = silent_mp3()
+    covers = cover_variants()
+    for i, (filename, tags) in enumerate(library_tracks(size)):
+        tag = id3_tag([("TIT2", tags["title"]), ("TPE1", tags["artist"]), ("TALB", tags["album"]), ("TCON", tags["genre"])])
+        with open(os.path.join(directory, "audio", filename), "wb") as f:
+            f.write(tag + audio)
+        with open(os.path.join(directory, "Pochette_album", f"{os.path.splitext(filename)[0]}.jpg"), "wb") as f:
+            f.write(covers[i % len(covers)])
+    with open(marker, "w") as f:
+        f.write(f"{GENERATOR_VERSION} {size}")
+
+def build_app_data(size):
+    """Retourne un app_data volumineux : playlists, favoris, tags, identifiants et téléchargements."""
+    rng = random.Random(-size)
+    files = [filename for filename, _ in library_tracks(size)]
+    ids = {f: i + 1 for i, f in enumerate(files)}
+    playlists = {"Favoris": [ids[f] for f in rng.sample(files, size // 20)]}
+    for i in range(20):
+        # Tirage avec remise : les doublons sont volontaires
+        playlists[f"Playlist {i + 1:02d}"] = [ids[rng.choice(files)] for _ in range(min(500, size // 10))]
+    return {
+        "playlists": playlists,
+        "settings": {"theme": "Dark", "window_size": "950x900", "window_state": "normal"},
+        "tags": {f: {"genre": rng.choice(GENRES)} for f in rng.sample(files, size // 10)},
+        "catalog": {"next_id": size + 1, "ids": ids},
+        "downloads": [
+            {
+                "id": f"{i:032x}",
+                "url": f"https://www.youtube.com/watch?v={i:011d}",
+                "title": files[i % size],
+                "status": "terminé",
+                "progress": 1,
+                "attempts": 1,
+                "not_before": 0,
+                "expanded": True,
+                "error": None,
+            }
+            for i in range(200)
+        ],
+    }
+
+def prepare_run(directory, size):
+    """Réinitialise les données et caches de l'application pour une mesure à froid."""
+    for name in ("app_data.json", "history.db", "history.db-wal", "history.db-shm", "metadata.db"):
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.rmtree(os.path.join(directory, ".cache"), ignore_errors=True)
+    with open(os.path.join(directory, "app_data.json"), "w") as f:
+        json.dump(build_app_data(size), f)
+
+# --- Mesures ---
+
+def evict_page_cache(paths):
+    """
+    Retire des fichiers du cache de pages du système (Linux), pour que les mesures
+    « à froid » relisent vraiment le disque. Sans effet ailleurs.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+def measure(func, repeat, setup=None):
+    """
+    Mesure une fonction : temps de chaque exécution, puis pic mémoire Python
+    (tracemalloc) lors d'une exécution supplémentaire.
+
+    :param func: Fonction à mesurer
+    :param repeat: Nombre d'exécutions chronométrées
+    :param setup: Fonction appelée avant chaque exécution (hors mesure)
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "runs": repeat,
+        "min_ms": round(min(times), 3),
+        "median_ms": round(statistics.median(times), 3),
+        "mean_ms": round(statistics.fmean(times), 3),
+        "max_ms": round(max(times), 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+def max_rss_kb():
+    """Retourne la mémoire résidente maximale du processus (Ko), si mesurable."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+def run_benchmarks(directory, size, repeat):
+    """Mesure les chemins critiques de Downloader.py sur une bibliothèque générée."""
+    os.chdir(directory)
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    sys.path.insert(0, ROOT)
+    results = {}
+
+    start = time.perf_counter()
+    import Downloader as app
+    results["import"] = {"runs": 1, "min_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    results["load_app_data"] = measure(app.load_app_data, repeat)
+    results["catalog_load"] = measure(app.catalog.load, repeat)
+    files = list(app.catalog.files)
+
+    def scan():
+        app.metadata_scanner.scan(files, rebuild_index=True)
+        app.metadata_scanner.wait()
+    def clear_metadata_cache():
+        conn = sqlite3.connect(app.METADATA_DB_FILE)
+        with conn:
+            conn.execute("DELETE FROM metadata")
+        conn.close()
+        evict_page_cache([os.path.join("audio", f) for f in files])
+    app.metadata_scanner.scan([])
+    app.metadata_scanner.wait()
+    results["metadata_scan_cold"] = measure(scan, 1, setup=clear_metadata_cache)
+    # Même analyse sans parallélisme : mesure ce que les threads apportent réellement
+    workers = app.metadata_scanner.workers
+    app.metadata_scanner.workers = 1
+    results["metadata_scan_cold_1_worker"] = measure(scan, 1, setup=clear_metadata_cache)
+    app.metadata_scanner.workers = workers
+    results["metadata_scan_warm"] = measure(scan, repeat)
+    results["search_index_rebuild"] = measure(
+        lambda: app.search_index.rebuild(files, {f: app.track_tags(f) for f in files}), repeat
+    )
+    for query in SEARCH_QUERIES:
+        results[f"search:{query}"] = measure(lambda: app.search_index.search(query), repeat)
+
+    def walk_catalog():
+        current = files[0]
+        for _ in range(NEXT_TRACK_STEPS):
+            current = app.catalog.next_after(current)
+    results[f"catalog_next_after_x{NEXT_TRACK_STEPS}"] = measure(walk_catalog, repeat)
+
+    sample = [app.cover_path_for(f) for f in files[:COVER_SAMPLE]]
+    for name, geometry in (("library", app.LIBRARY_COVER_GEOMETRY), ("now_playing", app.NOW_PLAYING_COVER_GEOMETRY)):
+        render = lambda: [app.render_cover(path, geometry) for path in sample]
+        clear = lambda: shutil.rmtree(app.COVER_CACHE_DIR, ignore_errors=True)
+        results[f"render_cover_{name}_cold_x{COVER_SAMPLE}"] = measure(render, repeat, setup=clear)
+        results[f"render_cover_{name}_warm_x{COVER_SAMPLE}"] = measure(render, repeat)
+
+    def save():
+        app.save_app_data(app.app_data)
+        app.flush_app_data()
+    results["save_app_data"] = measure(save, repeat)
+    results["save_app_data"]["file_kb"] = round(os.path.getsize(app.APP_DATA_FILE) / 1024, 1)
+
+    results.update(run_ui_benchmarks(app, files, repeat))
+    return results
+
+def run_ui_benchmarks(app, files, repeat):
+    """Mesure l'affichage de la bibliothèque, la recherche et next_track() dans l'interface."""
+    names = ("update_library_view", "search_library", f"next_track_x{UI_NEXT_TRACK_STEPS}")
+    try:
+        app.build_main_window()
+        app.build_player()
+        app.ensure_tab("Bibliothèque")
+        app.tabview.set("Bibliothèque")
+        app.root.update()
+    except Exception as e:
+        return {name: {"skipped": f"interface indisponible : {e}"} for name in names}
+    results = {}
+
+    def show_library():
+        app.update_library_view()
+        app.root.update_idletasks()
+    results["update_library_view"] = measure(show_library, repeat)
+
+    def search():
+        app.search_library()
+        app.root.update_idletasks()
+    app.search_entry.insert(0, SEARCH_QUERIES[1])
+    results["search_library"] = measure(search, repeat)
+    app.search_entry.delete(0, "end")
+    app.search_library()
+
+    try:
+        app.init_audio()
+        app.play_audio_by_filename(files[0])
+    except Exception as e:
+        results[names[2]] = {"skipped": f"audio indisponible : {e}"}
+    else:
+        def next_tracks():
+            for _ in range(UI_NEXT_TRACK_STEPS):
+                app.next_track()
+            app.root.update_idletasks()
+        results[names[2]] = measure(next_tracks, repeat)
+    app.root.destroy()
+    return results
+
+# --- Exécution ---
+
+def run_metadata():
+    """Retourne les informations permettant de comparer des exécutions."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    with open(os.path.join(ROOT, "Downloader.py"), "rb") as f:
+        app_hash = hashlib.sha256(f.read()).hexdigest()[:12]
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "downloader_sha256": app_hash,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def run_size(workdir, size, repeat):
+    """Génère la bibliothèque d'une taille puis la mesure dans un processus séparé."""
+    directory = os.path.abspath(os.path.join(workdir, f"lib_{size}"))
+    print(f"[{size}] Génération de la bibliothèque...", file=sys.stderr)
+    start = time.perf_counter()
+    generate_library(directory, size)
+    prepare_run(directory, size)
+    generation_s = round(time.perf_counter() - start, 1)
+    print(f"[{size}] Mesures...", file=sys.stderr)
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run", directory, "--size", str(size), "--repeat", str(repeat)],
+        capture_output=True, text=True, env=env
+    )
+    entry = {"size": size, "generation_s": generation_s}
+    if proc.returncode != 0:
+        entry["error"] = proc.stderr.strip()[-2000:]
+        return entry
+    entry.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return entry
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai du lecteur sur des bibliothèques synthétiques.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Nombres de morceaux à tester")
+    parser.add_argument("--repeat", type=int, default=5, help="Exécutions chronométrées par mesure")
+    parser.add_argument("--workdir", default=os.path.join(ROOT, ".bench"), help="Dossier des bibliothèques générées (réutilisées)")
+    parser.add_argument("--output", help="Fichier JSON de résultats (sortie standard par défaut)")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        # Processus de mesure d'une bibliothèque : une ligne JSON sur la sortie standard
+        benchmarks = run_benchmarks(args.run, args.size, args.repeat)
+        print(json.dumps({"benchmarks": benchmarks, "max_rss_kb": max_rss_kb()}))
+        return
+
+    report = {"meta": run_metadata(), "results": [run_size(args.workdir, size, args.repeat) for size in args.sizes]}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Résultats écrits dans {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Tests de l'enchaînement dans une playlist. Downloader.py est importé sans fenêtre,
+dans un dossier temporaire (il y crée ses fichiers de données).
+"""
+
+import os
+import sys
+import json
+import importlib
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("app")
+    os.makedirs(directory / "audio")
+    for name in ("a.mp3", "b.mp3"):
+        (directory / "audio" / name).write_bytes(b"")
+    previous = os.getcwd()
+    os.chdir(directory)
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    sys.path.insert(0, ROOT)
+    try:
+        module = importlib.import_module("Downloader")
+        module.catalog.load()
+        yield module
+        # Les chemins de données sont relatifs : enregistrement avant de quitter le dossier
+        module.flush_app_data()
+    finally:
+        os.chdir(previous)
+
+def test_adjacent_duplicates_are_followed_in_order(app, monkeypatch):
+    """Avec [A, A, B], l'enchaînement passe par chaque occurrence au lieu de rejouer la première."""
+    a, b = app.catalog.id_for("a.mp3"), app.catalog.id_for("b.mp3")
+    playlist = app.playlist_store.create("doublons")
+    playlist.extend([a, a, b])
+    first, second, third = playlist.entries()
+    monkeypatch.setattr(app, "current_playlist", "doublons")
+    monkeypatch.setattr(app, "current_playlist_entry", first)
+    monkeypatch.setattr(app, "current_file", "a.mp3")
+
+    played = []
+    for _ in range(3):
+        next_file, playlist_name, entry = app.peek_next_track()
+        # Même choix d'occurrence que start_track_ui
+        entry = playlist.find(app.catalog.id_for(next_file), entry)
+        monkeypatch.setattr(app, "current_playlist_entry", entry)
+        monkeypatch.setattr(app, "current_file", next_file)
+        played.append((entry, next_file))
+    assert played == [(second, "a.mp3"), (third, "b.mp3"), (first, "a.mp3")]
+
+def test_playlist_edits_are_written_when_app_data_is_saved(app):
+    """Les modifications d'une playlist sont reportées dans app_data.json à l'enregistrement."""
+    a, b = app.catalog.id_for("a.mp3"), app.catalog.id_for("b.mp3")
+    playlist = app.playlist_store.create("enregistrée")
+    playlist.extend([a, b])
+    first, second = playlist.entries()
+    playlist.move(second, before=first)
+    app.playlist_store.save("enregistrée")
+    app.flush_app_data()
+    with open(app.APP_DATA_FILE, encoding="utf-8") as f:
+        assert json.load(f)["playlists"]["enregistrée"] == [b, a]